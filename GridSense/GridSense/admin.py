@@ -1,7 +1,7 @@
 # /home/mgrid/development/microgrid-iot/GridSense/GridSense/admin.py
 
 from django.contrib import admin
-from .models import MeasurementsOne, MeasurementsTwo, MeasurementsThree, MeasurementsFour, MeasurementsFive, MeasurementsSix
+from .models import MeasurementsOne, MeasurementsTwo, MeasurementsThree, MeasurementsFour, MeasurementsFive, MeasurementsSix, Measurements100Hz, Measurements10Hz, AdcCalibration
 
 
 admin.site.register(MeasurementsOne)
@@ -10,3 +10,6 @@ admin.site.register(MeasurementsThree)
 admin.site.register(MeasurementsFour)
 admin.site.register(MeasurementsFive)
 admin.site.register(MeasurementsSix)
+admin.site.register(Measurements100Hz)
+admin.site.register(Measurements10Hz)
+admin.site.register(AdcCalibration)
@@ -0,0 +1,103 @@
+# Generated by Django 5.1.7 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GridSense', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurementsfive',
+            name='dropped_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Dropped Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsfive',
+            name='expected_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Expected Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsfive',
+            name='received_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Received Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsfour',
+            name='dropped_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Dropped Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsfour',
+            name='expected_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Expected Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsfour',
+            name='received_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Received Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsone',
+            name='dropped_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Dropped Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsone',
+            name='expected_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Expected Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsone',
+            name='received_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Received Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementssix',
+            name='dropped_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Dropped Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementssix',
+            name='expected_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Expected Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementssix',
+            name='received_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Received Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsthree',
+            name='dropped_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Dropped Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsthree',
+            name='expected_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Expected Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementsthree',
+            name='received_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Received Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementstwo',
+            name='dropped_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Dropped Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementstwo',
+            name='expected_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Expected Samples'),
+        ),
+        migrations.AddField(
+            model_name='measurementstwo',
+            name='received_samples',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Received Samples'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GridSense', '0002_sample_accounting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdcCalibration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.PositiveSmallIntegerField(default=0)),
+                ('channel', models.PositiveSmallIntegerField()),
+                ('vref', models.FloatField(verbose_name='Reference Voltage')),
+                ('datasheet_offset_v', models.FloatField(default=0.0, verbose_name='Datasheet Offset (V)')),
+                ('measured_gain', models.FloatField(default=1.0, verbose_name='Measured Gain')),
+                ('measured_offset_v', models.FloatField(default=0.0, verbose_name='Measured Offset (V)')),
+                ('adc_gain', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='ADC PGA Gain Code')),
+                ('adc_drate', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='ADC Data Rate Code')),
+                ('ofc', models.IntegerField(blank=True, null=True, verbose_name='Offset Calibration Register')),
+                ('fsc', models.IntegerField(blank=True, null=True, verbose_name='Full-Scale Calibration Register')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'adc_calibration',
+                'constraints': [models.UniqueConstraint(fields=('board', 'channel'), name='adc_calibration_board_channel')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:00
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GridSense', '0003_adccalibration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Measurements100Hz',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.PositiveIntegerField()),
+                ('sensdata', django.contrib.postgres.fields.ArrayField(base_field=models.DecimalField(decimal_places=2, max_digits=5), size=None)),
+                ('time', models.DateTimeField(verbose_name='First Sample Time')),
+                ('rate_hz', models.FloatField(verbose_name='Sample Rate (Hz)')),
+                ('rmsvalue', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('sname', models.CharField(max_length=50, verbose_name='Sensor Name')),
+                ('stype', models.CharField(choices=[('Current', 'Current'), ('Voltage', 'Voltage')], max_length=50, verbose_name='Sensor Type')),
+            ],
+            options={
+                'db_table': 'measurements_100hz',
+                'abstract': False,
+                'indexes': [models.Index(fields=['sensor_id', 'time'], name='measurements100hz_sensor_time')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Measurements10Hz',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.PositiveIntegerField()),
+                ('sensdata', django.contrib.postgres.fields.ArrayField(base_field=models.DecimalField(decimal_places=2, max_digits=5), size=None)),
+                ('time', models.DateTimeField(verbose_name='First Sample Time')),
+                ('rate_hz', models.FloatField(verbose_name='Sample Rate (Hz)')),
+                ('rmsvalue', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('sname', models.CharField(max_length=50, verbose_name='Sensor Name')),
+                ('stype', models.CharField(choices=[('Current', 'Current'), ('Voltage', 'Voltage')], max_length=50, verbose_name='Sensor Type')),
+            ],
+            options={
+                'db_table': 'measurements_10hz',
+                'abstract': False,
+                'indexes': [models.Index(fields=['sensor_id', 'time'], name='measurements10hz_sensor_time')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-17 15:00
+
+from django.db import migrations
+
+# The sensor scripts used to insert explicit ids (SELECT MAX(id) + 1), which
+# leaves the id sequences behind the data. They now take ids from the
+# sequences, so move each sequence past the largest id in its table.
+MEASUREMENT_TABLES = ['measurements_one', 'measurements_two', 'measurements_three',
+                      'measurements_four', 'measurements_five', 'measurements_six']
+
+SYNC_SEQUENCE_SQL = """
+SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table};
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GridSense', '0004_decimated_streams'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SYNC_SEQUENCE_SQL.format(table=table), reverse_sql=migrations.RunSQL.noop)
+        for table in MEASUREMENT_TABLES
+    ]
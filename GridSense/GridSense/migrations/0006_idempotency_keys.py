@@ -0,0 +1,83 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GridSense', '0005_sync_id_sequences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurementsfive',
+            name='first_seq',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='First Sample Sequence'),
+        ),
+        migrations.AddField(
+            model_name='measurementsfour',
+            name='first_seq',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='First Sample Sequence'),
+        ),
+        migrations.AddField(
+            model_name='measurementsone',
+            name='first_seq',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='First Sample Sequence'),
+        ),
+        migrations.AddField(
+            model_name='measurementssix',
+            name='first_seq',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='First Sample Sequence'),
+        ),
+        migrations.AddField(
+            model_name='measurementsthree',
+            name='first_seq',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='First Sample Sequence'),
+        ),
+        migrations.AddField(
+            model_name='measurementstwo',
+            name='first_seq',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='First Sample Sequence'),
+        ),
+        migrations.AddConstraint(
+            model_name='measurementsfive',
+            constraint=models.UniqueConstraint(fields=('sensor_id', 'time', 'first_seq'), name='measurementsfive_batch_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='measurementsfour',
+            constraint=models.UniqueConstraint(fields=('sensor_id', 'time', 'first_seq'), name='measurementsfour_batch_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='measurementsone',
+            constraint=models.UniqueConstraint(fields=('sensor_id', 'time', 'first_seq'), name='measurementsone_batch_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='measurementssix',
+            constraint=models.UniqueConstraint(fields=('sensor_id', 'time', 'first_seq'), name='measurementssix_batch_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='measurementsthree',
+            constraint=models.UniqueConstraint(fields=('sensor_id', 'time', 'first_seq'), name='measurementsthree_batch_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='measurementstwo',
+            constraint=models.UniqueConstraint(fields=('sensor_id', 'time', 'first_seq'), name='measurementstwo_batch_key'),
+        ),
+        migrations.RemoveIndex(
+            model_name='measurements100hz',
+            name='measurements100hz_sensor_time',
+        ),
+        migrations.AddConstraint(
+            model_name='measurements100hz',
+            constraint=models.UniqueConstraint(fields=('sensor_id', 'time'), name='measurements100hz_sensor_time_key'),
+        ),
+        migrations.RemoveIndex(
+            model_name='measurements10hz',
+            name='measurements10hz_sensor_time',
+        ),
+        migrations.AddConstraint(
+            model_name='measurements10hz',
+            constraint=models.UniqueConstraint(fields=('sensor_id', 'time'), name='measurements10hz_sensor_time_key'),
+        ),
+    ]
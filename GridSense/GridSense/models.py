@@ -15,33 +15,89 @@ class MeasurementModel(models.Model):
     thd = models.DecimalField(max_digits=5, decimal_places=2, verbose_name='Total Harmonic Distortion')
     sname = models.CharField(max_length=50, verbose_name='Sensor Name')
     stype = models.CharField(max_length=50, verbose_name='Sensor Type', choices=[('Current', 'Current'), ('Voltage', 'Voltage')])
+    # Sample accounting for the batch, from the sampler's per-channel sequence numbers (null for older rows)
+    expected_samples = models.PositiveIntegerField(null=True, blank=True, verbose_name='Expected Samples')
+    received_samples = models.PositiveIntegerField(null=True, blank=True, verbose_name='Received Samples')
+    dropped_samples = models.PositiveIntegerField(null=True, blank=True, verbose_name='Dropped Samples')
+    # Sequence number of the batch's first sample; with sensor_id and time the batch's
+    # idempotency key, so a batch the Pi writes again after a lost connection is skipped
+    first_seq = models.BigIntegerField(null=True, blank=True, verbose_name='First Sample Sequence')
 
     class Meta:
         abstract = True
+        constraints = [models.UniqueConstraint(fields=['sensor_id', 'time', 'first_seq'], name='%(class)s_batch_key')]
 
     def __str__(self):
         return f"Sensor ID: {self.sensor_id}, Sensdata: {self.sensdata}, Time: {self.time}, RMS: {self.rmsvalue}, PF: {self.pf}, THD: {self.thd}, Name: {self.sname}, Type: {self.stype}"
 
 class MeasurementsOne(MeasurementModel):
-    class Meta:
+    class Meta(MeasurementModel.Meta):
         db_table = 'measurements_one' # Added explicit table names for clarity and potential future migrations
 
 class MeasurementsTwo(MeasurementModel):
-    class Meta:
+    class Meta(MeasurementModel.Meta):
         db_table = 'measurements_two'
 
 class MeasurementsThree(MeasurementModel):
-    class Meta:
+    class Meta(MeasurementModel.Meta):
         db_table = 'measurements_three'
 
 class MeasurementsFour(MeasurementModel):
-    class Meta:
+    class Meta(MeasurementModel.Meta):
         db_table = 'measurements_four'
 
 class MeasurementsFive(MeasurementModel):
-    class Meta:
+    class Meta(MeasurementModel.Meta):
         db_table = 'measurements_five'
 
 class MeasurementsSix(MeasurementModel):
+    class Meta(MeasurementModel.Meta):
+        db_table = 'measurements_six'
+
+class DecimatedMeasurementModel(models.Model):
+    # Lower-rate stream of a sensor, from the Pi's decimation filter bank (decimate.py).
+    # sensdata holds evenly spaced samples: sample i is at time + i / rate_hz.
+    sensor_id = models.PositiveIntegerField()
+    sensdata = ArrayField(models.DecimalField(max_digits=5, decimal_places=2))
+    time = models.DateTimeField(verbose_name='First Sample Time')
+    rate_hz = models.FloatField(verbose_name='Sample Rate (Hz)')
+    rmsvalue = models.DecimalField(max_digits=5, decimal_places=2)
+    sname = models.CharField(max_length=50, verbose_name='Sensor Name')
+    stype = models.CharField(max_length=50, verbose_name='Sensor Type', choices=[('Current', 'Current'), ('Voltage', 'Voltage')])
+
     class Meta:
-        db_table = 'measurements_six'
\ No newline at end of file
+        abstract = True
+        # One row per sensor and start time; also the index for time range queries
+        constraints = [models.UniqueConstraint(fields=['sensor_id', 'time'], name='%(class)s_sensor_time_key')]
+
+    def __str__(self):
+        return f"Sensor ID: {self.sensor_id}, Time: {self.time}, Rate: {self.rate_hz} Hz, Samples: {len(self.sensdata)}, RMS: {self.rmsvalue}, Name: {self.sname}, Type: {self.stype}"
+
+class Measurements100Hz(DecimatedMeasurementModel):
+    class Meta(DecimatedMeasurementModel.Meta):
+        db_table = 'measurements_100hz'
+
+class Measurements10Hz(DecimatedMeasurementModel):
+    class Meta(DecimatedMeasurementModel.Meta):
+        db_table = 'measurements_10hz'
+
+class AdcCalibration(models.Model):
+    # Per-channel ADC calibration profile, read by the Pi's sampler scripts (calibration.py)
+    board = models.PositiveSmallIntegerField(default=0)
+    channel = models.PositiveSmallIntegerField()
+    vref = models.FloatField(verbose_name='Reference Voltage')
+    datasheet_offset_v = models.FloatField(default=0.0, verbose_name='Datasheet Offset (V)')
+    measured_gain = models.FloatField(default=1.0, verbose_name='Measured Gain')
+    measured_offset_v = models.FloatField(default=0.0, verbose_name='Measured Offset (V)')
+    adc_gain = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='ADC PGA Gain Code')
+    adc_drate = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='ADC Data Rate Code')
+    ofc = models.IntegerField(null=True, blank=True, verbose_name='Offset Calibration Register')
+    fsc = models.IntegerField(null=True, blank=True, verbose_name='Full-Scale Calibration Register')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'adc_calibration'
+        constraints = [models.UniqueConstraint(fields=['board', 'channel'], name='adc_calibration_board_channel')]
+
+    def __str__(self):
+        return f"Board: {self.board}, Channel: {self.channel}, Gain: {self.measured_gain}, Offset: {self.measured_offset_v}, Updated: {self.updated}"
@@ -65,6 +65,9 @@ CMD = {'CMD_WAKEUP' : 0x00,     # Completes SYNC and Exits Standby Mode 0000  00
        'CMD_RESET' : 0xFE,      # Reset to Power-Up Values 1111   1110 (FEh)
       }
 
+# Datasheet t6: delay between a read command and the first data SCLK (50 tCLKIN ~ 6.5us)
+T6_DELAY_US = 7
+
 class ADS1256:
     def __init__(self):
         self.rst_pin = config.RST_PIN
@@ -79,26 +82,18 @@ class ADS1256:
         config.delay_ms(200)
         config.digital_write(self.rst_pin, GPIO.HIGH)
     
+    # Each command, register access and data read is ONE config.spi_transfer()
+    # call, which holds CS low and (with the spidev transport) issues one ioctl.
     def ADS1256_WriteCmd(self, reg):
-        config.digital_write(self.cs_pin, GPIO.LOW)#cs  0
-        config.spi_writebyte([reg])
-        config.digital_write(self.cs_pin, GPIO.HIGH)#cs 1
+        config.spi_transfer([reg])
     
     def ADS1256_WriteReg(self, reg, data):
-        config.digital_write(self.cs_pin, GPIO.LOW)#cs  0
-        config.spi_writebyte([CMD['CMD_WREG']| reg])
-        config.spi_writebyte([0x00])
-        config.spi_writebyte([data])
-        config.digital_write(self.cs_pin, GPIO.HIGH)#cs 1
+        config.spi_transfer([CMD['CMD_WREG'] | reg, 0x00, data])
         
     def ADS1256_Read_data(self, reg):
-        config.digital_write(self.cs_pin, GPIO.LOW)#cs  0
-        config.spi_writebyte([CMD['CMD_RREG'] | reg])
-        config.spi_writebyte([0x00])
-        data = config.spi_readbytes(1)
-        config.digital_write(self.cs_pin, GPIO.HIGH)#cs 1
-
-        return data
+        # RREG needs the t6 delay before the register value is clocked out
+        data = config.spi_transfer([CMD['CMD_RREG'] | reg, 0x00], 1, T6_DELAY_US)
+        return data[0]
         
     def ADS1256_WaitDRDY(self):
         for i in range(0,400000,1):
@@ -122,15 +117,8 @@ class ADS1256:
         buf[2] = (0<<5) | (0<<3) | (gain<<0)
         buf[3] = drate
         
-        config.digital_write(self.cs_pin, GPIO.LOW)#cs  0
-        config.spi_writebyte([CMD['CMD_WREG'] | 0])
-        config.spi_writebyte([ 0x03])
-        config.spi_writebyte([buf[0]])
-        config.spi_writebyte([buf[1]])
-        config.spi_writebyte([buf[2]])       
-        config.spi_writebyte([buf[3]])  
-        
-        config.digital_write(self.cs_pin, GPIO.HIGH)#cs 1
+        # WREG of registers 0-3 and their values in one transaction
+        config.spi_transfer([CMD['CMD_WREG'] | 0, 0x03] + buf[0:4])
         config.delay_ms(1) 
 
 
@@ -168,18 +156,13 @@ class ADS1256:
         
     def ADS1256_Read_ADC_Data(self):
         self.ADS1256_WaitDRDY()
-        config.digital_write(self.cs_pin, GPIO.LOW)#cs  0
-        config.spi_writebyte([CMD['CMD_RDATA']])
-        buf = [0,0,0]
-        buf[0] = config.spi_readbytes(0xff)
-        buf[1] = config.spi_readbytes(0xff)
-        buf[2] = config.spi_readbytes(0xff)
-        config.digital_write(self.cs_pin, GPIO.HIGH)#cs 1
+        # RDATA, the t6 delay and the 3 data bytes go out as one transaction
+        buf = config.spi_transfer([CMD['CMD_RDATA']], 3, T6_DELAY_US)
         read = (buf[0]<<16) & 0xff0000
         read |= (buf[1]<<8) & 0xff00
         read |= (buf[2]) & 0xff
         if (read & 0x800000):
-            read &= 0xF000000
+            read -= 0x1000000 # Negative: two's complement to a signed int
         return read
  
     def ADS1256_GetChannalValue(self, Channel):
@@ -28,6 +28,8 @@
 #
 
 import ctypes
+import fcntl
+import os
 import RPi.GPIO as GPIO
 import time
 
@@ -36,9 +38,44 @@ RST_PIN         = 18
 CS_PIN       = 22
 DRDY_PIN        = 17
 
-clib = ctypes.cdll.LoadLibrary
-spi = clib('./sysfs_software_spi.so')
-# SPI device, bus = 0, device = 0
+# --- SPI transport ---
+# "spidev": the kernel SPI controller through /dev/spidev<bus>.<device>
+#           (enable SPI1 on the 40-pin header with jetson-io). Each command,
+#           register access or data read is one ioctl.
+# "soft":   the bit-banged sysfs_software_spi.so, one ctypes call per byte.
+# Selected with the ADS1256_SPI environment variable, e.g. ADS1256_SPI=soft.
+# Either way CS is the board's GPIO (CS_PIN), held low for a whole transaction.
+SPI_TRANSPORT = os.environ.get('ADS1256_SPI', 'spidev')
+SPI_BUS         = 0
+SPI_DEVICE      = 0
+SPI_SPEED_HZ    = 2000000
+
+if SPI_TRANSPORT == 'spidev':
+    import spidev
+    SPI = spidev.SpiDev()
+elif SPI_TRANSPORT == 'soft':
+    clib = ctypes.cdll.LoadLibrary
+    spi = clib('./sysfs_software_spi.so')
+else:
+    raise ValueError(f"Unknown ADS1256_SPI transport '{SPI_TRANSPORT}' (expected 'spidev' or 'soft')")
+
+# struct spi_ioc_transfer from <linux/spi/spidev.h>
+class _SpiIocTransfer(ctypes.Structure):
+    _fields_ = [('tx_buf', ctypes.c_uint64),
+                ('rx_buf', ctypes.c_uint64),
+                ('len', ctypes.c_uint32),
+                ('speed_hz', ctypes.c_uint32),
+                ('delay_usecs', ctypes.c_uint16),
+                ('bits_per_word', ctypes.c_uint8),
+                ('cs_change', ctypes.c_uint8),
+                ('tx_nbits', ctypes.c_uint8),
+                ('rx_nbits', ctypes.c_uint8),
+                ('word_delay_usecs', ctypes.c_uint8),
+                ('pad', ctypes.c_uint8)]
+
+def _spi_ioc_message(n):
+    """ SPI_IOC_MESSAGE(n) ioctl request number. """
+    return (1 << 30) | ((ctypes.sizeof(_SpiIocTransfer) * n) << 16) | (ord('k') << 8)
 
 
 def digital_write(pin, value):
@@ -48,26 +85,84 @@ def digital_read(pin):
     return GPIO.input(pin)
 
 def delay_ms(delaytime):
-    time.sleep(delaytime // 1000.0)
+    time.sleep(delaytime / 1000.0)
+
+def _busy_wait_us(delaytime):
+    """ Busy-waits delaytime microseconds (too short for time.sleep()). """
+    end = time.perf_counter() + delaytime / 1e6
+    while time.perf_counter() < end:
+        pass
 
 def spi_writebyte(data):
-    spi.SYSFS_software_spi_transfer(data[0])
+    if SPI_TRANSPORT == 'spidev':
+        SPI.writebytes(data)
+    else:
+        spi.SYSFS_software_spi_transfer(data[0])
     
 def spi_readbytes(reg):
+    if SPI_TRANSPORT == 'spidev':
+        return SPI.xfer2([reg])[0]
     return spi.SYSFS_software_spi_transfer(reg)
+
+def _spidev_transfer(tx, rx_len, delay_us):
+    if not (tx and rx_len and delay_us):
+        return SPI.xfer2(list(tx) + [0] * rx_len)[len(tx):]
+    # tx, a gap of delay_us, then rx_len bytes: one SPI_IOC_MESSAGE(2) ioctl
+    tx_buf = ctypes.create_string_buffer(bytes(tx), len(tx))
+    rx_buf = ctypes.create_string_buffer(rx_len)
+    xfers = (_SpiIocTransfer * 2)()
+    xfers[0].tx_buf = ctypes.addressof(tx_buf)
+    xfers[0].len = len(tx)
+    xfers[0].delay_usecs = delay_us
+    xfers[1].rx_buf = ctypes.addressof(rx_buf)
+    xfers[1].len = rx_len
+    for xfer in xfers:
+        xfer.speed_hz = SPI_SPEED_HZ
+        xfer.bits_per_word = 8
+    fcntl.ioctl(SPI.fileno(), _spi_ioc_message(2), ctypes.addressof(xfers))
+    return list(rx_buf.raw)
+
+def _soft_transfer(tx, rx_len, delay_us):
+    for byte in tx:
+        spi.SYSFS_software_spi_transfer(byte)
+    if delay_us:
+        _busy_wait_us(delay_us)
+    return [spi.SYSFS_software_spi_transfer(0xff) & 0xff for _ in range(rx_len)]
+
+def spi_transfer(tx, rx_len=0, delay_us=0):
+    """ Writes tx and then reads rx_len bytes as a single transaction (CS low
+        throughout). delay_us is the gap in microseconds between the last tx byte
+        and the first rx byte (e.g. datasheet t6 after RDATA/RREG).
+        Returns the rx bytes as a list.
+    """
+    GPIO.output(CS_PIN, GPIO.LOW)
+    try:
+        if SPI_TRANSPORT == 'spidev':
+            return _spidev_transfer(tx, rx_len, delay_us)
+        return _soft_transfer(tx, rx_len, delay_us)
+    finally:
+        GPIO.output(CS_PIN, GPIO.HIGH)
     
 def module_init():
     GPIO.setmode(GPIO.BCM)
     GPIO.setwarnings(False)
     GPIO.setup(RST_PIN, GPIO.OUT)
-    GPIO.setup(CS_PIN, GPIO.OUT)
+    GPIO.setup(CS_PIN, GPIO.OUT, initial=GPIO.HIGH)
     GPIO.setup(DRDY_PIN, GPIO.IN)
-    spi.SYSFS_software_spi_begin()
-    spi.SYSFS_software_spi_setDataMode(0) 
-    spi.SYSFS_software_spi_setClockDivider(1)
+    if SPI_TRANSPORT == 'spidev':
+        SPI.open(SPI_BUS, SPI_DEVICE)
+        SPI.max_speed_hz = SPI_SPEED_HZ
+        SPI.mode = 0b01 # CPOL=0, CPHA=1
+    else:
+        spi.SYSFS_software_spi_begin()
+        spi.SYSFS_software_spi_setDataMode(0) 
+        spi.SYSFS_software_spi_setClockDivider(1)
     return 0;
 def module_exit():
-    spi.SYSFS_software_spi_end()
+    if SPI_TRANSPORT == 'spidev':
+        SPI.close()
+    else:
+        spi.SYSFS_software_spi_end()
     GPIO.output(RST_PIN, 0)
     GPIO.output(CS_PIN, 1)
     
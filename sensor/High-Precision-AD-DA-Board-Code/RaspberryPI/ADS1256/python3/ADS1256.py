@@ -1,7 +1,7 @@
 import config
 # import RPi.GPIO as GPIO # Removed this import
 import time
-ScanMode = 0
+import numpy as np
 
 # --- Constants (GAIN, DRATE, REG, CMD) remain unchanged ---
 # gain channel
@@ -28,11 +28,30 @@ ADS1256_DRATE_E = {'ADS1256_30000SPS' : 0xF0, # reset the default values
                    'ADS1256_30SPS' : 0x53,
                    'ADS1256_25SPS' : 0x43,
                    'ADS1256_15SPS' : 0x33,
-                   'ADS1256_10SPS' : 0x20,
+                   'ADS1256_10SPS' : 0x23,
                    'ADS1256_5SPS' : 0x13,
                    'ADS1256_2d5SPS' : 0x03
                   }
 
+# settling time after SYNC or a MUX change, in microseconds (datasheet Table 13)
+ADS1256_SETTLE_US = {0xF0 : 210,    # 30000SPS
+                     0xE0 : 250,    # 15000SPS
+                     0xD0 : 310,    # 7500SPS
+                     0xC0 : 440,    # 3750SPS
+                     0xB0 : 680,    # 2000SPS
+                     0xA1 : 1180,   # 1000SPS
+                     0x92 : 2180,   # 500SPS
+                     0x82 : 10180,  # 100SPS
+                     0x72 : 16840,  # 60SPS
+                     0x63 : 20180,  # 50SPS
+                     0x53 : 33510,  # 30SPS
+                     0x43 : 40180,  # 25SPS
+                     0x33 : 66840,  # 15SPS
+                     0x23 : 100180, # 10SPS
+                     0x13 : 200180, # 5SPS
+                     0x03 : 400180, # 2.5SPS
+                    }
+
 # registration definition
 REG_E = {'REG_STATUS' : 0,  # x1H
          'REG_MUX' : 1,     # 01H
@@ -64,57 +83,206 @@ CMD = {'CMD_WAKEUP' : 0x00,     # Completes SYNC and Exits Standby Mode 0000  00
        'CMD_RESET' : 0xFE,      # Reset to Power-Up Values 1111   1110 (FEh)
       }
 
+DRDY_TIMEOUT_S = 1.0 # Longest wait for a conversion before giving up
+
+# Datasheet t6: delay between a read command and the first data SCLK (50 tCLKIN ~ 6.5us)
+T6_DELAY_US = 7
+
+MAX_ADC_COUNT = 0x7FFFFF # Positive full-scale code (+VREF)
+
+# --- Scan tables ---
+# A scan table is a list of entries, one conversion slot each, read in order by
+# ADS1256_ScanTable(). Each entry is a dict:
+#   'channel': input number (0-7 single-ended, 0-3 differential pair)
+#   'mode':    0 single-ended (P = AIN[channel], N = AINCOM), 1 differential pair
+#              (default: the instance's scan_mode)
+#   'gain':    ADS1256_GAIN_E value (default GAIN_1)
+#   'drate':   ADS1256_DRATE_E value (default 30000SPS)
+#   'buffer':  True to enable the analog input buffer (default False)
+#   'every':   read the entry only on every Nth scan (default 1)
+#   'ofc', 'fsc': offset / full-scale calibration register values, as filled
+#              in by ADS1256_CalibrateScanEntry() (default: left as they are)
+# Auto-calibration (ACAL) is off for scan tables: it would run a self-calibration
+# on every gain or data rate switch between entries. Entries carry their own
+# OFC/FSC values instead.
+SCAN_DEFAULT_GAIN = ADS1256_GAIN_E['ADS1256_GAIN_1']
+SCAN_DEFAULT_DRATE = ADS1256_DRATE_E['ADS1256_30000SPS']
+STATUS_BUFEN = 1 << 1 # STATUS bit: analog input buffer enable
+
+# --- Sample decoding ---
+def codes_to_voltage(codes, vref):
+    """ Converts signed conversion codes (array or scalar) to volts: code / 0x7FFFFF * vref. """
+    return np.asarray(codes, dtype=np.float64) * (vref / MAX_ADC_COUNT)
+
+def decode_samples(buf, vref=None):
+    """ Decodes a bytes/bytearray of N x 3 big-endian 24-bit conversions.
+        Returns a signed int32 array, or (codes, volts) when vref is given.
+    """
+    raw = np.frombuffer(buf, dtype=np.uint8).reshape(-1, 3)
+    # Place each sample in the top 3 bytes of a big-endian int32; the arithmetic
+    # right shift then sign-extends bit 23 for the whole array at once.
+    words = np.zeros((raw.shape[0], 4), dtype=np.uint8)
+    words[:, :3] = raw
+    codes = (words.view('>i4').ravel() >> 8).astype(np.int32)
+    if vref is None:
+        return codes
+    return codes, codes_to_voltage(codes, vref)
+
+def calibration_regs(ofc=None, fsc=None):
+    """ Returns {reg: value} for the OFC0-2 / FSC0-2 calibration registers.
+        Each holds a 24-bit value, least significant byte first; None leaves it out.
+    """
+    regs = {}
+    for value, reg in ((ofc, REG_E['REG_OFC0']), (fsc, REG_E['REG_FSC0'])):
+        if value is not None:
+            for i in range(3):
+                regs[reg + i] = ((value & 0xFFFFFF) >> (8 * i)) & 0xFF
+    return regs
+
+def scan_table_rate_hz(entries):
+    """ Approximate scans per second of a scan table. Each entry read costs one
+        settling time at its data rate, spread over the scans it takes part in.
+    """
+    settle_us = sum(ADS1256_SETTLE_US[entry.get('drate', SCAN_DEFAULT_DRATE)] / entry.get('every', 1)
+                    for entry in entries)
+    return 1e6 / settle_us if settle_us else 0.0
+
 class ADS1256:
-    def __init__(self):
-        self.rst_pin = config.RST_PIN
-        self.cs_pin = config.CS_PIN
-        self.drdy_pin = config.DRDY_PIN
-        # Note: GPIO devices are now managed within the config module
+    def __init__(self, board=None):
+        # Each instance owns its SPI device, CS, DRDY and RST lines through a
+        # config.Board; without one it drives the default board's pins.
+        self.board = board if board is not None else config.default_board
+        self.rst_pin = self.board.rst_pin
+        self.cs_pin = self.board.cs_pin
+        self.drdy_pin = self.board.drdy_pin
+        self.scan_mode = 0 # 0: single-ended inputs, 1: differential pairs
+        self.continuous = False # True while the chip is in RDATAC mode
+        self._rdatac_pending = None
+        self._cycle_mux = None # MUX (or scan-table registers) of the conversion running in a cycling scan
+        # Shadow copy of the writable config registers {reg: value}; a missing
+        # entry means the chip's value is unknown (after reset/power-up).
+        self._regs = {}
+        self.reg_cache_hits = 0   # Writes skipped because the value was unchanged
+        self.reg_cache_misses = 0 # Writes actually sent to the chip
+        # DRDY wait timing, see ADS1256_DRDYWaitStats()
+        self.drdy_last_wait_s = 0.0
+        self.drdy_wait_count = 0
+        self.drdy_wait_total_s = 0.0
+        self.drdy_wait_max_s = 0.0
+        self.drdy_timeouts = 0
+        # Note: GPIO devices are now managed by the config.Board
 
     # Hardware reset
     def ADS1256_reset(self):
+        self._regs = {} # Registers return to power-up values
+        if self.rst_pin is None:
+            # RESET pin not wired: use the RESET command instead
+            self.ADS1256_WriteCmd(CMD['CMD_RESET'])
+            config.delay_ms(200)
+            return
         # Use 1 for HIGH, 0 for LOW
-        config.digital_write(self.rst_pin, 1)
+        self.board.digital_write(self.rst_pin, 1)
         config.delay_ms(200)
-        config.digital_write(self.rst_pin, 0)
+        self.board.digital_write(self.rst_pin, 0)
         config.delay_ms(200)
-        config.digital_write(self.rst_pin, 1)
+        self.board.digital_write(self.rst_pin, 1)
 
+    # Each command, register access and data read below is ONE board.spi_transfer()
+    # call, which handles chip-select and issues a single SPI ioctl.
     def ADS1256_WriteCmd(self, reg):
-        # Use 0 for LOW, 1 for HIGH
-        config.digital_write(self.cs_pin, 0) # cs low
-        config.spi_writebyte([reg])
-        config.digital_write(self.cs_pin, 1) # cs high
+        self.board.spi_transfer([reg])
 
     def ADS1256_WriteReg(self, reg, data):
-        # Use 0 for LOW, 1 for HIGH
-        config.digital_write(self.cs_pin, 0) # cs low
-        config.spi_writebyte([CMD['CMD_WREG'] | reg, 0x00, data])
-        config.digital_write(self.cs_pin, 1) # cs high
+        self.board.spi_transfer([CMD['CMD_WREG'] | reg, 0x00, data])
+        self._regs[reg] = data
+        self._cycle_mux = None # Any direct register write breaks a cycling scan
+
+    def ADS1256_SetReg(self, reg, data):
+        """ Writes a register only if the shadow copy says its value changes.
+            Returns True if WREG was sent, False if the write was skipped.
+        """
+        if self._regs.get(reg) == data:
+            self.reg_cache_hits += 1
+            return False
+        self.reg_cache_misses += 1
+        self.ADS1256_WriteReg(reg, data)
+        return True
+
+    def ADS1256_SetRegs(self, values):
+        """ Writes {reg: value} with one WREG per run of consecutive registers,
+            covering only the span whose shadow values differ.
+            Returns True if anything was written.
+        """
+        regs = sorted(values)
+        wrote = False
+        start = 0
+        while start < len(regs):
+            end = start
+            while end + 1 < len(regs) and regs[end + 1] == regs[end] + 1:
+                end += 1
+            run = regs[start:end + 1]
+            start = end + 1
+            changed = [reg for reg in run if self._regs.get(reg) != values[reg]]
+            if not changed:
+                self.reg_cache_hits += len(run)
+                continue
+            first, last = changed[0], changed[-1]
+            self.reg_cache_hits += len(run) - (last - first + 1)
+            self.reg_cache_misses += last - first + 1
+            # WREG starting at `first`, count-1 registers, followed by their values
+            self.board.spi_transfer([CMD['CMD_WREG'] | first, last - first] +
+                                    [values[reg] for reg in range(first, last + 1)])
+            for reg in range(first, last + 1):
+                self._regs[reg] = values[reg]
+            wrote = True
+        if wrote:
+            self._cycle_mux = None
+        return wrote
+
+    def ADS1256_RegCacheStats(self):
+        """ Returns the register shadow cache hit/miss counters. """
+        return {'hits': self.reg_cache_hits, 'misses': self.reg_cache_misses}
 
     def ADS1256_Read_data(self, reg):
-        # Use 0 for LOW, 1 for HIGH
-        config.digital_write(self.cs_pin, 0) # cs low
-        config.spi_writebyte([CMD['CMD_RREG'] | reg, 0x00])
-        # Small delay might be needed depending on SPI speed and device response time
-        # config.delay_ms(1)
-        data = config.spi_readbytes(1)
-        #buf = config.spi_readbytes(3)
-        #print(f"DEBUG: Raw SPI buffer read: {buf}")
-        config.digital_write(self.cs_pin, 1) # cs high
+        # RREG needs the t6 delay before the register value is clocked out
+        data = self.board.spi_transfer([CMD['CMD_RREG'] | reg, 0x00], 1, T6_DELAY_US)
         return data
 
-    def ADS1256_WaitDRDY(self):
-        # DRDY is active low. Wait until config.digital_read returns 0.
-        # Add a timeout mechanism
-        timeout = time.time() + 1.0 # 1 second timeout
-        while time.time() < timeout:
-            if config.digital_read(self.drdy_pin) == 0:
-                return True # Success
+    def ADS1256_ReadRegs(self, reg, count):
+        """ Reads `count` consecutive registers starting at reg with one RREG. """
+        return self.board.spi_transfer([CMD['CMD_RREG'] | reg, count - 1], count, T6_DELAY_US)
+
+    def ADS1256_WaitDRDY(self, timeout=DRDY_TIMEOUT_S):
+        # DRDY is active low. Sleep until its falling edge instead of spinning,
+        # and record how long each wait took.
+        ready, waited = self.board.wait_drdy(timeout)
+        self.drdy_last_wait_s = waited
+        self.drdy_wait_count += 1
+        self.drdy_wait_total_s += waited
+        self.drdy_wait_max_s = max(self.drdy_wait_max_s, waited)
+        if ready:
+            return True # Success
         # Timeout occurred
+        self.drdy_timeouts += 1
         print ("ADS1256_WaitDRDY() Time Out ...\r\n")
         return False # Failure
 
+    def ADS1256_DRDYWaitStats(self):
+        """ Returns DRDY wait timing since the last call and resets the counters. """
+        count = self.drdy_wait_count
+        stats = {
+            'waits': count,
+            'timeouts': self.drdy_timeouts,
+            'last_s': self.drdy_last_wait_s,
+            'mean_s': self.drdy_wait_total_s / count if count else 0.0,
+            'max_s': self.drdy_wait_max_s,
+        }
+        self.drdy_wait_count = 0
+        self.drdy_wait_total_s = 0.0
+        self.drdy_wait_max_s = 0.0
+        self.drdy_timeouts = 0
+        return stats
+
 
     def ADS1256_ReadChipID(self):
         if not self.ADS1256_WaitDRDY():
@@ -146,12 +314,10 @@ class ADS1256:
         # GPIO: All default to inputs (can be changed if needed)
         # buf[4] = 0xE0 # Example if setting some GPIOs on the chip
 
-        # Use 0 for LOW, 1 for HIGH
-        config.digital_write(self.cs_pin, 0) # cs low
-        # Write to registers starting from REG_STATUS (address 0) for 4 registers (0, 1, 2, 3)
-        config.spi_writebyte([CMD['CMD_WREG'] | REG_E['REG_STATUS'], 0x03]) # 0x03 means write 4 registers (count-1)
-        config.spi_writebyte(buf[0:4]) # Write the first 4 buffer bytes
-        config.digital_write(self.cs_pin, 1) # cs high
+        # Registers 0-3 (STATUS, MUX, ADCON, DRATE) are contiguous, so write the
+        # span between the first and last register whose shadow value differs.
+        if not self.ADS1256_SetRegs({reg: buf[reg] for reg in range(4)}):
+            return True # Already configured, nothing to write
 
         config.delay_ms(1) # Short delay after configuration
         return True # Indicate success
@@ -162,7 +328,7 @@ class ADS1256:
             print(f"Error: Channel {Channal} is out of range (0-7).")
             return False
         # MUX : P = AIN[Channal], N = AINCOM (1000)
-        self.ADS1256_WriteReg(REG_E['REG_MUX'], (Channal << 4) | (1 << 3))
+        self.ADS1256_SetReg(REG_E['REG_MUX'], (Channal << 4) | (1 << 3))
         return True
 
     def ADS1256_SetDiffChannal(self, Channal):
@@ -177,15 +343,71 @@ class ADS1256:
             print(f"Error: Differential channel pair {Channal} is out of range (0-3).")
             return False
 
-        self.ADS1256_WriteReg(REG_E['REG_MUX'], mux_lookup[Channal])
+        self.ADS1256_SetReg(REG_E['REG_MUX'], mux_lookup[Channal])
         return True
 
+    def ADS1256_ChannelMux(self, Channel, Mode=None):
+        """ Returns the MUX register value for a channel in Mode (default: the
+            current scan_mode), or None if out of range.
+        """
+        if Mode is None:
+            Mode = self.scan_mode
+        if Mode == 0: # Single-ended: P = AIN[Channel], N = AINCOM
+            if not (0 <= Channel <= 7):
+                print(f"Error: Single-ended channel {Channel} out of range (0-7).")
+                return None
+            return (Channel << 4) | (1 << 3)
+        # Differential pairs: 0: 0-1, 1: 2-3, 2: 4-5, 3: 6-7
+        if not (0 <= Channel <= 3):
+            print(f"Error: Differential channel pair {Channel} out of range (0-3).")
+            return None
+        return ((2 * Channel) << 4) | (2 * Channel + 1)
+
     def ADS1256_SetMode(self, Mode):
-        global ScanMode
-        ScanMode = Mode
+        self.scan_mode = Mode
+
+    def ADS1256_ScanEntryRegs(self, entry):
+        """ Returns the {reg: value} settings of a scan-table entry, or None if
+            its channel is out of range.
+        """
+        mux = self.ADS1256_ChannelMux(entry['channel'], entry.get('mode'))
+        if mux is None:
+            return None
+        regs = {REG_E['REG_STATUS']: STATUS_BUFEN if entry.get('buffer') else 0,
+                REG_E['REG_MUX']: mux,
+                REG_E['REG_ADCON']: entry.get('gain', SCAN_DEFAULT_GAIN),
+                REG_E['REG_DRATE']: entry.get('drate', SCAN_DEFAULT_DRATE)}
+        regs.update(calibration_regs(entry.get('ofc'), entry.get('fsc')))
+        return regs
+
+    def ADS1256_CalibrateScanEntry(self, entry, Command=CMD['CMD_SELFCAL']):
+        """ Runs a calibration command (default SELFCAL; SYSOCAL/SYSGCAL with the
+            system's zero/full-scale applied to the entry's input) with the
+            entry's channel, gain, data rate and buffer setting, and stores the
+            resulting calibration register values in entry['ofc'] and entry['fsc'].
+            Returns False on a DRDY timeout.
+        """
+        regs = self.ADS1256_ScanEntryRegs({k: v for k, v in entry.items() if k not in ('ofc', 'fsc')})
+        if regs is None or not self.ADS1256_WaitDRDY():
+            return False
+        self.ADS1256_SetRegs(regs)
+        self.ADS1256_WriteCmd(Command)
+        self._cycle_mux = None
+        # DRDY goes low again once the calibration is done; at low data rates
+        # that takes several conversion periods.
+        settle_s = ADS1256_SETTLE_US[regs[REG_E['REG_DRATE']]] * 1e-6
+        if not self.ADS1256_WaitDRDY(max(DRDY_TIMEOUT_S, 4 * settle_s)):
+            return False
+        cal = self.ADS1256_ReadRegs(REG_E['REG_OFC0'], 6)
+        for i, value in enumerate(cal):
+            self._regs[REG_E['REG_OFC0'] + i] = value
+        ofc = cal[0] | (cal[1] << 8) | (cal[2] << 16)
+        entry['ofc'] = ofc - 0x1000000 if ofc & 0x800000 else ofc # Offset is two's complement
+        entry['fsc'] = cal[3] | (cal[4] << 8) | (cal[5] << 16)
+        return True
 
     def ADS1256_init(self):
-        if (config.module_init() != 0):
+        if (self.board.module_init() != 0):
             print("Hardware Initialization failed.")
             return -1
 
@@ -215,59 +437,42 @@ class ADS1256:
         if not self.ADS1256_WaitDRDY():
             return None # Return None to indicate failure (timeout)
 
-        # Use 0 for LOW, 1 for HIGH
-        config.digital_write(self.cs_pin, 0) # cs low
-        config.spi_writebyte([CMD['CMD_RDATA']])
-        # Datasheet suggests minimum t6 delay (4*tCLKIN) before reading data
-        # With 7.68MHz clock, tCLKIN=130ns. 4*tCLKIN ~ 0.52us.
-        # A tiny delay might be beneficial at high SPI speeds, but often unnecessary
-        # config.delay_ms(1) # Probably too long, use us delay if needed
+        return self._read_conversion()
 
-        buf = config.spi_readbytes(3)
-        config.digital_write(self.cs_pin, 1) # cs high
+    def _read_conversion(self):
+        """ Reads the completed conversion with RDATA (caller has waited for DRDY). """
+        # RDATA, the t6 delay and the 3 data bytes go out as one transaction
+        buf = self.board.spi_transfer([CMD['CMD_RDATA']], 3, T6_DELAY_US)
 
         # Combine bytes and handle sign extension for 24-bit data
         read = (buf[0] << 16) | (buf[1] << 8) | buf[2]
 
-        # Sign extension if the MSB (bit 23) is 1
+        # Negative if the MSB (bit 23) is 1: convert two's complement to a signed int
         if (read & 0x800000):
-            # Extend the sign bit (1s) to the left for a 32-bit representation
-            read |= 0xFF000000
-            # Python handles large integers, but this makes it explicit
-            # Or convert to a signed integer representation if needed elsewhere
-            # Example: Convert to signed 32-bit int
-            # if read > 0x7FFFFF: # If negative
-            #    read -= 0x1000000
+            read -= 0x1000000
 
         return read
 
     def ADS1256_GetChannalValue(self, Channel):
-        global ScanMode
         value = None # Default to None (indicating error or invalid channel)
 
-        if ScanMode == 0: # Single-ended input
-            if not (0 <= Channel <= 7):
-                print(f"Error: Single-ended channel {Channel} out of range (0-7).")
-                return None
-            if not self.ADS1256_SetChannal(Channel):
-                 return None # Error setting channel
-        else: # Differential input
-            if not (0 <= Channel <= 3):
-                print(f"Error: Differential channel pair {Channel} out of range (0-3).")
-                return None
-            if not self.ADS1256_SetDiffChannal(Channel):
-                 return None # Error setting channel
+        # Single-ended (scan_mode 0) or differential input; validates the range
+        mux = self.ADS1256_ChannelMux(Channel)
+        if mux is None:
+            return None # Error setting channel
 
-        # --- Common sequence for both modes ---
-        self.ADS1256_WriteCmd(CMD['CMD_SYNC'])
-        # SYNC command requires minimum 24 tCLKIN delay (~3.1us for 7.68MHz clock)
-        # A small software delay might be added here if timing is critical, but
-        # the subsequent WAKEUP and WaitDRDY usually provide enough delay.
-        # config.delay_ms(1) # Likely excessive
+        # --- Only a changed MUX needs the write + SYNC/WAKEUP restart ---
+        # Polling the same channel again just reads the next conversion.
+        if self.ADS1256_SetReg(REG_E['REG_MUX'], mux):
+            self.ADS1256_WriteCmd(CMD['CMD_SYNC'])
+            # SYNC command requires minimum 24 tCLKIN delay (~3.1us for 7.68MHz clock)
+            # A small software delay might be added here if timing is critical, but
+            # the subsequent WAKEUP and WaitDRDY usually provide enough delay.
+            # config.delay_ms(1) # Likely excessive
 
-        self.ADS1256_WriteCmd(CMD['CMD_WAKEUP'])
-        # WAKEUP command requires minimum 24 tCLKIN delay (~3.1us)
-        # config.delay_ms(1) # Likely excessive
+            self.ADS1256_WriteCmd(CMD['CMD_WAKEUP'])
+            # WAKEUP command requires minimum 24 tCLKIN delay (~3.1us)
+            # config.delay_ms(1) # Likely excessive
 
         # Read the ADC data (includes WaitDRDY)
         value = self.ADS1256_Read_ADC_Data()
@@ -276,22 +481,160 @@ class ADS1256:
         return value
 
     def ADS1256_GetAll(self):
-        """ Reads all 8 single-ended channels. Assumes ScanMode is 0. """
-        global ScanMode
-        if ScanMode != 0:
-            print("Warning: ADS1256_GetAll() called but ScanMode is not 0 (Single-ended).")
-            # Or force ScanMode = 0 here? For now, just return empty.
+        """ Reads all 8 single-ended channels. Assumes scan_mode is 0. """
+        if self.scan_mode != 0:
+            print("Warning: ADS1256_GetAll() called but scan_mode is not 0 (Single-ended).")
+            # Or force scan_mode = 0 here? For now, just return empty.
             return []
 
-        ADC_Value = [0] * 8 # Initialize list
-        for i in range(8):
-            adc_reading = self.ADS1256_GetChannalValue(i)
-            if adc_reading is not None:
-                 ADC_Value[i] = adc_reading
-            else:
-                 # Handle error case, maybe set to a specific value like None or NaN?
-                 ADC_Value[i] = None # Indicate read failure for this channel
-                 print(f"Failed to read channel {i}")
+        ADC_Value = self.ADS1256_ScanChannels(list(range(8)))
+        if ADC_Value is None:
+            print("Failed to read channels (WaitDRDY Timeout?)")
+            return [None] * 8 # Indicate read failure for every channel
 
         return ADC_Value
+
+    # --- Input channel cycling (datasheet "Cycling Through the Multiplexer") ---
+    # After DRDY goes low the next channel's MUX is written and SYNC/WAKEUP
+    # restart conversion BEFORE the finished result is read out with RDATA.
+    # The output register still holds the previous channel's conversion, so
+    # the next channel settles while the current one is transferred and
+    # handed back to Python, instead of paying SPI + settling in series.
+    def ADS1256_ScanChannels(self, channels):
+        """ Reads each channel in `channels` once using the cycling sequence.
+            Returns raw codes in the same order, or None on an invalid channel
+            or DRDY timeout. The first channel's conversion is left running,
+            so back-to-back scans of the same list skip the priming step.
+        """
+        muxes = [self.ADS1256_ChannelMux(ch) for ch in channels]
+        if not muxes or None in muxes:
+            return None
+
+        if self._cycle_mux != muxes[0]:
+            # Prime the pipeline: start a conversion on the first channel
+            self.ADS1256_WriteReg(REG_E['REG_MUX'], muxes[0])
+            self.ADS1256_WriteCmd(CMD['CMD_SYNC'])
+            self.ADS1256_WriteCmd(CMD['CMD_WAKEUP'])
+            self._cycle_mux = muxes[0]
+
+        values = [None] * len(muxes)
+        for i in range(len(muxes)):
+            if not self.ADS1256_WaitDRDY():
+                self._cycle_mux = None # Pipeline state unknown, re-prime next time
+                return None
+            next_mux = muxes[(i + 1) % len(muxes)]
+            self.ADS1256_WriteReg(REG_E['REG_MUX'], next_mux)
+            self.ADS1256_WriteCmd(CMD['CMD_SYNC'])
+            self.ADS1256_WriteCmd(CMD['CMD_WAKEUP'])
+            values[i] = self._read_conversion() # Result for channels[i]
+            self._cycle_mux = next_mux
+
+        return values
+
+    def ADS1256_ScanTable(self, entries, scan_index=0):
+        """ Reads one scan of a scan table (see ADS1256_ScanEntryRegs) using the
+            cycling sequence. Switching from one entry to the next only writes
+            the registers that differ between them. Entries whose 'every' does
+            not divide scan_index are skipped in this scan.
+            Returns raw codes in entry order (None for skipped entries), or None
+            on an invalid entry or DRDY timeout.
+        """
+        def active(index):
+            return [i for i, entry in enumerate(entries) if index % entry.get('every', 1) == 0]
+
+        slots = active(scan_index)
+        regs = [self.ADS1256_ScanEntryRegs(entries[i]) for i in slots]
+        if not entries or None in regs:
+            return None
+        values = [None] * len(entries)
+        if not slots:
+            return values # Every entry sits this scan out
+
+        if self._cycle_mux != regs[0]:
+            # Prime the pipeline: start a conversion with the first entry's settings
+            self.ADS1256_SetRegs(regs[0])
+            self.ADS1256_WriteCmd(CMD['CMD_SYNC'])
+            self.ADS1256_WriteCmd(CMD['CMD_WAKEUP'])
+            self._cycle_mux = regs[0]
+
+        # The last slot primes the first entry of the NEXT scan, which differs
+        # from this scan's when entries with 'every' > 1 come and go.
+        next_slots = active(scan_index + 1)
+        wrap_regs = self.ADS1256_ScanEntryRegs(entries[next_slots[0]]) if next_slots else regs[0]
+        for k, i in enumerate(slots):
+            if not self.ADS1256_WaitDRDY():
+                self._cycle_mux = None # Pipeline state unknown, re-prime next time
+                return None
+            next_regs = regs[k + 1] if k + 1 < len(slots) else wrap_regs
+            self.ADS1256_SetRegs(next_regs)
+            self.ADS1256_WriteCmd(CMD['CMD_SYNC'])
+            self.ADS1256_WriteCmd(CMD['CMD_WAKEUP'])
+            values[i] = self._read_conversion() # Result for entries[i], converted with its settings
+            self._cycle_mux = next_regs
+
+        return values
+
+    # --- Continuous read (RDATAC) mode ---
+    # In RDATAC mode the chip shifts out each new conversion as soon as DRDY
+    # goes low, so each sample is a bare 3-byte read with no RDATA command. Only
+    # SDATAC and RESET are accepted while it is active, so MUX/config changes
+    # must be made before entering it.
+    def _rdatac_start(self):
+        if not self.ADS1256_WaitDRDY():
+            return False
+        # The conversion that was ready on entry comes back with the command
+        self._rdatac_pending = self.board.spi_transfer([CMD['CMD_RDATAC']], 3, T6_DELAY_US)
+        self.continuous = True
+        return True
+
+    def _rdatac_read(self, n):
+        buf = bytearray(3 * n)
+        count = 0
+        if self._rdatac_pending is not None and n > 0:
+            buf[0:3] = bytes(self._rdatac_pending)
+            self._rdatac_pending = None
+            count = 1
+        while count < n:
+            if not self.ADS1256_WaitDRDY():
+                break # Timeout: return what was collected
+            buf[3 * count:3 * count + 3] = bytes(self.board.spi_transfer([], 3))
+            count += 1
+        return decode_samples(buf[:3 * count])
+
+    def _rdatac_stop(self):
+        if not self.continuous:
+            return
+        self.ADS1256_WaitDRDY()
+        self.board.spi_transfer([CMD['CMD_SDATAC']])
+        self.continuous = False
+        self._rdatac_pending = None
+
+    def read_burst(self, n):
+        """ Reads n consecutive conversions of the current channel in RDATAC mode.
+            Returns a NumPy int32 array; it is shorter than n if DRDY timed out,
+            or None if continuous mode could not be entered.
+        """
+        if not self._rdatac_start():
+            return None
+        try:
+            return self._rdatac_read(n)
+        finally:
+            self._rdatac_stop()
+
+    def stream(self, burst_size, stop_event=None):
+        """ Generator that enters RDATAC once and yields bursts of burst_size
+            conversions as NumPy int32 arrays until stop_event is set, a burst
+            comes back short (DRDY timeout) or the generator is closed.
+        """
+        if not self._rdatac_start():
+            return
+        try:
+            while stop_event is None or not stop_event.is_set():
+                burst = self._rdatac_read(burst_size)
+                if burst.size:
+                    yield burst
+                if burst.size < burst_size:
+                    break
+        finally:
+            self._rdatac_stop()
 ### END OF FILE ###
\ No newline at end of file
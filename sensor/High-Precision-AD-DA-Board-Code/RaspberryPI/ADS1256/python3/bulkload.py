@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import collections
+import datetime
+import io
+import logging
+import struct
+import numpy as np
+import psycopg2
+import psycopg2.errorcodes
+import psycopg2.extras
+
+# ==============================================================================
+# Bulk loading of measurement rows into PostgreSQL.
+#
+# BulkLoader writes any number of rows to one table in a single round trip
+# with COPY ... FROM STDIN in binary format. The rows are encoded here:
+# sensdata goes over the wire as a binary numeric[] instead of the text form
+# psycopg2 builds for a nested Python list, and the samples of a whole array
+# are packed with one NumPy call instead of one Python object per sample.
+#
+# If the server rejects the binary data itself (e.g. a table whose column
+# types differ from the declared ones, see COPY_UNSUPPORTED), the loader falls
+# back to a multi-row INSERT ... VALUES, still one round trip, and tries COPY
+# again after COPY_RETRY_LOADS loads. Other errors, such as a missing table or
+# column before a migration is applied, are raised and leave COPY on.
+#
+# With unique (the columns of a unique constraint), rows that collide with a
+# row already in the table are skipped (ON CONFLICT DO NOTHING), so writing a
+# batch again after a lost connection or a replay cannot duplicate it. COPY
+# has no ON CONFLICT: the rows are copied into a temporary staging table and
+# moved from there with one INSERT ... SELECT. The staging table is created
+# once per connection (again after a reconnect) with ON COMMIT DELETE ROWS,
+# so a load is just the COPY and the INSERT ... SELECT; with commit False,
+# load each table at most once per transaction. If the transaction that
+# created it was rolled back, the next load creates it again.
+#
+# IdAllocator hands out ids from a table's own id sequence (the BigAutoField
+# of the GridSense models), reserving them a block at a time in one query, so
+# several writers can load the same table without colliding and no writer
+# needs SELECT MAX(id). Ids of a failed load are not reused: the sequence only
+# gets gaps.
+#
+# Column types: 'int4', 'int8', 'float8', 'numeric', 'numeric[]',
+# 'numeric[][]', 'timestamptz' and 'text'. Numeric values are sent with
+# NUMERIC_SCALE decimals, the scale of every numeric column of the
+# measurement tables (NUMERIC(5, 2)).
+# ==============================================================================
+
+NUMERIC_SCALE = 2
+ID_BLOCK_SIZE = 100 # Ids reserved per sequence round trip
+COPY_RETRY_LOADS = 1000 # INSERT loads after a rejected binary COPY before COPY is tried again
+
+# SQLSTATEs of a binary COPY the server cannot take (and INSERT can)
+COPY_UNSUPPORTED = {psycopg2.errorcodes.INVALID_BINARY_REPRESENTATION, psycopg2.errorcodes.BAD_COPY_FILE_FORMAT,
+                    psycopg2.errorcodes.DATATYPE_MISMATCH, psycopg2.errorcodes.FEATURE_NOT_SUPPORTED}
+
+# --- Clamping Limits for NUMERIC(5, 2) in DB ---
+NUMERIC_5_2_MAX = 999.99
+NUMERIC_5_2_MIN = -999.99
+# Longest time span of one measurement row: its delta_t_ms must fit NUMERIC(5, 2)
+ROW_SPAN_NS = int(NUMERIC_5_2_MAX * 1e6)
+
+# Columns of the GridSense measurement tables (MeasurementModel)
+MEASUREMENT_COLUMNS = (('id', 'int8'), ('sensor_id', 'int4'), ('sensdata', 'numeric[][]'),
+                       ('time', 'timestamptz'), ('rmsvalue', 'numeric'), ('sname', 'text'),
+                       ('stype', 'text'), ('thd', 'numeric'), ('pf', 'numeric'),
+                       ('expected_samples', 'int4'), ('received_samples', 'int4'),
+                       ('dropped_samples', 'int4'), ('first_seq', 'int8'))
+MEASUREMENT_KEY = ('sensor_id', 'time', 'first_seq') # Unique per batch (%(class)s_batch_key)
+# Columns of the decimated stream tables (DecimatedMeasurementModel), id from the table's sequence
+DECIMATED_COLUMNS = (('sensor_id', 'int4'), ('sensdata', 'numeric[]'), ('time', 'timestamptz'),
+                     ('rate_hz', 'float8'), ('rmsvalue', 'numeric'), ('sname', 'text'), ('stype', 'text'))
+DECIMATED_KEY = ('sensor_id', 'time')
+
+_COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0) # Signature, flags, header extension length
+_COPY_TRAILER = struct.pack('>h', -1)
+_NULL = struct.pack('>i', -1)
+_NUMERIC_OID = 1700
+_NUMERIC_POS = 0x0000
+_NUMERIC_NEG = 0x4000
+_PG_EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+_SCALE_FACTOR = 10 ** NUMERIC_SCALE
+_FRAC_GROUP = 10000 // _SCALE_FACTOR # Fractional digits fill the high end of a base-10000 digit
+
+# One numeric value with its length prefix, as an array element or a column.
+# Always two base-10000 digits (integer part, fraction); the server strips the zeros.
+_NUMERIC_DTYPE = np.dtype([('len', '>i4'), ('ndigits', '>i2'), ('weight', '>i2'), ('sign', '>u2'),
+                           ('dscale', '>i2'), ('int', '>i2'), ('frac', '>i2')])
+_NUMERIC_LEN = _NUMERIC_DTYPE.itemsize - 4
+
+def sensdata_array(times_ns, values):
+    """ The sensdata of one batch as an (n, 2) array of [value, delta_t_ms from the
+        first sample], clipped to NUMERIC(5, 2) and rounded to 2 decimals.
+    """
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    sensdata = np.empty((len(times_ns), 2))
+    sensdata[:, 0] = values
+    np.subtract(times_ns, times_ns[:1], out=sensdata[:, 1], casting='unsafe')
+    sensdata[:, 1] /= 1e6
+    np.clip(sensdata, NUMERIC_5_2_MIN, NUMERIC_5_2_MAX, out=sensdata)
+    return np.round(sensdata, 2, out=sensdata)
+
+def rms(values):
+    """ RMS of an array of values, clipped to NUMERIC(5, 2). """
+    return min(NUMERIC_5_2_MAX, float(np.sqrt(np.mean(np.square(values))))) if len(values) else 0.0
+
+def encode_numerics(values):
+    """ Binary numeric encoding (with length prefixes) of an array of values, flattened. """
+    scaled = np.round(np.asarray(values, dtype=np.float64).ravel() * _SCALE_FACTOR).astype(np.int64)
+    magnitude = np.abs(scaled)
+    if magnitude.size and magnitude.max() // _SCALE_FACTOR >= 10000:
+        raise ValueError("Numeric value too large for the bulk loader's encoding (|v| >= 10000)")
+    out = np.empty(len(scaled), dtype=_NUMERIC_DTYPE)
+    out['len'] = _NUMERIC_LEN
+    out['ndigits'] = 2
+    out['weight'] = 0
+    out['sign'] = np.where(scaled < 0, _NUMERIC_NEG, _NUMERIC_POS)
+    out['dscale'] = NUMERIC_SCALE
+    out['int'] = magnitude // _SCALE_FACTOR
+    out['frac'] = (magnitude % _SCALE_FACTOR) * _FRAC_GROUP
+    return out.tobytes()
+
+def _numeric_array(values, ndim):
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return struct.pack('>iii', 0, 0, _NUMERIC_OID)
+    if values.ndim != ndim:
+        raise ValueError(f"Expected a {ndim}-D array for a numeric{'[]' * ndim} column, got shape {values.shape}")
+    dims = b''.join(struct.pack('>ii', size, 1) for size in values.shape) # Size and lower bound 1
+    return struct.pack('>iii', ndim, 0, _NUMERIC_OID) + dims + encode_numerics(values)
+
+def _timestamptz(value):
+    if isinstance(value, (int, np.integer)): # ns since the epoch
+        return struct.pack('>q', int(value) // 1000 - 946684800 * 10 ** 6)
+    if value.tzinfo is None:
+        value = value.astimezone() # Naive: local time, as the server would read it
+    return struct.pack('>q', (value - _PG_EPOCH) // datetime.timedelta(microseconds=1))
+
+_ENCODERS = {
+    'int4': lambda value: struct.pack('>i', int(value)),
+    'int8': lambda value: struct.pack('>q', int(value)),
+    'float8': lambda value: struct.pack('>d', float(value)),
+    'numeric': lambda value: encode_numerics([value])[4:],
+    'numeric[]': lambda value: _numeric_array(value, 1),
+    'numeric[][]': lambda value: _numeric_array(value, 2),
+    'timestamptz': _timestamptz,
+    'text': lambda value: str(value).encode('utf-8'),
+}
+
+def _python_value(value):
+    """ Converts NumPy values to the Python types psycopg2 adapts. """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class IdAllocator:
+    """ Ids for new rows of table from the sequence of its id column, see the module comment. """
+    def __init__(self, table, column='id', block_size=ID_BLOCK_SIZE):
+        self.table = table
+        self.column = column
+        self.block_size = block_size
+        self.reserved = collections.deque() # Ids fetched and not handed out yet
+
+    def take(self, connection, count):
+        """ Returns count ids, reserving a new block (or more, for a large load) if needed.
+            Ids from different blocks need not be consecutive.
+        """
+        missing = count - len(self.reserved)
+        if missing > 0:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s);",
+                               (self.table, self.column, max(missing, self.block_size)))
+                self.reserved.extend(row[0] for row in cursor.fetchall())
+        return [self.reserved.popleft() for _ in range(count)]
+
+class BulkLoader:
+    """ Loads rows (tuples in `columns` order) into one table, see the module comment.
+        columns is a sequence of (name, type) pairs, unique the columns of a
+        unique constraint of the table to skip duplicate rows on.
+    """
+    def __init__(self, table, columns, use_copy=True, unique=None):
+        self.table = table
+        self.columns = tuple(columns)
+        self.use_copy = use_copy
+        self._insert_loads = None # Loads since binary COPY was rejected (None: not rejected)
+        self.unique = tuple(unique) if unique else None
+        self._staging_connection = None # Connection the staging table was created on
+        self._encoders = [_ENCODERS[column_type] for _, column_type in self.columns]
+        names = ', '.join(name for name, _ in self.columns)
+        conflict = f" ON CONFLICT ({', '.join(self.unique)}) DO NOTHING" if self.unique else ""
+        if self.unique:
+            staging = f"{table}_staging"
+            self._staging_sql = (f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS "
+                                 f"AS SELECT {names} FROM {table} WITH NO DATA")
+            self._copy_sql = f"COPY {staging} ({names}) FROM STDIN WITH (FORMAT binary)"
+            self._merge_sql = f"INSERT INTO {table} ({names}) SELECT {names} FROM {staging}{conflict}"
+        else:
+            self._copy_sql = f"COPY {table} ({names}) FROM STDIN WITH (FORMAT binary)"
+        self._insert_sql = f"INSERT INTO {table} ({names}) VALUES %s{conflict}"
+
+    def encode(self, rows):
+        """ The rows as a binary COPY stream. """
+        field_count = struct.pack('>h', len(self.columns))
+        chunks = [_COPY_HEADER]
+        for row in rows:
+            chunks.append(field_count)
+            for encoder, value in zip(self._encoders, row):
+                if value is None:
+                    chunks.append(_NULL)
+                else:
+                    data = encoder(value)
+                    chunks.append(struct.pack('>i', len(data)))
+                    chunks.append(data)
+        chunks.append(_COPY_TRAILER)
+        return b''.join(chunks)
+
+    def load(self, connection, rows, commit=True):
+        """ Writes the rows in one round trip (two with unique) and, unless
+            commit is False, commits. With commit False the rows join the
+            caller's open transaction. Returns the number of rows inserted,
+            without the duplicates skipped. Database errors other than a
+            rejected binary COPY are raised; the caller rolls back.
+        """
+        if not rows:
+            return 0
+        inserted = len(rows)
+        if self._insert_loads is not None and self._insert_loads >= COPY_RETRY_LOADS:
+            self.use_copy, self._insert_loads = True, None
+        if self.use_copy:
+            data = self.encode(rows)
+            try:
+                with connection.cursor() as cursor:
+                    if not commit: # Keep the caller's earlier statements if the COPY is rejected
+                        cursor.execute("SAVEPOINT bulkload")
+                    if self.unique and self._staging_connection is not connection:
+                        cursor.execute(self._staging_sql) # New connection: its session has no staging table
+                        self._staging_connection = connection
+                    cursor.copy_expert(self._copy_sql, io.BytesIO(data))
+                    if self.unique:
+                        cursor.execute(self._merge_sql)
+                        inserted = cursor.rowcount
+            except (psycopg2.DataError, psycopg2.ProgrammingError, psycopg2.NotSupportedError) as e:
+                # The staging table went with a rolled-back transaction; or the table itself is missing
+                staging_lost = (self._staging_connection is connection
+                                and e.pgcode == psycopg2.errorcodes.UNDEFINED_TABLE)
+                if not staging_lost and e.pgcode not in COPY_UNSUPPORTED and not isinstance(e, psycopg2.NotSupportedError):
+                    raise
+                if commit:
+                    connection.rollback()
+                else:
+                    with connection.cursor() as cursor:
+                        cursor.execute("ROLLBACK TO SAVEPOINT bulkload")
+                if staging_lost:
+                    self._staging_connection = None
+                    return self.load(connection, rows, commit)
+                logging.warning(f"Binary COPY into {self.table} rejected ({e}), "
+                                f"using INSERT ... VALUES for the next {COPY_RETRY_LOADS} loads.")
+                self.use_copy, self._insert_loads = False, 0
+        if not self.use_copy:
+            if self._insert_loads is not None:
+                self._insert_loads += 1
+            with connection.cursor() as cursor:
+                psycopg2.extras.execute_values(cursor, self._insert_sql,
+                                               [tuple(_python_value(value) for value in row) for row in rows],
+                                               page_size=len(rows))
+                if self.unique:
+                    inserted = cursor.rowcount
+        if commit:
+            connection.commit()
+        if inserted < len(rows):
+            logging.info(f"Skipped {len(rows) - inserted} of {len(rows)} row(s) already in {self.table}.")
+        return inserted
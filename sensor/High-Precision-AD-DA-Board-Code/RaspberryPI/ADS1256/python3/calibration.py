@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import json
+import logging
+import os
+import sys
+import numpy as np
+import ADS1256      # Import the ADS1256 library
+
+# ==============================================================================
+# Per-channel calibration profiles.
+#
+# The scripts turn a raw code into a sensor voltage in four steps:
+#     v = ((code / 0x7FFFFF * VREF) - DATASHEET_OFFSET_V) / MEASURED_GAIN - MEASURED_OFFSET_V
+# which is one affine map, v = code * scale + offset. A CalibrationProfile holds
+# the four parameters of one channel and applies the fused map to a whole
+# burst of codes at once.
+#
+# A profile may also carry the chip's OFC/FSC calibration register values,
+# from a SELFCAL (and optionally SYSOCAL) run at the profile's gain and data
+# rate. load_into() writes them back to the ADC at start-up.
+#
+# Profiles are stored in a JSON file (calibration.json next to the scripts) or
+# in the adc_calibration table of the GridSense database, keyed by (board, channel).
+# ==============================================================================
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibration.json')
+DB_TABLE = "adc_calibration" # GridSense.models.AdcCalibration
+
+class CalibrationProfile:
+    """ Calibration of one ADC channel, see the module comment.
+        adc_gain / adc_drate are the ADS1256_GAIN_E / ADS1256_DRATE_E values the
+        OFC/FSC registers were calibrated at (None if the profile has none).
+    """
+    FIELDS = ('board', 'channel', 'vref', 'datasheet_offset_v', 'measured_gain', 'measured_offset_v',
+              'adc_gain', 'adc_drate', 'ofc', 'fsc')
+
+    def __init__(self, channel, board=0, vref=5.0, datasheet_offset_v=0.0, measured_gain=1.0,
+                 measured_offset_v=0.0, adc_gain=None, adc_drate=None, ofc=None, fsc=None):
+        self.board = board
+        self.channel = channel
+        self.vref = vref
+        self.datasheet_offset_v = datasheet_offset_v
+        self.measured_gain = measured_gain
+        self.measured_offset_v = measured_offset_v
+        self.adc_gain = adc_gain
+        self.adc_drate = adc_drate
+        self.ofc = ofc
+        self.fsc = fsc
+
+    def __repr__(self):
+        return (f"CalibrationProfile(board={self.board}, channel={self.channel}, "
+                f"v = code * {self.scale:.6g} {self.offset:+.6g})")
+
+    @property
+    def key(self):
+        return (self.board, self.channel)
+
+    @property
+    def scale(self):
+        """ Volts per code of the fused transform. """
+        return self.vref / (ADS1256.MAX_ADC_COUNT * self.measured_gain)
+
+    @property
+    def offset(self):
+        """ Volts at code 0 of the fused transform. """
+        return 0.0 - self.datasheet_offset_v / self.measured_gain - self.measured_offset_v
+
+    def apply(self, codes):
+        """ Converts raw codes (array or scalar) to calibrated volts with one multiply-add. """
+        volts = np.multiply(codes, self.scale, dtype=np.float64)
+        volts += self.offset
+        return volts
+
+    def load_into(self, adc, gain=None, drate=None):
+        """ Writes the profile's OFC/FSC registers to the ADC. The values only hold
+            for the gain and data rate they were calibrated at, so nothing is
+            written when gain/drate (the ADC's current settings) differ.
+            Returns True if the registers were loaded.
+        """
+        if self.ofc is None or self.fsc is None:
+            return False
+        if (gain is not None and gain != self.adc_gain) or (drate is not None and drate != self.adc_drate):
+            logging.warning(f"Calibration registers of board {self.board} channel {self.channel} were measured at "
+                            f"gain {self.adc_gain} / drate {self.adc_drate}, not loaded for gain {gain} / drate {drate}.")
+            return False
+        adc.ADS1256_SetRegs(ADS1256.calibration_regs(self.ofc, self.fsc))
+        return True
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**{field: values[field] for field in cls.FIELDS if field in values})
+
+def get_profile(profiles, channel, board=0, default=None):
+    """ Looks up the profile of (board, channel) in a {key: profile} dict. """
+    return profiles.get((board, channel), default)
+
+def channel_profile(channel, fallback, board=0, path=DEFAULT_PROFILE_PATH, connection=None):
+    """ Returns the saved profile of (board, channel): from the calibration table
+        if a DB connection is given, else from the JSON file at path. Returns
+        fallback if there is none or the profiles cannot be read.
+    """
+    try:
+        profiles = load_profiles_db(connection) if connection is not None else load_profiles(path)
+    except Exception as e:
+        logging.warning(f"Could not read calibration profiles: {e}")
+        if connection is not None:
+            connection.rollback()
+        return fallback
+    profile = get_profile(profiles, channel, board)
+    if profile is None:
+        logging.warning(f"No calibration profile for board {board} channel {channel}, using the built-in values.")
+        return fallback
+    logging.info(f"Using {profile}")
+    return profile
+
+# --- JSON file ---
+def load_profiles(path=DEFAULT_PROFILE_PATH):
+    """ Reads {(board, channel): CalibrationProfile} from a JSON file ({} if it does not exist). """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        entries = json.load(f).get('profiles', [])
+    profiles = [CalibrationProfile.from_dict(entry) for entry in entries]
+    return {profile.key: profile for profile in profiles}
+
+def save_profiles(profiles, path=DEFAULT_PROFILE_PATH):
+    """ Writes the profiles (an iterable or a {key: profile} dict) to a JSON file, replacing it atomically. """
+    if isinstance(profiles, dict):
+        profiles = profiles.values()
+    data = {'profiles': [profile.to_dict() for profile in sorted(profiles, key=lambda p: p.key)]}
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+# --- Database table ---
+def load_profiles_db(connection, table=DB_TABLE):
+    """ Reads {(board, channel): CalibrationProfile} from the calibration table (psycopg2 connection). """
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {', '.join(CalibrationProfile.FIELDS)} FROM {table};")
+        rows = cursor.fetchall()
+    profiles = [CalibrationProfile.from_dict(dict(zip(CalibrationProfile.FIELDS, row))) for row in rows]
+    return {profile.key: profile for profile in profiles}
+
+def save_profiles_db(connection, profiles, table=DB_TABLE):
+    """ Inserts or updates the profiles in the calibration table and commits. """
+    if isinstance(profiles, dict):
+        profiles = profiles.values()
+    columns = ', '.join(CalibrationProfile.FIELDS)
+    placeholders = ', '.join(['%s'] * len(CalibrationProfile.FIELDS))
+    updates = ', '.join(f"{field} = EXCLUDED.{field}" for field in CalibrationProfile.FIELDS[2:])
+    query = f"""
+    INSERT INTO {table}({columns}, updated) VALUES ({placeholders}, now())
+    ON CONFLICT (board, channel) DO UPDATE SET {updates}, updated = now();
+    """
+    with connection.cursor() as cursor:
+        for profile in profiles:
+            cursor.execute(query, tuple(getattr(profile, field) for field in CalibrationProfile.FIELDS))
+    connection.commit()
+
+# --- Calibration routine ---
+def calibrate_channel(adc, channel, vref, gain, drate, board=0, mode=0, buffer=False,
+                      measured_gain=1.0, datasheet_offset_v=0.0, measured_offset_v=0.0, zero_input=False):
+    """ Calibrates one channel at the given ADS1256 gain and data rate and
+        returns its CalibrationProfile, or None on a DRDY timeout.
+        Runs the chip's self-calibration (SELFCAL). With zero_input, the sensor
+        must be at its zero point (no signal): a system offset calibration
+        (SYSOCAL) then folds the sensor's bias and offset into the OFC register,
+        so the software offsets of the profile are zero.
+        measured_gain (the sensor's ratio) is measured externally and passed through.
+    """
+    entry = {'channel': channel, 'mode': mode, 'gain': gain, 'drate': drate, 'buffer': buffer}
+    if not adc.ADS1256_CalibrateScanEntry(entry):
+        return None
+    if zero_input:
+        if not adc.ADS1256_CalibrateScanEntry(entry, ADS1256.CMD['CMD_SYSOCAL']):
+            return None
+        datasheet_offset_v = measured_offset_v = 0.0 # Code 0 is now the sensor's zero point
+    return CalibrationProfile(channel, board=board, vref=vref, datasheet_offset_v=datasheet_offset_v,
+                              measured_gain=measured_gain, measured_offset_v=measured_offset_v,
+                              adc_gain=gain, adc_drate=drate, ofc=entry['ofc'], fsc=entry['fsc'])
+
+# --- Calibration Run Configuration (python3 calibration.py) ---
+# Channels of the default board to calibrate; merged into CALIBRATION_FILE.
+CALIBRATE_CHANNELS = [2, 4, 6]
+CALIBRATE_VREF = 5.065 # *** Measured Vref of the board ***
+CALIBRATE_GAIN = ADS1256.ADS1256_GAIN_E['ADS1256_GAIN_1']
+CALIBRATE_DRATE = ADS1256.ADS1256_DRATE_E['ADS1256_100SPS']
+CALIBRATE_MEASURED_GAIN = 759.1 # Sensor ratio, measured against a reference meter
+CALIBRATE_DATASHEET_OFFSET_V = 1.5 # Sensor output bias (datasheet), used without a zero-input run
+CALIBRATE_MEASURED_OFFSET_V = -1.348
+CALIBRATE_ZERO_INPUT = False # True: sensors are at zero (no line voltage/current), run SYSOCAL too
+CALIBRATION_FILE = DEFAULT_PROFILE_PATH
+
+if __name__ == "__main__":
+    import config # Import the config library (for init/exit)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        ADC = ADS1256.ADS1256()
+        if ADC.ADS1256_init() != 0:
+            logging.critical("Failed to initialize ADS1256 hardware. Exiting.")
+            sys.exit(1)
+        profiles = load_profiles(CALIBRATION_FILE)
+        for channel in CALIBRATE_CHANNELS:
+            profile = calibrate_channel(ADC, channel, CALIBRATE_VREF, CALIBRATE_GAIN, CALIBRATE_DRATE,
+                                        measured_gain=CALIBRATE_MEASURED_GAIN,
+                                        datasheet_offset_v=CALIBRATE_DATASHEET_OFFSET_V,
+                                        measured_offset_v=CALIBRATE_MEASURED_OFFSET_V,
+                                        zero_input=CALIBRATE_ZERO_INPUT)
+            if profile is None:
+                logging.error(f"Calibration of channel {channel} timed out (WaitDRDY).")
+                continue
+            profiles[profile.key] = profile
+            logging.info(f"Channel {channel}: OFC={profile.ofc}, FSC={profile.fsc:#08x}, {profile}")
+        save_profiles(profiles, CALIBRATION_FILE)
+        logging.info(f"Saved {len(profiles)} calibration profile(s) to {CALIBRATION_FILE}")
+    finally:
+        config.module_exit()
@@ -27,101 +27,275 @@
 # THE SOFTWARE.
 #
 
-import spidev
-from gpiozero import DigitalOutputDevice, DigitalInputDevice # Import gpiozero classes
+import ctypes
+import fcntl
+import os
+import threading
 import time
 
-# Pin definition (Using BCM numbering)
+# --- Hardware backend ---
+# "hw":  spidev + gpiozero on the Raspberry Pi.
+# "sim": the software ADS1256 in simboard.py, so the acquisition stack can be
+#        run and load-tested on a machine without SPI/GPIO.
+# Selected with the ADS1256_BACKEND environment variable, e.g. ADS1256_BACKEND=sim.
+BACKEND = os.environ.get('ADS1256_BACKEND', 'hw')
+
+if BACKEND == 'hw':
+    import spidev
+    from gpiozero import DigitalOutputDevice, DigitalInputDevice # Import gpiozero classes
+elif BACKEND == 'sim':
+    import simboard
+else:
+    raise ValueError(f"Unknown ADS1256_BACKEND '{BACKEND}' (expected 'hw' or 'sim')")
+
+# Pin definition (Using BCM numbering) for the default board
 RST_PIN         = 18
 CS_PIN          = 22
 DRDY_PIN        = 17
 
-# --- Global variables for GPIO device objects ---
-# These will be initialized in module_init()
-rst_pin_device = None
-cs_pin_device = None
-drdy_pin_device = None
+# SPI settings for the default board
+SPI_BUS         = 0
+SPI_DEVICE      = 0
+SPI_SPEED_HZ    = 2000000
+# True: the kernel drives CS for every transaction. The board's CS is on
+# GPIO22, so this needs "dtoverlay=spi0-1cs,cs0_pin=22" in /boot/config.txt.
+# False: CS is toggled from Python through gpiozero around each transaction.
+SPI_HW_CS       = False
 
-# SPI device, bus = 0, device = 0
-# Initialize SPI here or within module_init
-SPI = spidev.SpiDev()
+# --- Combined SPI transactions ---
+# struct spi_ioc_transfer from <linux/spi/spidev.h>
+class _SpiIocTransfer(ctypes.Structure):
+    _fields_ = [('tx_buf', ctypes.c_uint64),
+                ('rx_buf', ctypes.c_uint64),
+                ('len', ctypes.c_uint32),
+                ('speed_hz', ctypes.c_uint32),
+                ('delay_usecs', ctypes.c_uint16),
+                ('bits_per_word', ctypes.c_uint8),
+                ('cs_change', ctypes.c_uint8),
+                ('tx_nbits', ctypes.c_uint8),
+                ('rx_nbits', ctypes.c_uint8),
+                ('word_delay_usecs', ctypes.c_uint8),
+                ('pad', ctypes.c_uint8)]
 
-def digital_write(pin, value):
-    """ Writes to the specified GPIO pin. value should be 0 or 1. """
-    if pin == RST_PIN and rst_pin_device:
-        rst_pin_device.value = value
-    elif pin == CS_PIN and cs_pin_device:
-        cs_pin_device.value = value
-    else:
-        # Handle other pins or error if necessary
-        print(f"Warning: Attempted to write to unconfigured pin {pin}")
+def _spi_ioc_message(n):
+    """ SPI_IOC_MESSAGE(n) ioctl request number. """
+    return (1 << 30) | ((ctypes.sizeof(_SpiIocTransfer) * n) << 16) | (ord('k') << 8)
+
+# One lock per SPI bus. With software CS, a GPIO CS edge and the transfer
+# that follows are two steps, so boards sharing a bus must not interleave.
+_bus_locks = {}
+_bus_locks_guard = threading.Lock()
+
+def _bus_lock(bus):
+    with _bus_locks_guard:
+        return _bus_locks.setdefault(bus, threading.Lock())
+
+# Every Board that has been initialized, so module_exit() can release them all
+_open_boards = []
+
+class Board:
+    """ GPIO lines and SPI device of one ADS1256 board.
+        Several boards can share an SPI bus on different CS lines; each one
+        needs its own DRDY pin. rst_pin may be None if RESET is tied high.
+    """
+    def __init__(self, rst_pin=RST_PIN, cs_pin=CS_PIN, drdy_pin=DRDY_PIN,
+                 spi_bus=SPI_BUS, spi_device=SPI_DEVICE, hw_cs=SPI_HW_CS,
+                 spi_speed_hz=SPI_SPEED_HZ):
+        self.rst_pin = rst_pin
+        self.cs_pin = cs_pin
+        self.drdy_pin = drdy_pin
+        self.spi_bus = spi_bus
+        self.spi_device = spi_device
+        self.hw_cs = hw_cs
+        self.spi_speed_hz = spi_speed_hz
+        self.rst_pin_device = None
+        self.cs_pin_device = None
+        self.drdy_pin_device = None
+        self.SPI = spidev.SpiDev()
+        self.bus_lock = _bus_lock(spi_bus)
+
+    def __repr__(self):
+        return f"Board(spi{self.spi_bus}.{self.spi_device}, cs={self.cs_pin}, drdy={self.drdy_pin})"
+
+    def digital_write(self, pin, value):
+        """ Writes to the specified GPIO pin. value should be 0 or 1. """
+        if pin == self.rst_pin and self.rst_pin_device:
+            self.rst_pin_device.value = value
+        elif pin == self.cs_pin and self.cs_pin_device:
+            self.cs_pin_device.value = value
+        else:
+            # Handle other pins or error if necessary
+            print(f"Warning: Attempted to write to unconfigured pin {pin}")
+
+    def digital_read(self, pin):
+        """ Reads from the specified GPIO pin. """
+        if pin == self.drdy_pin and self.drdy_pin_device:
+            # With pull_up=True gpiozero treats a LOW pin as active (value 1),
+            # so invert it to return the physical level the driver expects.
+            return 0 if self.drdy_pin_device.is_active else 1
+        else:
+            # Handle other pins or error if necessary
+            print(f"Warning: Attempted to read from unconfigured pin {pin}")
+            return None # Or raise an error
+
+    def wait_drdy(self, timeout):
+        """ Blocks until DRDY is low or timeout seconds pass.
+            The wait sleeps on gpiozero's edge-driven event for the falling edge
+            instead of polling the pin. Returns (ready, waited_seconds).
+        """
+        start = time.monotonic()
+        drdy = self.drdy_pin_device
+        if not drdy:
+            print(f"Warning: Attempted to wait on unconfigured pin {self.drdy_pin}")
+            return False, 0.0
+        deadline = start + timeout
+        while True:
+            # Check the live pin level first: the event can lag the pin by one
+            # callback right after a read has pulled DRDY high again.
+            if drdy.is_active:
+                return True, time.monotonic() - start
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False, time.monotonic() - start
+            drdy.wait_for_active(remaining)
+
+    def spi_writebyte(self, data):
+        """ Writes data (list of bytes) to SPI bus. """
+        self.SPI.writebytes(data)
+
+    def spi_readbytes(self, num_bytes):
+        """ Reads num_bytes from SPI bus. """
+        return self.SPI.readbytes(num_bytes)
 
+    def _spi_transfer_gapped(self, tx, rx_len, delay_us):
+        """ Sends tx, waits delay_us, then reads rx_len bytes in one SPI_IOC_MESSAGE(2) ioctl.
+            CS stays asserted across both segments, which xfer2 cannot do with a gap.
+        """
+        tx_buf = ctypes.create_string_buffer(bytes(tx), len(tx))
+        rx_buf = ctypes.create_string_buffer(rx_len)
+        xfers = (_SpiIocTransfer * 2)()
+        xfers[0].tx_buf = ctypes.addressof(tx_buf)
+        xfers[0].len = len(tx)
+        xfers[0].delay_usecs = delay_us
+        xfers[1].rx_buf = ctypes.addressof(rx_buf)
+        xfers[1].len = rx_len
+        for xfer in xfers:
+            xfer.speed_hz = self.spi_speed_hz
+            xfer.bits_per_word = 8
+        fcntl.ioctl(self.SPI.fileno(), _spi_ioc_message(2), ctypes.addressof(xfers))
+        return list(rx_buf.raw)
+
+    def _spi_transfer(self, tx, rx_len, delay_us):
+        if tx and rx_len and delay_us:
+            return self._spi_transfer_gapped(tx, rx_len, delay_us)
+        return self.SPI.xfer2(list(tx) + [0] * rx_len)[len(tx):]
+
+    def spi_transfer(self, tx, rx_len=0, delay_us=0):
+        """ Writes tx and then reads rx_len bytes as a single SPI transaction.
+            delay_us is the gap between the last tx byte and the first rx byte
+            (e.g. datasheet t6 after RDATA/RREG). Returns the rx bytes as a list.
+        """
+        if self.hw_cs:
+            # The kernel asserts CS and runs the whole message atomically
+            return self._spi_transfer(tx, rx_len, delay_us)
+        with self.bus_lock:
+            self.cs_pin_device.value = 0 # cs low
+            try:
+                return self._spi_transfer(tx, rx_len, delay_us)
+            finally:
+                self.cs_pin_device.value = 1 # cs high
+
+    def module_init(self):
+        """ Initializes GPIO pins and SPI communication using gpiozero. """
+        try:
+            # Initialize GPIO devices
+            if self.rst_pin is not None:
+                self.rst_pin_device = DigitalOutputDevice(self.rst_pin)
+            if not self.hw_cs:
+                # Idle high: the ADS1256 CS is active low
+                self.cs_pin_device = DigitalOutputDevice(self.cs_pin, initial_value=True)
+            # DRDY is active low, input with pull-up enabled
+            self.drdy_pin_device = DigitalInputDevice(self.drdy_pin, pull_up=True)
+
+            # Initialize SPI
+            self.SPI.open(self.spi_bus, self.spi_device)
+            self.SPI.max_speed_hz = self.spi_speed_hz  # Set SPI speed (adjust as needed, e.g., 2MHz or 4MHz)
+            self.SPI.mode = 0b01           # Set SPI mode (CPOL=0, CPHA=1)
+
+            if self not in _open_boards:
+                _open_boards.append(self)
+            print(f"GPIO and SPI initialized successfully using gpiozero for {self}.")
+            return 0 # Success
+
+        except Exception as e:
+            print(f"Error initializing hardware for {self}: {e}")
+            # Cleanup partially initialized resources if necessary
+            self.module_exit()
+            return -1 # Failure
+
+    def module_exit(self):
+        """ Cleans up GPIO and SPI resources. """
+        if self.rst_pin_device:
+            self.rst_pin_device.close()
+        if self.cs_pin_device:
+            self.cs_pin_device.close()
+        if self.drdy_pin_device:
+            self.drdy_pin_device.close()
+        if self.SPI:
+            self.SPI.close()
+        self.rst_pin_device = self.cs_pin_device = self.drdy_pin_device = None
+        if self in _open_boards:
+            _open_boards.remove(self)
+
+if BACKEND == 'sim':
+    # Same interface as Board, backed by an emulated chip
+    Board = simboard.SimBoard
+    _open_boards = simboard.open_boards
+
+# --- Default board ---
+# The module-level functions below act on the board wired to the pins above,
+# so single-board scripts keep calling config.module_init()/module_exit().
+default_board = Board()
+SPI = default_board.SPI
+
+def digital_write(pin, value):
+    """ Writes to the specified GPIO pin of the default board. """
+    default_board.digital_write(pin, value)
 
 def digital_read(pin):
-    """ Reads from the specified GPIO pin. """
-    if pin == DRDY_PIN and drdy_pin_device:
-        # gpiozero returns 0 for low, 1 for high.
-        # Original code checked for 0 (active low), so we return the direct value.
-        return drdy_pin_device.value
-    else:
-        # Handle other pins or error if necessary
-        print(f"Warning: Attempted to read from unconfigured pin {pin}")
-        return None # Or raise an error
+    """ Reads from the specified GPIO pin of the default board. """
+    return default_board.digital_read(pin)
+
+def wait_drdy(timeout):
+    """ Waits for DRDY of the default board, see Board.wait_drdy(). """
+    return default_board.wait_drdy(timeout)
 
 def delay_ms(delaytime):
     """ Delays for the specified number of milliseconds. """
     time.sleep(delaytime / 1000.0)
 
 def spi_writebyte(data):
-    """ Writes data (list of bytes) to SPI bus. """
-    SPI.writebytes(data)
+    """ Writes data (list of bytes) to the default board's SPI device. """
+    default_board.spi_writebyte(data)
 
 def spi_readbytes(num_bytes):
-    """ Reads num_bytes from SPI bus. """
-    return SPI.readbytes(num_bytes)
+    """ Reads num_bytes from the default board's SPI device. """
+    return default_board.spi_readbytes(num_bytes)
+
+def spi_transfer(tx, rx_len=0, delay_us=0):
+    """ Single SPI transaction on the default board, see Board.spi_transfer(). """
+    return default_board.spi_transfer(tx, rx_len, delay_us)
 
 
 def module_init():
-    """ Initializes GPIO pins and SPI communication using gpiozero. """
-    global rst_pin_device, cs_pin_device, drdy_pin_device, SPI
-
-    try:
-        # Initialize GPIO devices
-        rst_pin_device = DigitalOutputDevice(RST_PIN)
-        cs_pin_device = DigitalOutputDevice(CS_PIN)
-        # DRDY is active low, input with pull-up enabled
-        drdy_pin_device = DigitalInputDevice(DRDY_PIN, pull_up=True)
-
-        # Initialize SPI
-        SPI.open(0, 0) # Open SPI bus 0, device 0
-        SPI.max_speed_hz = 2000000  # Set SPI speed (adjust as needed, e.g., 2MHz or 4MHz)
-        SPI.mode = 0b01           # Set SPI mode (CPOL=0, CPHA=1)
-
-        print("GPIO and SPI initialized successfully using gpiozero.")
-        return 0 # Success
-
-    except Exception as e:
-        print(f"Error initializing hardware: {e}")
-        # Cleanup partially initialized resources if necessary
-        if rst_pin_device: rst_pin_device.close()
-        if cs_pin_device: cs_pin_device.close()
-        if drdy_pin_device: drdy_pin_device.close()
-        if SPI: SPI.close()
-        rst_pin_device = cs_pin_device = drdy_pin_device = None
-        return -1 # Failure
+    """ Initializes GPIO pins and SPI communication of the default board. """
+    return default_board.module_init()
 
 def module_exit():
-    """ Cleans up GPIO and SPI resources. """
-    global rst_pin_device, cs_pin_device, drdy_pin_device, SPI
+    """ Cleans up GPIO and SPI resources of every initialized board. """
     print("Cleaning up hardware resources...")
-    if rst_pin_device:
-        rst_pin_device.close()
-    if cs_pin_device:
-        cs_pin_device.close()
-    if drdy_pin_device:
-        drdy_pin_device.close()
-    if SPI:
-        SPI.close()
+    for board in list(_open_boards):
+        board.module_exit()
     print("Hardware resources released.")
 
 ### END OF FILE ###
\ No newline at end of file
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import logging
+import time
+import psycopg2
+import spool        # REJECTED result of a write
+
+# ==============================================================================
+# Database connection of a writer thread that survives database restarts and
+# network blips.
+#
+# DatabaseSession holds the connection returned by connect() (the script's
+# create_connection(), None on failure) and replaces it once psycopg2 has
+# marked it closed. call() runs a write on the connection; if the connection
+# broke during the write, it reconnects at once and retries the write once,
+# which is all a database restart between two write cycles takes. While the
+# database stays unreachable, call() returns False right away and a new
+# connection is tried at most once per backoff interval (doubling from
+# backoff_s up to backoff_max_s), so the writer keeps draining the samples and
+# spools its writes instead of sitting in connection timeouts.
+#
+# Errors the write raises (after rolling back) decide what happens to the
+# record: connection trouble and cancelled statements (OperationalError,
+# InterfaceError) return False, so the spool keeps the record and retries it;
+# any other error returns spool.REJECTED, since the same write would fail again.
+#
+# A write that broke off may have been committed anyway. The writers load with
+# the tables' idempotency keys (BulkLoader unique), so the retry, or a later
+# replay from the spool, skips rows that are already there.
+# ==============================================================================
+
+BACKOFF_S = 0.5
+BACKOFF_MAX_S = 30.0
+
+# Errors after which the same write can succeed later
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+class DatabaseSession:
+    """ Connection with reconnect and backoff, see the module comment. """
+    def __init__(self, connect, backoff_s=BACKOFF_S, backoff_max_s=BACKOFF_MAX_S):
+        self.connect = connect
+        self.backoff_s = backoff_s
+        self.backoff_max_s = backoff_max_s
+        self.connection = None
+        self.reconnects = 0 # Connections opened after the first one
+        self._connected = False
+        self._delay = backoff_s
+        self._next_attempt = 0.0
+
+    def get(self):
+        """ The open connection, or None while the database is unreachable. """
+        if self.connection is not None:
+            if not self.connection.closed:
+                return self.connection
+            self._drop()
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return None
+        self.connection = self.connect()
+        if self.connection is None:
+            self._next_attempt = now + self._delay
+            logging.warning(f"Database unreachable, next connection attempt in {self._delay:.1f}s.")
+            self._delay = min(self._delay * 2, self.backoff_max_s)
+            return None
+        if self._connected:
+            self.reconnects += 1
+            logging.info(f"Reconnected to the database ({self.reconnects} reconnect(s) since start).")
+        self._connected = True
+        self._delay = self.backoff_s
+        return self.connection
+
+    def call(self, write, *args):
+        """ Returns write(connection, *args), a success flag, or False while there
+            is no connection. Retries once on a new connection if it broke; other
+            errors write raises give False or spool.REJECTED (see the module comment).
+        """
+        for attempt in range(2):
+            connection = self.get()
+            if connection is None:
+                return False
+            try:
+                return write(connection, *args)
+            except (psycopg2.Error, TypeError, ValueError) as e:
+                if not connection.closed:
+                    return False if isinstance(e, TRANSIENT_ERRORS) else spool.REJECTED
+            logging.warning("Database connection lost, reconnecting.")
+            self._drop()
+            self._next_attempt = 0.0 # Reconnect now, a restart is usually over by then
+        return False
+
+    def close(self):
+        if self.connection is not None:
+            self._drop()
+            logging.info("PostgreSQL connection closed.")
+
+    def _drop(self):
+        try:
+            self.connection.close()
+        except Exception as e:
+            logging.debug(f"Error closing database connection: {e}")
+        self.connection = None
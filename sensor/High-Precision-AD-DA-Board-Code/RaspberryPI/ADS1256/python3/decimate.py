@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import numpy as np
+import timebase     # Sample-index timestamps
+import bulkload     # Binary COPY of the rows
+
+# ==============================================================================
+# Streaming decimation of sample streams into lower-rate streams for storage.
+#
+# FirDecimator low-pass filters a stream (windowed-sinc FIR, Kaiser window)
+# and keeps every `factor`-th output. Only the kept outputs are computed,
+# which costs the same as the polyphase form: len(taps) multiply-adds per
+# OUTPUT sample. The filter state (the last len(taps)-1 inputs) is carried
+# across calls, so a stream can be fed in batches of any size.
+#
+# DecimationChain cascades decimators to reach each configured output rate
+# from the previous one (e.g. 1 kHz -> 100 Hz -> 10 Hz), and DecimatedStreams
+# keeps one chain per sensor and collects the outputs into database rows for
+# the decimated stream tables (GridSense Measurements100Hz / Measurements10Hz).
+#
+# Output samples are timestamped with the input sample at the centre of the
+# filter (the FIR's group delay), so decimated and raw data line up in time.
+# With the defaults (factor 10, e.g. 1 kHz -> 100 Hz) the response is flat
+# (< 0.15 dB) up to 0.6 of the output Nyquist frequency (30 Hz), -3 dB at
+# about 0.71 (35.5 Hz), -12 dB at 0.8 (40 Hz), and at least 80 dB down from
+# the output Nyquist frequency (50 Hz) up, so nothing above it folds back
+# into the decimated stream. A 50 Hz waveform does not survive decimation to
+# 100 Hz or below; only its slower trends (DC level, envelope of DC-coupled
+# sensors) do.
+#
+# A stage whose output rate is the sensor's own rate (factor 1 from the raw
+# stream) would only copy the raw data, so DecimatedStreams stores nothing for it.
+# ==============================================================================
+
+TAPS_PER_PHASE = 24  # FIR length = factor * TAPS_PER_PHASE + 1
+CUTOFF = 0.75        # -6 dB point as a fraction of the output Nyquist frequency
+KAISER_BETA = 8.0    # Window shape: ~80 dB stop band attenuation
+
+_LOADERS = {} # table -> BulkLoader
+
+def lowpass_taps(factor, taps_per_phase=TAPS_PER_PHASE, cutoff=CUTOFF, beta=KAISER_BETA):
+    """ Linear-phase anti-aliasing low-pass for decimation by factor, with unity DC gain. """
+    n = factor * taps_per_phase + 1
+    fc = cutoff / (2.0 * factor) # Cutoff in cycles per input sample
+    t = np.arange(n) - (n - 1) / 2.0
+    taps = 2.0 * fc * np.sinc(2.0 * fc * t) * np.kaiser(n, beta)
+    return taps / taps.sum()
+
+class FirDecimator:
+    """ Streaming FIR decimator by an integer factor, see the module comment.
+        The first outputs appear once len(taps) inputs have arrived.
+    """
+    def __init__(self, factor, taps=None):
+        if factor < 1:
+            raise ValueError(f"Decimation factor must be at least 1, got {factor}")
+        self.factor = factor
+        self.taps = lowpass_taps(factor) if taps is None else np.asarray(taps, dtype=np.float64)
+        self.delay = (len(self.taps) - 1) // 2 # Group delay in input samples
+        self._reversed = self.taps[::-1].copy()
+        self.count = 0 # Input samples seen
+        self._history = np.zeros(0)
+        self._history_times = np.zeros(0, dtype=np.int64)
+
+    def process(self, values, times_ns):
+        """ Filters the next input samples and returns (values, times_ns) of the
+            output samples they completed (possibly none).
+        """
+        if self.factor == 1:
+            return np.asarray(values, dtype=np.float64), np.asarray(times_ns, dtype=np.int64)
+        n_taps = len(self.taps)
+        x = np.concatenate((self._history, values))
+        t = np.concatenate((self._history_times, times_ns))
+        first_index = self.count - len(self._history) # Stream index of x[0]
+        self.count += len(values)
+
+        # Outputs at stream indices that are multiples of factor and have a full window behind them
+        first_out = n_taps - 1
+        first_out += (-(first_index + first_out)) % self.factor
+        ends = np.arange(first_out, len(x), self.factor)
+        if ends.size:
+            windows = np.lib.stride_tricks.sliding_window_view(x, n_taps)[ends - (n_taps - 1)]
+            out_values = windows @ self._reversed
+            out_times = t[ends - self.delay]
+        else:
+            out_values = np.zeros(0)
+            out_times = np.zeros(0, dtype=np.int64)
+
+        self._history = x[-(n_taps - 1):].copy() # factor > 1, so at least one tap of history
+        self._history_times = t[-(n_taps - 1):].copy()
+        return out_values, out_times
+
+class DecimationChain:
+    """ Cascade of FirDecimators from input_rate_hz to each of rates_hz (descending).
+        Each stage's factor is the nearest integer ratio to its target rate, so
+        the actual rates (self.rates_hz) may differ slightly from the targets.
+    """
+    def __init__(self, input_rate_hz, rates_hz):
+        self.input_rate_hz = input_rate_hz
+        self.stages = []
+        self.rates_hz = []
+        rate = input_rate_hz
+        for target in rates_hz:
+            factor = max(1, int(round(rate / target)))
+            rate /= factor
+            self.stages.append(FirDecimator(factor))
+            self.rates_hz.append(rate)
+
+    def process(self, values, times_ns):
+        """ Feeds input samples through the cascade; returns one (values, times_ns) per stage. """
+        outputs = []
+        for stage in self.stages:
+            values, times_ns = stage.process(values, times_ns)
+            outputs.append((values, times_ns))
+        return outputs
+
+class DecimatedStreams:
+    """ One DecimationChain per sensor and the decimated samples waiting to be
+        written. stages is a list of {'rate_hz': target rate, 'table': DB table};
+        each stage's samples are written in rows of row_seconds of data.
+    """
+    def __init__(self, stages, row_seconds):
+        self.stages = stages
+        self.row_seconds = row_seconds
+        self.chains = {}  # key -> DecimationChain
+        self.pending = {} # (stage index, key) -> [list of values arrays, list of times arrays, count]
+
+    def add_sensor(self, key, input_rate_hz):
+        self.chains[key] = DecimationChain(input_rate_hz, [stage['rate_hz'] for stage in self.stages])
+        return self.chains[key]
+
+    def process(self, key, values, times_ns):
+        """ Decimates the next raw samples of a sensor added with add_sensor(). """
+        chain = self.chains[key]
+        for i, (out_values, out_times) in enumerate(chain.process(values, times_ns)):
+            if out_values.size and chain.rates_hz[i] < chain.input_rate_hz: # Not a copy of the raw stream
+                pending = self.pending.setdefault((i, key), [[], [], 0])
+                pending[0].append(out_values)
+                pending[1].append(out_times)
+                pending[2] += out_values.size
+
+    def take_rows(self, flush=False):
+        """ Returns the rows that are full (all pending samples if flush) as
+            (table, key, start_time_ns, rate_hz, values) tuples.
+        """
+        rows = []
+        for (i, key), pending in self.pending.items():
+            rate_hz = self.chains[key].rates_hz[i]
+            row_len = max(1, int(round(rate_hz * self.row_seconds)))
+            if pending[2] < row_len and not (flush and pending[2]):
+                continue
+            values = np.concatenate(pending[0])
+            times = np.concatenate(pending[1])
+            end = len(values) if flush else len(values) - len(values) % row_len
+            for start in range(0, end, row_len):
+                rows.append((self.stages[i]['table'], key, int(times[start]), rate_hz, values[start:start + row_len]))
+            pending[:] = [[values[end:]], [times[end:]], len(values) - end]
+        return rows
+
+def insert_rows(connection, rows, sensors):
+    """ Inserts rows from DecimatedStreams.take_rows() into their tables in one
+        transaction (psycopg2 connection, one COPY per table) and commits. sensors
+        maps each row's key to its (sname, stype). Database errors are raised to
+        the caller.
+    """
+    tables = {}
+    for table, key, start_time_ns, rate_hz, values in rows:
+        values = np.clip(np.round(values, 2), bulkload.NUMERIC_5_2_MIN, bulkload.NUMERIC_5_2_MAX)
+        rms_value = bulkload.rms(values)
+        sname, stype = sensors[key]
+        tables.setdefault(table, []).append((key, values, timebase.ns_to_datetime(start_time_ns),
+                                             rate_hz, rms_value, sname, stype))
+    for table, table_rows in tables.items():
+        if table not in _LOADERS:
+            _LOADERS[table] = bulkload.BulkLoader(table, bulkload.DECIMATED_COLUMNS, unique=bulkload.DECIMATED_KEY)
+        _LOADERS[table].load(connection, table_rows, commit=False)
+    connection.commit()
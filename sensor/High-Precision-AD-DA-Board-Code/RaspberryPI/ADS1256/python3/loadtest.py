@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import os
+os.environ.setdefault('ADS1256_BACKEND', 'sim') # Before config.py picks the backend
+import ADS1256      # Import the ADS1256 library
+import config       # Import the config library (for init/exit)
+import timebase     # Sample-index timestamps
+import ringbuffer   # Sample ring between sampler and writer
+import calibration  # Code -> volts transform
+import bulkload     # Binary COPY of the measurement rows
+import spool        # Disk spool for writes the database did not take
+import dbsession    # Reconnect and retry after a lost database connection
+import psycopg2
+import numpy as np
+import time
+import logging
+import signal
+import threading
+
+# ==============================================================================
+# Load test of the acquisition and database write path.
+#
+# Streams one channel of the simulated ADS1256 (ADS1256_BACKEND=sim, the
+# default here) at full rate through a SampleRing to the database, written the
+# way the sampler scripts write: one row per DB_WRITE_INTERVAL_S through the
+# binary COPY loader, the spool and the reconnecting session. After DURATION_S
+# (or Ctrl+C) it reports the throughput and where samples were lost:
+#   - missed conversions (gaps in the sample sequence, the sampler fell behind)
+#   - ring overwrites (the writer fell behind)
+#   - spooled writes (the database did not take them in time)
+#
+# The rows go to DB_TABLE under SENSOR_ID_DB: run it against a scratch
+# database with the GridSense migrations applied.
+# ==============================================================================
+
+# --- Configuration ---
+ADC_CHANNEL = 0
+ADC_GAIN = ADS1256.ADS1256_GAIN_E['ADS1256_GAIN_1']
+ADC_RATE_ENUM = ADS1256.ADS1256_DRATE_E['ADS1256_30000SPS']
+ADC_SAMPLE_RATE_HZ = 30000 # MUST match ADC_RATE_ENUM
+BURST_SIZE = ADC_SAMPLE_RATE_HZ // 100 # Samples per RDATAC burst (~10 ms of data)
+VREF = 5.0
+DURATION_S = 60.0
+REPORT_INTERVAL_S = 10.0
+
+# --- Database Configuration ---
+DB_HOST = "localhost"
+DB_NAME = "gridsense_db"
+DB_USER = "gridsense_user"
+DB_PASSWORD = "microgrid"
+DB_TABLE = "measurements_six"
+DB_STATEMENT_TIMEOUT_MS = 5000
+DB_CONNECT_TIMEOUT_S = 3
+DB_WRITE_INTERVAL_S = 1.0
+
+SENSOR_ID_DB = 900
+SENSOR_NAME_DB = "Load test"
+SENSOR_TYPE_DB = "Voltage"
+
+# --- Sample Ring and Spool ---
+RING_CAPACITY = ADC_SAMPLE_RATE_HZ * 10 # 10 seconds of samples
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool', 'loadtest')
+SPOOL_REPLAY_MAX_RECORDS = 20
+
+# --- Logging Setup ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s')
+
+# --- Global Variables ---
+sample_ring = ringbuffer.SampleRing(RING_CAPACITY, ringbuffer.OVERWRITE)
+stop_event = threading.Event()
+CALIBRATION = calibration.CalibrationProfile(ADC_CHANNEL, vref=VREF)
+MEASUREMENTS = bulkload.BulkLoader(DB_TABLE, bulkload.MEASUREMENT_COLUMNS, unique=bulkload.MEASUREMENT_KEY)
+MEASUREMENT_IDS = bulkload.IdAllocator(DB_TABLE)
+
+class Stats:
+    """ Running totals of the writer, read by the main thread for the reports. """
+    def __init__(self):
+        self.samples_read = 0    # Samples taken from the ring
+        self.samples_written = 0 # Samples in rows the database took directly
+        self.rows = 0            # Rows submitted
+        self.write_s = []        # Duration of each submit (write, or spool on failure)
+
+stats = Stats()
+accounting = ringbuffer.SeqAccounting()
+
+# --- Database Functions ---
+def create_connection():
+    """Establishes a connection to the PostgreSQL database, or returns None."""
+    try:
+        connection = psycopg2.connect(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port="5432",
+                                      connect_timeout=DB_CONNECT_TIMEOUT_S,
+                                      options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}")
+        logging.info(f"Connection to PostgreSQL DB '{DB_NAME}' successful")
+        return connection
+    except psycopg2.OperationalError as e:
+        logging.error(f"Database connection error: {e}")
+        return None
+
+def write_row(connection, record):
+    """ Writes one spool record (times_ns, voltages, sample_counts, first_seq) as a
+        row of DB_TABLE. Returns True; errors are rolled back and raised.
+    """
+    times_ns, voltages, sample_counts, first_seq = record
+    sensdata = bulkload.sensdata_array(times_ns, voltages)
+    try:
+        batch_id, = MEASUREMENT_IDS.take(connection, 1)
+        MEASUREMENTS.load(connection, [(batch_id, SENSOR_ID_DB, sensdata, timebase.ns_to_datetime(int(times_ns[0])),
+                                        bulkload.rms(sensdata[:, 0]), SENSOR_NAME_DB, SENSOR_TYPE_DB, 0, 0,
+                                        *sample_counts, first_seq)])
+        return True
+    except (psycopg2.Error, TypeError, ValueError):
+        try: connection.rollback()
+        except psycopg2.Error: pass
+        raise
+
+# --- ADC Sampling Thread ---
+def adc_sampler_thread(adc, clock):
+    """Streams the ADC at full rate into the sample ring until stop_event is set."""
+    if not adc.ADS1256_SetChannal(ADC_CHANNEL):
+        logging.error(f"Failed to set ADC channel {ADC_CHANNEL}.")
+        stop_event.set()
+        return
+    try:
+        while not stop_event.is_set():
+            for raw_values in adc.stream(BURST_SIZE, stop_event):
+                sample_times_ns = clock.burst_times_ns(len(raw_values))
+                sample_ring.write(sample_times_ns, ADC_CHANNEL, clock.burst_seqs(), raw_values)
+            if not stop_event.is_set():
+                logging.warning("ADC stream interrupted (WaitDRDY Timeout?)")
+                clock.reset()
+    finally:
+        sample_ring.mark_closed()
+
+# --- Database Writer Thread ---
+def database_writer_thread(db_session):
+    """Drains the ring into one row per DB_WRITE_INTERVAL_S, spooling what the database does not take."""
+    writer = spool.SpooledWriter(spool.Spool(SPOOL_DIR),
+                                 lambda record: db_session.call(write_row, record),
+                                 replay_max_records=SPOOL_REPLAY_MAX_RECORDS)
+    chunks = []
+    last_write_time = time.monotonic()
+    while not (sample_ring.closed and sample_ring.available() == 0):
+        records = sample_ring.read()
+        if records.size:
+            chunk = (records['time_ns'].copy(), records['seq'].copy(), CALIBRATION.apply(records['code']))
+            if sample_ring.intact():
+                chunks.append(chunk)
+            else:
+                sample_ring.lost += len(records)
+            sample_ring.release()
+        else:
+            time.sleep(0.01)
+
+        now = time.monotonic()
+        if chunks and (now - last_write_time >= DB_WRITE_INTERVAL_S or sample_ring.closed):
+            times_ns, seqs, voltages = (np.concatenate(arrays) for arrays in zip(*chunks))
+            sample_counts = accounting.count(SENSOR_ID_DB, seqs)
+            spooled_before = writer.spooled + writer.spool.quarantined
+            write_start = time.monotonic()
+            writer.submit((times_ns, voltages, sample_counts, int(seqs[0])))
+            stats.write_s.append(time.monotonic() - write_start)
+            stats.samples_read += len(voltages)
+            stats.rows += 1
+            if writer.spooled + writer.spool.quarantined == spooled_before:
+                stats.samples_written += len(voltages)
+            chunks = []
+            last_write_time = now
+    writer.drain()
+    if writer.spool.pending:
+        logging.warning(f"{writer.spool.backlog_bytes()} bytes left in the spool, replayed at the next run.")
+    writer.spool.close()
+
+def report(elapsed_s, clock):
+    """Logs throughput and losses so far."""
+    expected = accounting.expected.get(SENSOR_ID_DB, 0)
+    dropped = accounting.dropped.get(SENSOR_ID_DB, 0)
+    write_ms = np.array(stats.write_s) * 1e3 if stats.write_s else np.zeros(1)
+    logging.info(f"{elapsed_s:.0f}s: {stats.samples_read / elapsed_s:.0f} samples/s read "
+                 f"({stats.samples_read / elapsed_s / ADC_SAMPLE_RATE_HZ:.1%} of {ADC_SAMPLE_RATE_HZ} SPS), "
+                 f"{stats.samples_written / elapsed_s:.0f} samples/s written directly, {stats.rows} rows; "
+                 f"dropped {dropped} of {expected} ({clock.skipped} missed conversions, "
+                 f"{sample_ring.lost} overwritten in the ring, {clock.resyncs} re-anchors); "
+                 f"write mean {write_ms.mean():.1f} ms / max {write_ms.max():.1f} ms")
+
+def signal_handler(sig, frame):
+    logging.info('Interrupt received, shutting down...')
+    stop_event.set()
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    logging.info(f"Load test: channel {ADC_CHANNEL} at {ADC_SAMPLE_RATE_HZ} SPS for {DURATION_S}s "
+                 f"({config.BACKEND} backend) into {DB_TABLE}, sensor ID {SENSOR_ID_DB}.")
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    adc = ADS1256.ADS1256()
+    if adc.ADS1256_init() != 0 or not adc.ADS1256_ConfigADC(ADC_GAIN, ADC_RATE_ENUM):
+        logging.critical("Failed to initialize the ADS1256.")
+        config.module_exit()
+        raise SystemExit(1)
+
+    db_session = dbsession.DatabaseSession(create_connection)
+    clock = timebase.SampleClock(ADC_SAMPLE_RATE_HZ)
+    sampler = threading.Thread(target=adc_sampler_thread, args=(adc, clock), name="ADCSampler")
+    db_writer = threading.Thread(target=database_writer_thread, args=(db_session,), name="DBWriter")
+    start = time.monotonic()
+    sampler.start()
+    db_writer.start()
+    try:
+        next_report = start + REPORT_INTERVAL_S
+        while not stop_event.is_set() and time.monotonic() - start < DURATION_S:
+            stop_event.wait(min(1.0, max(0.0, next_report - time.monotonic())))
+            if time.monotonic() >= next_report:
+                report(time.monotonic() - start, clock)
+                next_report += REPORT_INTERVAL_S
+    finally:
+        stop_event.set()
+        sampler.join()
+        elapsed_s = time.monotonic() - start
+        db_writer.join()
+        report(elapsed_s, clock)
+        db_session.close()
+        config.module_exit()
@@ -1,10 +1,16 @@
 import ADS1256
 import config  # Assuming config.py handles hardware init/cleanup
+import timebase
+import rtprofile
+import bulkload
+import trigger
+import spool
+import dbsession
 import psycopg2
 import numpy as np
-import datetime
 import threading
 import time
+import os
 import signal
 import sys
 import queue
@@ -16,6 +22,17 @@ DB_NAME = "gridsense_db"
 DB_USER = "gridsense_user"
 DB_PASSWORD = "microgrid"
 DB_TABLE = "measurements_six" # Make sure this table exists in gridsense_db
+DB_STATEMENT_TIMEOUT_MS = 5000 # A write stalled longer than this is cancelled and spooled
+DB_CONNECT_TIMEOUT_S = 3 # A connection attempt gives up after this
+DB_RECONNECT_BACKOFF_MAX_S = 30.0 # Reconnect attempts back off up to this (see dbsession.py)
+
+# Batches the database did not take are kept on disk (spool.py) and replayed
+# once it is back, so a slow database no longer backs up the sample queue.
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool', 'main3')
+SPOOL_WRITE_AHEAD = False # True: every batch goes through the spool, False: only the failed ones
+SPOOL_FSYNC = 'interval'  # 'always', 'interval' or 'never'
+SPOOL_MAX_MB = 1024       # Oldest segments are dropped above this
+SPOOL_REPLAY_MAX_RECORDS = 20 # Spooled batches replayed per write cycle
 
 ADC_CHANNEL = 2  # Channel to read voltage from
 ADC_GAIN = ADS1256.ADS1256_GAIN_E['ADS1256_GAIN_1']
@@ -31,10 +48,17 @@ SENSOR_TYPE_DB = "Voltage"
 DB_WRITE_INTERVAL_S = 1.0
 # Max samples to buffer before forcing a DB write (safety measure)
 MAX_QUEUE_SIZE = ADC_SAMPLE_RATE_HZ * 5 # e.g., 5 seconds worth
-
-# --- !!! NEW: Clamping Limits for NUMERIC(5, 2) ---
-NUMERIC_5_2_MAX = 999.99
-NUMERIC_5_2_MIN = -999.99
+# Each poll restarts the conversion and is paced in software, so the real rate
+# can sit well off ADC_SAMPLE_RATE_HZ; the sample clock measures it over this
+# many seconds at start-up and then corrects it by crystal drift only.
+SAMPLE_CLOCK_CALIBRATE_S = 5.0
+
+# --- Real-Time Profile (opt-in, needs root or CAP_SYS_NICE/CAP_IPC_LOCK) ---
+# SCHED_FIFO + CPU pinning for the sampler thread, mlockall and a frozen GC
+# for the process; see rtprofile.py. Best with isolcpus=3 on the kernel cmdline.
+RT_PROFILE = False
+RT_SAMPLER_CPU = 3
+RT_PRIORITY = rtprofile.DEFAULT_PRIORITY
 # ----------------------------------------------------
 
 # --- Logging Setup ---
@@ -44,13 +68,11 @@ logging.basicConfig(level=logging.INFO,
 # --- Global Variables ---
 data_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
 stop_event = threading.Event()
+MEASUREMENTS = bulkload.BulkLoader(DB_TABLE, bulkload.MEASUREMENT_COLUMNS[:9] + bulkload.MEASUREMENT_COLUMNS[-1:],
+                                   unique=bulkload.MEASUREMENT_KEY) # id .. pf, first_seq
+MEASUREMENT_IDS = bulkload.IdAllocator(DB_TABLE) # Row ids from the table's sequence
 ADC = None # ADC object holder
 
-# --- Clamping Function ---
-def clamp_value(value, min_val=NUMERIC_5_2_MIN, max_val=NUMERIC_5_2_MAX):
-    """Clamps a value within the specified min/max range."""
-    return max(min_val, min(max_val, value))
-
 # --- Database Functions ---
 def create_connection():
     # ... (no changes needed) ...
@@ -62,97 +84,78 @@ def create_connection():
             user=DB_USER,
             password=DB_PASSWORD,
             host=DB_HOST,
-            port="5432"
+            port="5432",
+            connect_timeout=DB_CONNECT_TIMEOUT_S,
+            tcp_user_timeout=DB_STATEMENT_TIMEOUT_MS,
+            options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
         )
         logging.info(f"Connection to PostgreSQL DB '{DB_NAME}' successful")
     except psycopg2.OperationalError as e:
         logging.error(f"Database connection error: {e}", exc_info=True)
     return connection
 
-def get_max_id(connection):
-    # ... (no changes needed) ...
-    """Gets the maximum ID from the specified database table."""
-    max_id = 0
-    try:
-        with connection.cursor() as cursor:
-            query = f"SELECT MAX(id) FROM {DB_TABLE};"
-            cursor.execute(query)
-            result = cursor.fetchone()
-            if result and result[0] is not None:
-                max_id = result[0]
-    except psycopg2.Error as e:
-        logging.error(f"Error getting max ID from {DB_TABLE}: {e}")
-        # Depending on strategy, could return None or raise error
-    return max_id
-
-def calculate_rms(voltage_list):
-    # ... (no changes needed) ...
-    """Calculates RMS value from a list of voltage floats."""
-    if not voltage_list:
-        return 0.0
-    numeric_array = np.array(voltage_list, dtype=float)
-    return np.sqrt(np.mean(np.square(numeric_array)))
-
-def insert_batch_data(connection, batch_id, sensor_id, batch_start_time, sensdata_batch, sname, stype):
+def insert_batch_data(connection, sensor_id, batch_start_time, sensdata_batch, sname, stype, first_seq=None):
     """ Inserts a batch of sensor data into the database.
-        sensdata_batch should be a list of [clamped_voltage, clamped_delta_time_ms] pairs.
+        sensdata_batch should be an (n, 2) array of [clamped_voltage, clamped_delta_time_ms] pairs
+        (bulkload.sensdata_array()), first_seq the sequence number of its first sample; a batch
+        already in the table is skipped. Returns the row's id (from the table's sequence), None for an
+        empty batch; errors are logged, rolled back and raised.
     """
-    if not sensdata_batch:
+    if not len(sensdata_batch):
         logging.warning("Attempted to insert empty batch.")
-        return False
-
-    # RMS is calculated *before* clamping voltages in sensdata, which might be desired?
-    # If RMS should also reflect clamped values, calculate it from sensdata_batch[*][0]
-    voltages_only = [item[0] for item in sensdata_batch] # Voltages are already clamped here
-    rms_value = calculate_rms(voltages_only)
-
-    # --- Clamp RMS value before insertion ---
-    clamped_rms = clamp_value(rms_value)
-    if clamped_rms != rms_value:
-        logging.warning(f"Clamped RMS value from {rms_value:.4f} to {clamped_rms:.2f} for batch ID {batch_id}")
-    # --------------------------------------
+        return None
 
+    batch_id = None
     try:
-        with connection.cursor() as cursor:
-            timestamp = batch_start_time.isoformat()
-            query = f"""
-            INSERT INTO {DB_TABLE}(id, sensor_id, sensdata, time, rmsvalue, sname, stype, thd, pf)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
-            """
-            # Pass the list-of-lists directly, psycopg2 adapts it to numeric[][]
-            cursor.execute(query, (
-                batch_id,
-                sensor_id,
-                sensdata_batch, # Already clamped [voltage, delta_t] pairs
-                timestamp,
-                float(clamped_rms), # Pass clamped standard Python float
-                sname,
-                stype,
-                0,  # Placeholder for THD
-                0   # Placeholder for PF
-            ))
-            connection.commit()
-            logging.debug(f"Successfully inserted batch ID {batch_id} with {len(sensdata_batch)} samples.")
-            return True
-
-    except (psycopg2.Error, TypeError) as e:
+        batch_id, = MEASUREMENT_IDS.take(connection, 1)
+        MEASUREMENTS.load(connection, [(
+            batch_id,
+            sensor_id,
+            sensdata_batch, # Already clamped [voltage, delta_t] pairs
+            batch_start_time,
+            bulkload.rms(sensdata_batch[:, 0]), # RMS of the clamped voltages
+            sname,
+            stype,
+            0,  # Placeholder for THD
+            0,  # Placeholder for PF
+            first_seq
+        )])
+        logging.debug(f"Successfully inserted batch ID {batch_id} with {len(sensdata_batch)} samples.")
+        return batch_id
+
+    except (psycopg2.Error, TypeError, ValueError) as e:
         logging.error(f"Error inserting batch ID {batch_id}: {e}", exc_info=True)
         try:
             connection.rollback()
         except psycopg2.Error as rb_e:
             logging.error(f"Error rolling back transaction: {rb_e}")
-        return False
+        raise
+
+def write_batch(connection, record):
+    """ Writes one spool record, (batch_start_time, sensdata_batch, first_seq). Returns True;
+        database errors are raised for db_session.call() to sort out.
+    """
+    batch_start_time, sensdata_batch, first_seq = record
+    batch_id = insert_batch_data(connection, SENSOR_ID_DB, batch_start_time, sensdata_batch,
+                                 SENSOR_NAME_DB, SENSOR_TYPE_DB, first_seq)
+    if batch_id is None: # Empty batch, nothing to write
+        return True
+    logging.info(f"DB Write: ID {batch_id}, Samples: {len(sensdata_batch)}, StartTime: {batch_start_time.time()}")
+    return True
 
 # --- ADC Sampling Thread ---
 def adc_sampler_thread():
     # ... (no changes needed in sampling itself) ...
     """Continuously samples the ADC and puts data onto the queue."""
     logging.info("ADC Sampler thread started.")
+    if RT_PROFILE:
+        rtprofile.apply(priority=RT_PRIORITY, cpu=RT_SAMPLER_CPU)
     sample_interval = 1.0 / ADC_SAMPLE_RATE_HZ
+    # Timestamps from the sample index, corrected against the host clock
+    clock = timebase.SampleClock(ADC_SAMPLE_RATE_HZ, calibrate_s=SAMPLE_CLOCK_CALIBRATE_S)
 
     while not stop_event.is_set():
         read_start_time = time.monotonic()
-        measurement_time = datetime.datetime.now(datetime.timezone.utc) # Timestamp for the reading
 
         raw_value = ADC.ADS1256_GetChannalValue(ADC_CHANNEL)
         # if raw_value == 0:
@@ -176,13 +179,14 @@ def adc_sampler_thread():
         #         logging.error(f"Error reading diagnostic registers: {diag_e}", exc_info=True)
                 
         if raw_value is not None:
+            measurement_time_ns, _ = clock.burst(1) # Timestamp for the reading
             # Convert raw ADC value to voltage
             # ADS1256 is 24-bit, max positive value is 0x7FFFFF for VREF input
             voltage = (raw_value / 0x7FFFFF) * VREF if VREF != 0 else 0.0
             logging.info(f"Calculated Voltage: {voltage:.4f}")
             try:
-                # Put (timestamp, voltage) tuple onto the queue
-                data_queue.put((measurement_time, voltage), block=True, timeout=0.5) # Block with timeout
+                # Put (timestamp, sequence number, voltage) tuple onto the queue
+                data_queue.put((measurement_time_ns, clock.burst_seq, voltage), block=True, timeout=0.5) # Block with timeout
             except queue.Full:
                 logging.warning("Data queue is full. Sample might be dropped.")
                 # Optional: Implement strategy for full queue (e.g., discard oldest)
@@ -191,6 +195,7 @@ def adc_sampler_thread():
 
         else:
             logging.warning(f"Failed to read ADC channel {ADC_CHANNEL}")
+            clock.reset() # Re-anchor the timestamps after a missed sample
             # Optional: add a small delay here if read failures are frequent
 
         # --- Calculate sleep time for target rate ---
@@ -205,18 +210,20 @@ def adc_sampler_thread():
 
 
 # --- Database Writer Thread ---
-def database_writer_thread(db_connection):
+def database_writer_thread(db_session):
     """ Periodically collects data from the queue and writes batches to the database. """
     logging.info("Database Writer thread started.")
     last_write_time = time.monotonic()
-    current_raw_batch = [] # Store raw (timestamp, voltage) tuples first
-    current_db_id = get_max_id(db_connection) # Get initial max ID
+    current_raw_batch = [] # Store raw (timestamp_ns, seq, voltage) tuples first
+    writer = spool.SpooledWriter(spool.Spool(SPOOL_DIR, max_bytes=SPOOL_MAX_MB * 2**20, fsync=SPOOL_FSYNC),
+                                 lambda record: db_session.call(write_batch, record),
+                                 SPOOL_WRITE_AHEAD, SPOOL_REPLAY_MAX_RECORDS)
 
     while not stop_event.is_set() or not data_queue.empty(): # Process remaining queue items after stop signal
         try:
             # Get data from queue with a timeout
-            timestamp, voltage = data_queue.get(block=True, timeout=0.1)
-            current_raw_batch.append((timestamp, voltage)) # Store raw data
+            item = data_queue.get(block=True, timeout=0.1)
+            current_raw_batch.append(item) # Store raw data
             data_queue.task_done()
 
         except queue.Empty:
@@ -233,50 +240,32 @@ def database_writer_thread(db_connection):
              if force_write:
                  logging.warning("Forcing DB write due to large batch size.")
 
-             batch_start_time = current_raw_batch[0][0] # Timestamp of the first item
-
-             # --- !!! Clamp values and format batch for DB !!! ---
-             sensdata_for_db = []
-             for item_timestamp, item_voltage in current_raw_batch:
-                 # Clamp Voltage
-                 clamped_voltage = clamp_value(item_voltage)
-                 if clamped_voltage != item_voltage:
-                     logging.warning(f"Clamped voltage from {item_voltage:.4f} to {clamped_voltage:.2f}")
-
-                 # Calculate and Clamp Delta Time
-                 delta_t_ms = (item_timestamp - batch_start_time).total_seconds() * 1000.0
-                 clamped_delta_t_ms = clamp_value(delta_t_ms)
-                 if clamped_delta_t_ms != delta_t_ms:
-                     # This will happen often for samples near the end of the 1-sec batch
-                     logging.debug(f"Clamped delta_t from {delta_t_ms:.4f} to {clamped_delta_t_ms:.2f}")
-
-                 # Append clamped values, rounded to 2 decimal places for DB
-                 sensdata_for_db.append([round(clamped_voltage, 2), round(clamped_delta_t_ms, 2)])
+             # --- !!! Clamp values and format batch for DB (whole arrays) !!! ---
+             times_ns = np.fromiter((item[0] for item in current_raw_batch), dtype=np.int64, count=len(current_raw_batch))
+             seqs = np.fromiter((item[1] for item in current_raw_batch), dtype=np.int64, count=len(current_raw_batch))
+             voltages = np.fromiter((item[2] for item in current_raw_batch), dtype=np.float64, count=len(current_raw_batch))
+             clamped = np.count_nonzero((voltages < bulkload.NUMERIC_5_2_MIN) | (voltages > bulkload.NUMERIC_5_2_MAX))
+             if clamped:
+                 logging.warning(f"Clamped {clamped} voltage(s) to NUMERIC(5, 2)")
+             # One row per bulkload.ROW_SPAN_NS, so delta_t fits NUMERIC(5, 2) even after a stalled write cycle
+             for part in trigger.split_by_span(times_ns, bulkload.ROW_SPAN_NS):
+                 sensdata_for_db = bulkload.sensdata_array(times_ns[part], voltages[part])
+                 writer.submit((timebase.ns_to_datetime(int(times_ns[part][0])), sensdata_for_db,
+                                int(seqs[part][0]))) # Spooled if the database does not take it
             # -------------------------------------------------------
 
-             current_db_id += 1
-             success = insert_batch_data(
-                 db_connection,
-                 current_db_id,
-                 SENSOR_ID_DB,
-                 batch_start_time,
-                 sensdata_for_db, # Pass the batch with clamped values
-                 SENSOR_NAME_DB,
-                 SENSOR_TYPE_DB
-             )
-             if success:
-                 logging.info(f"DB Write: ID {current_db_id}, Samples: {len(sensdata_for_db)}, StartTime: {batch_start_time.time()}")
-             else:
-                 logging.error(f"DB Write failed for batch starting at {batch_start_time}")
-                 current_db_id -= 1 # Decrement ID on failure
-
              # Reset raw batch and timer
              current_raw_batch = []
              last_write_time = current_time
+             rtprofile.collect_garbage() # GC runs here, not in the sampler, when the RT profile is on
 
         if not current_raw_batch and not stop_event.is_set():
             time.sleep(0.05)
 
+    writer.drain()
+    if writer.spool.pending:
+        logging.warning(f"{writer.spool.backlog_bytes()} bytes left in the spool, replayed at the next start.")
+    writer.spool.close()
     logging.info("Database Writer thread finished.")
 
 
@@ -291,7 +280,7 @@ def signal_handler(sig, frame):
 if __name__ == "__main__":
     # ... (no changes needed in main setup/teardown) ...
     logging.info("Starting Microgrid Data Logger...")
-    db_connection = None
+    db_session = dbsession.DatabaseSession(create_connection, backoff_max_s=DB_RECONNECT_BACKOFF_MAX_S)
     sampler = None
     db_writer = None
 
@@ -318,19 +307,12 @@ if __name__ == "__main__":
         logging.info(f"ADC Configured: Gain={list(ADS1256.ADS1256_GAIN_E.keys())[list(ADS1256.ADS1256_GAIN_E.values()).index(ADC_GAIN)]}, Rate={ADC_SAMPLE_RATE_HZ}SPS (approx)")
 
         # Connect to Database
-        db_connection = create_connection()
-        if not db_connection:
-            logging.critical("Failed to connect to database. Exiting.")
-            # Attempt cleanup before exiting
-            try:
-                 config.module_exit()
-            except Exception as e:
-                 logging.error(f"Error during hardware cleanup on DB fail: {e}")
-            sys.exit(1)
+        if db_session.get() is None: # The writer keeps trying, spooling the batches meanwhile
+            logging.warning("Database not reachable at start, spooling until it is.")
 
         # Create and start threads
         sampler = threading.Thread(target=adc_sampler_thread, name="ADCSampler")
-        db_writer = threading.Thread(target=database_writer_thread, args=(db_connection,), name="DBWriter")
+        db_writer = threading.Thread(target=database_writer_thread, args=(db_session,), name="DBWriter")
 
         sampler.daemon = False # Set to False for graceful shutdown
         db_writer.daemon = False
@@ -366,12 +348,7 @@ if __name__ == "__main__":
 
         # Final Cleanup
         logging.info("Closing database connection...")
-        if db_connection:
-            try:
-                db_connection.close()
-                logging.info("PostgreSQL connection closed.")
-            except Exception as e:
-                logging.error(f"Error closing database connection: {e}")
+        db_session.close()
 
         logging.info("Cleaning up hardware resources...")
         try:
@@ -9,6 +9,7 @@ import logging
 import signal
 import threading
 import numpy as np  # <-- Import numpy
+import calibration  # Per-channel calibration profiles
 
 # --- Configuration ---
 ADC_CHANNEL = 2
@@ -17,9 +18,14 @@ ADC_GAIN = ADS1256.ADS1256_GAIN_E['ADS1256_GAIN_1']
 ADC_RATE_ENUM = ADS1256.ADS1256_DRATE_E['ADS1256_1000SPS']
 
 # --- Calibration Values ---
+# The channel's profile from calibration.json (see calibration.py) is used if
+# there is one; these values are the fallback.
 MEASURED_GAIN = 759.1  # <--- START WITH GAIN = 1, we will test different values
 MEASURED_OFFSET_V = -1.348 # Your measured offset -  KEEP COMMENTED OUT INITIALLY
 DATASHEET_OFFSET_V = 1.5 # Datasheet specified 1.5V offset
+CALIBRATION = calibration.channel_profile(
+    ADC_CHANNEL, calibration.CalibrationProfile(ADC_CHANNEL, vref=VREF, datasheet_offset_v=DATASHEET_OFFSET_V,
+                                                measured_gain=MEASURED_GAIN, measured_offset_v=MEASURED_OFFSET_V))
 
 # How often to read and print (seconds)
 READ_INTERVAL = 0.1 # Read 10 times per second
@@ -63,11 +69,12 @@ if __name__ == "__main__":
         gain_str = [k for k, v in ADS1256.ADS1256_GAIN_E.items() if v == ADC_GAIN][0]
         rate_str = [k for k, v in ADS1256.ADS1256_DRATE_E.items() if v == ADC_RATE_ENUM][0]
         logging.info(f"ADC Configured: Gain={gain_str}, Rate={rate_str}")
+        if CALIBRATION.load_into(ADC, ADC_GAIN, ADC_RATE_ENUM):
+            logging.info("Loaded the channel's ADC calibration registers (OFC/FSC).")
 
         logging.info(f"Starting continuous readings from Channel {ADC_CHANNEL}. Press Ctrl+C to stop.")
 
         voltage_batch = [] # List to store voltage readings for RMS calculation
-        max_adc_count = 0x7FFFFF # 8388607.0
 
         while not stop_event.is_set():
             read_start_time = time.monotonic()
@@ -76,10 +83,8 @@ if __name__ == "__main__":
 
             if raw_value is not None:
                 # --- Calibrated Voltage Calculation ---
-                voltage_raw = (raw_value / max_adc_count) * VREF
-                voltage_biased = voltage_raw - DATASHEET_OFFSET_V
-                voltage_scaled = voltage_biased / MEASURED_GAIN
-                voltage_calibrated = voltage_scaled - MEASURED_OFFSET_V
+                voltage_raw = ADS1256.codes_to_voltage(raw_value, VREF)
+                voltage_calibrated = CALIBRATION.apply(raw_value)
                 voltage = voltage_raw
                 logging.info(f"Channel {ADC_CHANNEL}: Raw = {raw_value:8d}, Voltage = {voltage: 9.5f} (unCalibrated)")
 
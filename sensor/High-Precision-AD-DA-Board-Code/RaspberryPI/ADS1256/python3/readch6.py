@@ -8,6 +8,7 @@ import sys
 import logging
 import signal
 import threading
+import calibration  # Per-channel calibration profiles
 
 # --- Configuration ---
 ADC_CHANNEL = 2   # *** Set the channel to read from ***
@@ -21,9 +22,14 @@ ADC_RATE_ENUM = ADS1256.ADS1256_DRATE_E['ADS1256_1000SPS']
 READ_INTERVAL = 0.1 # Read 10 times per second
 
 # --- Calibration Values ---
+# The channel's profile from calibration.json (see calibration.py) is used if
+# there is one; these values are the fallback.
 MEASURED_GAIN = 759.1  # Use your average measured gain
 MEASURED_OFFSET_V = -1.348 # Use your average measured offset in Volts (already negative)
 DATASHEET_OFFSET_V = 1.5  # Datasheet specified 1.5V offset
+CALIBRATION = calibration.channel_profile(
+    ADC_CHANNEL, calibration.CalibrationProfile(ADC_CHANNEL, vref=VREF, datasheet_offset_v=DATASHEET_OFFSET_V,
+                                                measured_gain=MEASURED_GAIN, measured_offset_v=MEASURED_OFFSET_V))
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO,
@@ -69,6 +75,8 @@ if __name__ == "__main__":
         gain_str = [k for k, v in ADS1256.ADS1256_GAIN_E.items() if v == ADC_GAIN][0]
         rate_str = [k for k, v in ADS1256.ADS1256_DRATE_E.items() if v == ADC_RATE_ENUM][0]
         logging.info(f"ADC Configured: Gain={gain_str}, Rate={rate_str}")
+        if CALIBRATION.load_into(ADC, ADC_GAIN, ADC_RATE_ENUM):
+            logging.info("Loaded the channel's ADC calibration registers (OFC/FSC).")
 
 
         # 3. Reading Loop
@@ -83,16 +91,10 @@ if __name__ == "__main__":
             if raw_value is not None:
                 # Convert raw ADC value to voltage
                 # ADS1256 is 24-bit, max positive value is 0x7FFFFF for +VREF input
-                # Formula: voltage = (raw_adc / (2^23 - 1)) * Vref / Gain
-                # Since Gain is 1 here, we simplify:
-                # Convert raw ADC value to voltage
-                max_adc_count = 0x7FFFFF # 8388607.0
                 # --- Calibrated Voltage Calculation (with datasheet and measured offsets/gain) ---
-                voltage_raw = (raw_value / max_adc_count) * VREF  # Raw voltage from ADC
-                voltage_biased = voltage_raw - DATASHEET_OFFSET_V # Subtract 1.5V datasheet offset
-                voltage_scaled = voltage_biased / MEASURED_GAIN    # Apply gain correction
-                voltage_calibrated = voltage_scaled - MEASURED_OFFSET_V # Apply measured offset correction
-                voltage = voltage_calibrated # Use calibrated voltage
+                # The profile folds VREF scaling, the datasheet offset, the gain and the
+                # measured offset into one multiply-add.
+                voltage = float(CALIBRATION.apply(raw_value)) # Use calibrated voltage
 
                 logging.info(f"Channel {ADC_CHANNEL}: Raw = {raw_value:8d}, Voltage = {voltage: 9.5f} V (Calibrated)") # Indicate "Calibrated" in log
 
@@ -3,16 +3,39 @@
 
 import ADS1256      # Import the ADS1256 library
 import config       # Import the config library (for init/exit)
+import scheduler    # Runs one scan thread per ADS1256 board
+import timebase     # Sample-index timestamps
+import rtprofile    # Opt-in real-time scheduling for the scan threads
 import psycopg2     # For Database
 import numpy as np  # For RMS calculation
-import datetime     # For Timestamps
 import time
 import sys
-import queue        # For Queue
+import ringbuffer   # Preallocated per-board sample rings
+import calibration  # Per-channel calibration profiles
+import decimate     # Lower-rate streams for storage
+import bulkload     # Binary COPY of the measurement rows
+import trigger      # Event-triggered full-rate capture
+import spool        # Disk spool for writes the database did not take
+import dbsession    # Reconnect and retry after a lost database connection
+import os
 import logging
 import signal
 import threading
 
+# ==============================================================================
+# ==                          BOARD CONFIGURATION                             ==
+# ==============================================================================
+# One dictionary per ADS1256 board, passed to config.Board(). Boards may share
+# an SPI bus on different CS lines but each needs its own DRDY pin.
+#   'rst_pin', 'cs_pin', 'drdy_pin': BCM pin numbers ('rst_pin' may be None)
+#   'spi_bus', 'spi_device': spidev bus/device the board is wired to
+# ------------------------------------------------------------------------------
+BOARDS_CONFIG = [
+    {'rst_pin': 18, 'cs_pin': 22, 'drdy_pin': 17, 'spi_bus': 0, 'spi_device': 0},
+    # --- Add more boards here if needed ---
+    # {'rst_pin': None, 'cs_pin': 23, 'drdy_pin': 27, 'spi_bus': 0, 'spi_device': 1},
+]
+
 # ==============================================================================
 # ==                         SENSOR CONFIGURATION                             ==
 # ==============================================================================
@@ -22,6 +45,18 @@ import threading
 #   'sensor_id': Unique integer ID for this sensor in the database.
 #   'name': String name for the database (e.g., "Voltage Ch2", "Current Ch6").
 #   'type': String type for the database (e.g., "Voltage", "Current").
+# Optional:
+#   'board': Index into BOARDS_CONFIG (default 0).
+#   'gain': ADS1256_GAIN_E value for this channel (default ADC_GAIN).
+#   'drate': ADS1256_DRATE_E value for this channel (default ADC_RATE_ENUM).
+#   'buffer': True to enable the ADC input buffer for this channel (default False).
+#   'mode': 0 single-ended vs AINCOM, 1 differential pair 'channel' (0-3) (default 0).
+#   'every': Read this channel only on every Nth scan of its board (default 1),
+#            e.g. slow voltage channels next to fast current channels.
+#   'trigger': Trigger conditions of this sensor in 'triggered' CAPTURE_MODE
+#              (default CAPTURE_TRIGGER).
+# Each board reads its sensors as a scan table: switching from one sensor to
+# the next only rewrites the ADC registers whose values differ.
 #
 # *** IMPORTANT: 'sensor_id' values MUST be unique across all dictionaries! ***
 # ------------------------------------------------------------------------------
@@ -47,19 +82,33 @@ SENSORS_CONFIG = [
     # --- Add more sensors here if needed ---
     # {
     #     'channel': 0,
-    #     'sensor_id': 3,
-    #     'name': 'Voltage Sensor Ch0',
-    #     'type': 'Voltage'
+    #     'sensor_id': 4,
+    #     'name': 'Current Sensor Ch0',
+    #     'type': 'Current',
+    #     'gain': ADS1256.ADS1256_GAIN_E['ADS1256_GAIN_8'],
+    #     'drate': ADS1256.ADS1256_DRATE_E['ADS1256_7500SPS'],
+    #     'buffer': True
     # },
 ]
 # ==============================================================================
 
 # --- Common ADC/System Config ---
 VREF = 5.0          # *** IMPORTANT: Set this to the ACTUAL measured Vref voltage! ***
-ADC_GAIN = ADS1256.ADS1256_GAIN_E['ADS1256_GAIN_1'] # Gain 1 (Applies to ALL channels read sequentially)
-ADC_RATE_ENUM = ADS1256.ADS1256_DRATE_E['ADS1256_1000SPS'] # 1000 SPS Rate
-ADC_SAMPLE_RATE_HZ = 1000 # ADC hardware rate in Hz (MUST match ADC_RATE_ENUM)
-# Effective sample rate PER CHANNEL will be approx. ADC_SAMPLE_RATE_HZ / number_of_sensors
+ADC_GAIN = ADS1256.ADS1256_GAIN_E['ADS1256_GAIN_1'] # Gain 1 (default for sensors without a 'gain')
+ADC_RATE_ENUM = ADS1256.ADS1256_DRATE_E['ADS1256_3750SPS'] # 3750 SPS Rate (default for sensors without a 'drate')
+ADC_SAMPLE_RATE_HZ = 3750 # ADC hardware rate in Hz (MUST match ADC_RATE_ENUM)
+# Channels are read by cycling the multiplexer: every channel read costs one
+# post-SYNC settling time at that channel's data rate (ADS1256_SETTLE_US, 0.44 ms
+# at 3750 SPS), overlapped with reading out the previous channel. A board's scan
+# takes the sum of its channels' settling times (channels with 'every' N count
+# 1/N of theirs), and each channel gets one sample per scan it takes part in,
+# minus SPI/Python overhead.
+# Boards are scanned concurrently, so adding a board does not slow the others.
+# Run a self-calibration for every scan-table entry at startup, so each channel
+# switches to its own offset/gain calibration registers with its gain and rate.
+# Otherwise the registers come from the channel's calibration profile (see
+# calibration.py) when it was calibrated at the sensor's gain and rate.
+SCAN_SELF_CALIBRATE = False
 
 # --- Database Configuration ---
 DB_HOST = "localhost"
@@ -67,39 +116,132 @@ DB_NAME = "gridsense_db"
 DB_USER = "gridsense_user"
 DB_PASSWORD = "microgrid"
 DB_TABLE = "measurements_six" # Make sure this table exists in gridsense_db
+DB_STATEMENT_TIMEOUT_MS = 5000 # A write stalled longer than this (vacuum, locks) is cancelled and spooled
+DB_CONNECT_TIMEOUT_S = 3 # A connection attempt gives up after this, the writer spools meanwhile
+# After a lost connection the writer reconnects at once, then backs off from
+# DB_RECONNECT_BACKOFF_S, doubling up to DB_RECONNECT_BACKOFF_MAX_S (see dbsession.py)
+DB_RECONNECT_BACKOFF_S = 0.5
+DB_RECONNECT_BACKOFF_MAX_S = 30.0
+
+# --- Write-Ahead Spool ---
+# Write cycles the database did not take (down, restarting, stalled) go to an
+# append-only segment log on disk and are replayed, oldest first, as soon as
+# it takes writes again (see spool.py). The spool survives restarts.
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool', 'readmultiple')
+SPOOL_WRITE_AHEAD = False # True: every write cycle goes through the spool (also survives a crash of this script), False: only the failed ones (fewer SD card writes)
+SPOOL_FSYNC = 'interval'  # 'always', 'interval' or 'never'
+SPOOL_FSYNC_INTERVAL_S = 1.0
+SPOOL_SEGMENT_MB = 16
+SPOOL_MAX_MB = 1024       # Oldest segments are dropped above this (~5 h of 3 sensors at 1 kHz)
+SPOOL_REPLAY_MAX_RECORDS = 20 # Spooled write cycles replayed per write cycle, so live data keeps flowing
 
 # --- Queue and Batching Configuration ---
-DB_WRITE_INTERVAL_S = 1.0 # How often DB writer wakes up to check queue (seconds)
-# Max SETS of readings (one from each sensor) to buffer before forcing DB write
+DB_WRITE_INTERVAL_S = 1.0 # How often DB writer wakes up to check the rings (seconds)
+# Max SETS of readings (one from each sensor of a board) to buffer before forcing DB write
 # Adjust based on number of sensors and desired buffer time
 NUM_SENSORS = len(SENSORS_CONFIG)
-EFFECTIVE_RATE_PER_SENSOR = ADC_SAMPLE_RATE_HZ / NUM_SENSORS if NUM_SENSORS > 0 else 0
-MAX_QUEUE_SIZE = int(EFFECTIVE_RATE_PER_SENSOR * 5) if EFFECTIVE_RATE_PER_SENSOR > 0 else 100 # Approx 5 seconds worth of reading SETS
-
-# --- Clamping Limits for NUMERIC(5, 2) in DB ---
-NUMERIC_5_2_MAX = 999.99
-NUMERIC_5_2_MIN = -999.99
+# Sensors grouped by board index, in SENSORS_CONFIG order: {board_index: [sensor, ...]}
+BOARD_SENSORS = {}
+for _sensor in SENSORS_CONFIG:
+    BOARD_SENSORS.setdefault(_sensor.get('board', 0), []).append(_sensor)
+
+def scan_entry(sensor):
+    """Builds a board scan-table entry from a sensor's config."""
+    return {'channel': sensor['channel'],
+            'mode': sensor.get('mode', 0),
+            'gain': sensor.get('gain', ADC_GAIN),
+            'drate': sensor.get('drate', ADC_RATE_ENUM),
+            'buffer': sensor.get('buffer', False),
+            'every': sensor.get('every', 1)}
+
+# Scan table of each board, in BOARD_SENSORS order
+BOARD_SCAN_TABLES = {board_index: [scan_entry(s) for s in sensors] for board_index, sensors in BOARD_SENSORS.items()}
+BOARD_SCAN_RATES_HZ = {board_index: ADS1256.scan_table_rate_hz(table) for board_index, table in BOARD_SCAN_TABLES.items()}
+# Channel reads per second on each board
+BOARD_READ_RATES_HZ = {board_index: BOARD_SCAN_RATES_HZ[board_index] * sum(1 / entry['every'] for entry in table)
+                       for board_index, table in BOARD_SCAN_TABLES.items()}
+SETS_PER_SECOND = sum(BOARD_SCAN_RATES_HZ.values())
+MAX_QUEUE_SIZE = int(SETS_PER_SECOND * 5) if SETS_PER_SECOND > 0 else 100 # Approx 5 seconds worth of reading SETS
+# Full ring: OVERWRITE drops the oldest samples (counted as lost by the writer),
+# BLOCK stalls the board's scan thread up to RING_BLOCK_TIMEOUT_S per scan instead.
+RING_POLICY = ringbuffer.OVERWRITE
+RING_BLOCK_TIMEOUT_S = 0.5
+# Scan cadence = settling time x channels plus Python overhead, so the nominal
+# scan rate is only an estimate; each board's clock measures the real one over
+# this many seconds at start-up and then corrects it by crystal drift only.
+SCAN_CLOCK_CALIBRATE_S = 5.0
+
+# --- Decimated Streams ---
+# Lower-rate copies of every sensor's stream, each stage decimating the one
+# before it and written to its own table in rows of DECIMATED_ROW_SECONDS of
+# data (see decimate.py). Empty list: raw data only. The chains are built
+# from each board's measured scan rate after its first write cycle.
+DECIMATION_STAGES = [
+    {'rate_hz': 100, 'table': 'measurements_100hz'},
+    {'rate_hz': 10, 'table': 'measurements_10hz'},
+]
+DECIMATED_ROW_SECONDS = 10.0
+
+# --- Triggered Capture ---
+# 'continuous': every sample is written to DB_TABLE.
+# 'triggered': full-rate samples are written to DB_TABLE only around trigger
+# events, from CAPTURE_PRE_S before the first triggering sample to
+# CAPTURE_POST_S after the last one; steady state is kept by the decimated
+# streams only. Trigger conditions (see trigger.py), any of:
+#   'threshold': |v| above this (sensor units)
+#   'slope': |dv/dt| above this (sensor units per second)
+#   'rms_deviation': one-cycle RMS off its slow baseline by more than this fraction
+CAPTURE_MODE = 'continuous'
+CAPTURE_PRE_S = 0.5
+CAPTURE_POST_S = 1.0
+CAPTURE_TRIGGER = {'rms_deviation': 0.1}
+
+# --- Real-Time Profile (opt-in, needs root or CAP_SYS_NICE/CAP_IPC_LOCK) ---
+# SCHED_FIFO + CPU pinning for every board's scan thread, mlockall and a frozen
+# GC for the process; see rtprofile.py. Boards are pinned round-robin to
+# RT_SAMPLER_CPUS, ideally cores isolated with isolcpus= on the kernel cmdline.
+RT_PROFILE = False
+RT_SAMPLER_CPUS = [3, 2]
+RT_PRIORITY = rtprofile.DEFAULT_PRIORITY
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s')
 
 # --- Global Variables ---
-# Queue holds tuples: (timestamp, {sensor_id_1: voltage_1, sensor_id_2: voltage_2, ...})
-data_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+# One single-producer/single-consumer ring per board (its scan thread -> DB writer).
+# Records are (time_ns, scan seq, sensor_id, raw code): the channel field holds
+# the sensor_id, since channel numbers repeat across boards, and every sensor of
+# a scan shares the board's scan sequence number.
+# Each ring holds 10 seconds of the board's channel reads, allocated once.
+BOARD_RINGS = {board_index: ringbuffer.SampleRing(max(1, int(BOARD_READ_RATES_HZ[board_index] * 10)), RING_POLICY)
+               for board_index in BOARD_SENSORS}
+BOARD_SENSOR_IDS = {board_index: np.array([s['sensor_id'] for s in sensors], dtype=np.int32)
+                    for board_index, sensors in BOARD_SENSORS.items()}
+BOARD_SENSOR_EVERY = {board_index: np.array([entry['every'] for entry in table], dtype=np.int64)
+                      for board_index, table in BOARD_SCAN_TABLES.items()}
+# One sample clock per board, ticking once per completed scan
+BOARD_CLOCKS = {board_index: timebase.SampleClock(BOARD_SCAN_RATES_HZ[board_index], calibrate_s=SCAN_CLOCK_CALIBRATE_S)
+                for board_index in BOARD_SENSORS}
 stop_event = threading.Event() # Event for stopping threads gracefully
-ADC = None # ADC object holder
+ADCS = {} # ADC object holders, keyed by board index
 # Dictionary to map sensor_id back to its config (for DB writer)
 SENSOR_ID_TO_CONFIG = {sensor['sensor_id']: sensor for sensor in SENSORS_CONFIG}
+# Calibration profile of each sensor_id, and the fused code -> volts transform
+# indexed by sensor_id (filled in by load_sensor_calibration())
+SENSOR_CALIBRATION = {}
+CAL_SCALE = np.full(max(SENSOR_ID_TO_CONFIG, default=0) + 1, VREF / ADS1256.MAX_ADC_COUNT)
+CAL_OFFSET = np.zeros_like(CAL_SCALE)
+# Decimation chain of each sensor_id and its decimated samples not written yet
+DECIMATED = decimate.DecimatedStreams(DECIMATION_STAGES, DECIMATED_ROW_SECONDS)
+SENSOR_NAMES = {sensor['sensor_id']: (sensor['name'], sensor['type']) for sensor in SENSORS_CONFIG}
+# Triggered capture state of each sensor_id ('triggered' CAPTURE_MODE)
+CAPTURES = {}
+# Bulk loader of the DB_TABLE rows (binary COPY, multi-row INSERT fallback)
+MEASUREMENTS = bulkload.BulkLoader(DB_TABLE, bulkload.MEASUREMENT_COLUMNS, unique=bulkload.MEASUREMENT_KEY)
+MEASUREMENT_IDS = bulkload.IdAllocator(DB_TABLE) # Row ids from the table's sequence
 
 
-# --- Clamping Function ---
-def clamp_value(value, min_val=NUMERIC_5_2_MIN, max_val=NUMERIC_5_2_MAX):
-    """Clamps a value within the specified min/max range. Handles None."""
-    if not isinstance(value, (int, float)):
-        return 0.0 # Default value for non-numeric types (like None)
-    return max(min_val, min(max_val, value))
-
 # --- Database Functions (No changes needed from previous versions) ---
 def create_connection():
     """Establishes a connection to the PostgreSQL database."""
@@ -110,188 +252,212 @@ def create_connection():
             user=DB_USER,
             password=DB_PASSWORD,
             host=DB_HOST,
-            port="5432"
+            port="5432",
+            connect_timeout=DB_CONNECT_TIMEOUT_S,
+            tcp_user_timeout=DB_STATEMENT_TIMEOUT_MS, # Unacknowledged data on a dead network breaks the connection too
+            options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
         )
         logging.info(f"Connection to PostgreSQL DB '{DB_NAME}' successful")
     except psycopg2.OperationalError as e:
         logging.error(f"Database connection error: {e}", exc_info=True)
     return connection
 
-def get_max_id(connection):
-    """Gets the maximum ID from the specified database table."""
-    max_id = 0
+def batch_row(sensor_id, times_ns, voltages, sname, stype, sample_counts=(None, None, None), first_seq=None):
+    """ Builds the DB_TABLE row (without its id) of a batch of sensor data for ONE
+        sensor, from its sample times and voltages (NumPy arrays).
+        sample_counts is the batch's (expected, received, dropped) sample accounting,
+        first_seq the sequence number of its first sample (part of the batch key).
+    """
+    sensdata = bulkload.sensdata_array(times_ns, voltages) # Clamped [voltage, delta_t] pairs
+    return (sensor_id, sensdata, timebase.ns_to_datetime(int(times_ns[0])),
+            bulkload.rms(sensdata[:, 0]), sname, stype,
+            0, # Placeholder for THD
+            0, # Placeholder for PF
+            *sample_counts, first_seq)
+
+def insert_batch_data(connection, rows):
+    """ Inserts the batch_row() rows of a write cycle (any number of sensors) in one
+        round trip, with ids from the table's sequence. Rows already in the table
+        (same sensor, start time and first sample) are skipped. Returns the rows
+        with their ids; errors are logged, rolled back and raised.
+    """
     try:
-        with connection.cursor() as cursor:
-            query = f"SELECT MAX(id) FROM {DB_TABLE};"
-            cursor.execute(query)
-            result = cursor.fetchone()
-            if result and result[0] is not None:
-                max_id = result[0]
-    except psycopg2.Error as e:
-        logging.error(f"Error getting max ID from {DB_TABLE}: {e}")
-    return max_id
-
-def calculate_rms(voltage_list):
-    """Calculates RMS value from a list of voltage floats."""
-    if not voltage_list:
-        return 0.0
-    numeric_array = np.array([v for v in voltage_list if isinstance(v, (int, float))], dtype=float)
-    if numeric_array.size == 0:
-        return 0.0
-    return np.sqrt(np.mean(np.square(numeric_array)))
-
-def insert_batch_data(connection, batch_id, sensor_id, batch_start_time, sensdata_batch, sname, stype):
-    """ Inserts a batch of sensor data into the database for ONE sensor. """
-    if not sensdata_batch:
-        logging.warning(f"Attempted to insert empty batch for Sensor ID {sensor_id}.")
-        return False
-
-    voltages_only = [item[0] for item in sensdata_batch]
-    rms_value = calculate_rms(voltages_only)
-
-    clamped_rms = clamp_value(rms_value)
-    if clamped_rms != rms_value:
-        logging.warning(f"Clamped RMS value from {rms_value:.4f} to {clamped_rms:.2f} for Sensor ID {sensor_id}, Batch ID {batch_id}")
+        rows = [(batch_id, *row) for batch_id, row in zip(MEASUREMENT_IDS.take(connection, len(rows)), rows)]
+        MEASUREMENTS.load(connection, rows)
+        logging.debug(f"Successfully inserted {len(rows)} batch(es), IDs {rows[0][0]}-{rows[-1][0]}.")
+        return rows
 
-    try:
-        with connection.cursor() as cursor:
-            timestamp = batch_start_time.isoformat()
-            query = f"""
-            INSERT INTO {DB_TABLE}(id, sensor_id, sensdata, time, rmsvalue, sname, stype, thd, pf)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
-            """
-            cursor.execute(query, (
-                batch_id,
-                sensor_id,
-                sensdata_batch, # Already clamped [voltage, delta_t] pairs
-                timestamp,
-                float(clamped_rms),
-                sname,
-                stype,
-                0,  # Placeholder for THD
-                0   # Placeholder for PF
-            ))
-            connection.commit()
-            logging.debug(f"Successfully inserted batch ID {batch_id} for Sensor ID {sensor_id} with {len(sensdata_batch)} samples.")
-            return True
-
-    except (psycopg2.Error, TypeError) as e:
-        logging.error(f"Error inserting batch ID {batch_id} for Sensor ID {sensor_id}: {e}", exc_info=True)
+    except (psycopg2.Error, TypeError, ValueError) as e:
+        logging.error(f"Error inserting {len(rows)} batch(es): {e}", exc_info=True)
         try: connection.rollback()
         except psycopg2.Error as rb_e: logging.error(f"Error rolling back transaction: {rb_e}")
-        return False
+        raise
 
-# --- ADC Sampling Thread (MODIFIED FOR MULTIPLE SENSORS) ---
-def adc_sampler_thread():
-    """Continuously samples all configured ADC channels sequentially and puts results onto the queue."""
-    if not SENSORS_CONFIG:
-        logging.error("Sampler: No sensors configured in SENSORS_CONFIG. Stopping thread.")
-        stop_event.set()
+def insert_decimated(connection, rows):
+    """ Inserts DecimatedStreams.take_rows() rows. Errors are logged, rolled back and raised. """
+    try:
+        decimate.insert_rows(connection, rows, SENSOR_NAMES)
+        logging.debug(f"Inserted {len(rows)} decimated stream row(s).")
+    except (psycopg2.Error, TypeError, ValueError) as e:
+        logging.error(f"Error inserting {len(rows)} decimated stream row(s): {e}", exc_info=True)
+        try: connection.rollback()
+        except psycopg2.Error as rb_e: logging.error(f"Error rolling back transaction: {rb_e}")
+        raise
+
+def write_record(connection, record):
+    """ Writes one write cycle's record: ('raw', batch_row() rows) or
+        ('decimated', DecimatedStreams.take_rows() rows). Returns True; database
+        errors are raised for db_session.call() to sort out. The records are
+        what the spool keeps while the database is unavailable.
+    """
+    kind, rows = record
+    if kind == 'decimated':
+        insert_decimated(connection, rows)
+        return True
+    for row in insert_batch_data(connection, rows):
+        expected, received, dropped = row[-4:-1]
+        logging.info(f"DB Write: ID {row[0]}, SensorID {row[1]}, Samples: {received}/{expected} "
+                     f"({dropped} dropped), StartTime: {row[3].time()}")
+    return True
+
+def write_decimated(writer, flush=False):
+    """ Writes the decimated stream rows that are complete (all pending samples if flush). """
+    rows = DECIMATED.take_rows(flush)
+    if rows:
+        writer.submit(('decimated', rows))
+
+def sensor_rate_hz(sensor_id):
+    """ A sensor's sample rate from its board's measured (not nominal) scan rate. """
+    sensor = SENSOR_ID_TO_CONFIG[sensor_id]
+    return 1e9 / BOARD_CLOCKS[sensor.get('board', 0)].period_ns / sensor.get('every', 1)
+
+def decimate_batch(sensor_id, times_ns, voltages):
+    """ Feeds one sensor's batch of samples to its decimation chain. """
+    if not DECIMATION_STAGES:
         return
-
-    sensor_channels = [s['channel'] for s in SENSORS_CONFIG] # List of channels to read
-    sensor_ids = [s['sensor_id'] for s in SENSORS_CONFIG] # List of sensor IDs in same order
-    num_sensors = len(sensor_channels)
-
-    logging.info(f"ADC Sampler started - Reading {num_sensors} channels {sensor_channels} sequentially.")
-    logging.info(f"Target ADC Rate: {ADC_SAMPLE_RATE_HZ} SPS. Effective rate/channel approx {EFFECTIVE_RATE_PER_SENSOR:.1f} SPS.")
-
-    max_adc_count = 0x7FFFFF # 8388607.0
-
-    while not stop_event.is_set():
-        read_start_time = time.monotonic() # Time the whole read cycle
-        raw_readings = {} # Store raw values for this cycle {channel: raw_value}
-        read_success = True
-
-        # Read all configured channels sequentially
-        for channel in sensor_channels:
-            if not ADC.ADS1256_SetChannal(channel):
-                logging.error(f"Sampler: Failed to set ADC channel {channel}.")
-                read_success = False
-                break # Stop reading this cycle if channel set fails
-
-            raw_value = ADC.ADS1256_Read_ADC_Data()
-            if raw_value is None:
-                logging.warning(f"Sampler: Failed to read ADC channel {channel} (WaitDRDY Timeout?)")
-                # Decide how to handle partial failure: continue?, discard cycle?
-                # For now, mark as failure and don't queue this cycle's data
-                read_success = False
-                break
-            raw_readings[channel] = raw_value
-
-        # If any part of the read cycle failed, skip queueing and delay slightly
-        if not read_success:
-            time.sleep(0.1)
-            continue
-
-        # All reads successful, get timestamp and process
-        measurement_time = datetime.datetime.now(datetime.timezone.utc)
-        voltage_readings = {} # {sensor_id: voltage}
-
-        for i, sensor_config in enumerate(SENSORS_CONFIG):
-            channel = sensor_config['channel']
-            sensor_id = sensor_config['sensor_id']
-            raw_value = raw_readings.get(channel) # Should exist if read_success is True
-
-            if raw_value is not None: # Should always be true here, but good practice
-                 voltage = (raw_value / max_adc_count) * VREF if VREF != 0 else 0.0
-                 voltage_readings[sensor_id] = voltage
-            # else: # This case shouldn't happen if read_success is True
-            #     voltage_readings[sensor_id] = None # Or handle error
-
-        # Put results onto the queue
-        try:
-            data_queue.put((measurement_time, voltage_readings), block=True, timeout=0.5)
-        except queue.Full:
-            logging.warning("Data queue is full. Sample SET might be dropped.")
-        except Exception as e:
-             logging.error(f"Error putting data onto queue: {e}")
-
-        # --- Calculate sleep time ---
-        read_end_time = time.monotonic()
-        elapsed_time = read_end_time - read_start_time
-        expected_time = num_sensors / ADC_SAMPLE_RATE_HZ if ADC_SAMPLE_RATE_HZ > 0 else 0.01
-        sleep_time = max(0, expected_time - elapsed_time)
-        stop_event.wait(sleep_time) # Interruptible sleep
-
-    logging.info("ADC Sampler thread finished.")
+    if sensor_id not in DECIMATED.chains:
+        chain = DECIMATED.add_sensor(sensor_id, sensor_rate_hz(sensor_id))
+        logging.info(f"Sensor ID {sensor_id}: decimated streams at "
+                     f"{', '.join(f'{rate:.2f}' for rate in chain.rates_hz)} Hz.")
+    DECIMATED.process(sensor_id, voltages, times_ns)
+
+def capture_batch(sensor_id, times_ns, seqs, voltages):
+    """ Runs one sensor's batch through its triggered capture. Returns the
+        captured samples as [(times_ns, voltages, sample counts, first seq), ...],
+        one entry per DB_TABLE row.
+    """
+    capture = CAPTURES.get(sensor_id)
+    if capture is None:
+        rate_hz = sensor_rate_hz(sensor_id)
+        conditions = SENSOR_ID_TO_CONFIG[sensor_id].get('trigger', CAPTURE_TRIGGER)
+        capture = CAPTURES[sensor_id] = trigger.TriggeredCapture(
+            rate_hz, trigger.TriggerDetector(rate_hz, **conditions), CAPTURE_PRE_S, CAPTURE_POST_S)
+    captures_before = capture.captures
+    segments = capture.process(times_ns, seqs, voltages)
+    if capture.captures != captures_before:
+        logging.info(f"Trigger: SensorID {sensor_id} started {capture.captures - captures_before} capture(s) "
+                     f"({capture.captures} since start).")
+    rows = []
+    for times_ns, seqs, voltages in segments:
+        for part in trigger.split_by_span(times_ns, bulkload.ROW_SPAN_NS):
+            row_seqs = seqs[part]
+            expected = int(row_seqs[-1] - row_seqs[0]) + 1
+            rows.append((times_ns[part], voltages[part],
+                         (expected, len(row_seqs), max(0, expected - len(row_seqs))), int(row_seqs[0])))
+    return rows
+
+# --- Calibration ---
+def load_sensor_calibration():
+    """Loads every sensor's calibration profile (plain VREF scaling if it has none)."""
+    for sensor in SENSORS_CONFIG:
+        board_index = sensor.get('board', 0)
+        fallback = calibration.CalibrationProfile(sensor['channel'], board=board_index, vref=VREF)
+        profile = calibration.channel_profile(sensor['channel'], fallback, board=board_index)
+        SENSOR_CALIBRATION[sensor['sensor_id']] = profile
+        CAL_SCALE[sensor['sensor_id']] = profile.scale
+        CAL_OFFSET[sensor['sensor_id']] = profile.offset
+
+# --- Scan Thread Setup (called first thing in each board's scan thread) ---
+def init_scan_thread(board_index):
+    """Applies the real-time profile to a board's scan thread."""
+    if RT_PROFILE:
+        cpu = RT_SAMPLER_CPUS[board_index % len(RT_SAMPLER_CPUS)] if RT_SAMPLER_CPUS else None
+        rtprofile.apply(priority=RT_PRIORITY, cpu=cpu)
+
+# --- ADC Scan Handler (called from each board's scan thread) ---
+def ring_board_scan(board_index, raw_values):
+    """Appends one completed scan of a board to the board's sample ring."""
+    # All reads successful, timestamp from the board's scan index
+    clock = BOARD_CLOCKS[board_index]
+    measurement_time_ns, _ = clock.burst(1)
+
+    # Results come back in the board's scan order, i.e. BOARD_SENSORS order,
+    # with None for the sensors whose 'every' skipped this scan
+    read = [i for i, value in enumerate(raw_values) if value is not None]
+    if not read:
+        return
+    # A sensor read on every Nth scan numbers its samples scan_seq // N
+    seqs = clock.burst_seq // BOARD_SENSOR_EVERY[board_index][read]
+    written = BOARD_RINGS[board_index].write(measurement_time_ns, BOARD_SENSOR_IDS[board_index][read], seqs,
+                                             np.array([raw_values[i] for i in read], dtype=np.int32),
+                                             timeout=RING_BLOCK_TIMEOUT_S)
+    if written < len(read):
+        logging.warning(f"Sample ring of board {board_index} full for {RING_BLOCK_TIMEOUT_S}s, scan dropped.")
 
 
 # --- Database Writer Thread (MODIFIED FOR MULTIPLE SENSORS) ---
-def database_writer_thread(db_connection):
-    """ Periodically collects data from the queue and writes batches to the database (one row per sensor per batch). """
+def database_writer_thread(db_session):
+    """ Periodically drains the board rings and writes batches to the database (one row per sensor per batch). """
     logging.info("Database Writer thread started.")
     last_write_time = time.monotonic()
+    writer = spool.SpooledWriter(
+        spool.Spool(SPOOL_DIR, segment_bytes=SPOOL_SEGMENT_MB * 2**20, max_bytes=SPOOL_MAX_MB * 2**20,
+                    fsync=SPOOL_FSYNC, fsync_interval_s=SPOOL_FSYNC_INTERVAL_S),
+        lambda record: db_session.call(write_record, record), SPOOL_WRITE_AHEAD, SPOOL_REPLAY_MAX_RECORDS)
 
-    # Use a dictionary to store raw batches, keyed by sensor_id
-    # { sensor_id_1: [(ts, voltage), (ts, voltage), ...], sensor_id_2: [...], ... }
+    # Each sensor's samples since the last write, as (time_ns, seq, voltage) array chunks
+    # { sensor_id_1: [(times, seqs, voltages), ...], sensor_id_2: [...], ... }
     current_raw_batches = {sensor_id: [] for sensor_id in SENSOR_ID_TO_CONFIG.keys()}
-
-    current_db_id = get_max_id(db_connection) # Get initial max ID
-
-    while not stop_event.is_set() or not data_queue.empty():
-        try:
-            # Dequeue the data: (timestamp, {sensor_id: voltage, ...})
-            timestamp, voltage_dict = data_queue.get(block=True, timeout=0.1)
-
-            # Distribute the voltages to the correct raw batch lists
-            for sensor_id, voltage in voltage_dict.items():
-                if sensor_id in current_raw_batches:
-                    current_raw_batches[sensor_id].append((timestamp, voltage))
-                else:
-                    logging.warning(f"DB Writer: Received data for unknown sensor_id {sensor_id}. Ignoring.")
-            data_queue.task_done()
-        except queue.Empty:
-            if stop_event.is_set():
-                logging.debug("Queue empty and stop event set, proceeding to final write check.")
-            pass # No data arrived in timeout window
+    batch_lengths = dict.fromkeys(SENSOR_ID_TO_CONFIG, 0) # Samples in each sensor's chunks
+
+    lost_reported = {board_index: 0 for board_index in BOARD_RINGS}
+    accounting = ringbuffer.SeqAccounting() # Per sensor_id expected/received/dropped from scan sequence numbers
+
+    while not stop_event.is_set() or any(ring.available() for ring in BOARD_RINGS.values()):
+        received = 0
+        for board_index, ring in BOARD_RINGS.items():
+            # Bulk slice of the ring (zero-copy view): (time_ns, seq, sensor_id, code) records
+            records = ring.read()
+            if records.size:
+                received += records.size
+                # Each record's sensor's affine calibration, for the whole slice at once
+                sensor_ids = records['channel']
+                voltages = records['code'] * CAL_SCALE[sensor_ids] + CAL_OFFSET[sensor_ids]
+                # Split the samples by sensor (boolean indexing copies out of the ring)
+                chunks = []
+                for sensor_id in np.unique(sensor_ids).tolist():
+                    if sensor_id not in current_raw_batches:
+                        logging.warning(f"DB Writer: Received data for unknown sensor_id {sensor_id}. Ignoring.")
+                        continue
+                    mask = sensor_ids == sensor_id
+                    chunks.append((sensor_id, (records['time_ns'][mask], records['seq'][mask], voltages[mask])))
+                if ring.intact():
+                    for sensor_id, chunk in chunks:
+                        current_raw_batches[sensor_id].append(chunk)
+                        batch_lengths[sensor_id] += len(chunk[0])
+                else: # The scan thread lapped the view while it was copied: the copies may be torn
+                    ring.lost += records.size # Reported below; the sequence gaps count them as dropped
+                ring.release() # Done with the view
+            if ring.lost != lost_reported[board_index]:
+                logging.warning(f"DB writer fell behind board {board_index}: {ring.lost - lost_reported[board_index]} samples overwritten in its ring.")
+                lost_reported[board_index] = ring.lost
+        if not received and not stop_event.is_set():
+            time.sleep(0.1) # No data arrived in any ring
 
         current_time = time.monotonic()
         # Check if ANY batch is nearing the max size or if write interval passed
         # Note: MAX_QUEUE_SIZE is for SETS of readings. Each batch length relates to this.
-        longest_batch_len = 0
-        if current_raw_batches:
-             longest_batch_len = max(len(batch) for batch in current_raw_batches.values())
+        longest_batch_len = max(batch_lengths.values(), default=0)
 
         force_write = longest_batch_len >= (MAX_QUEUE_SIZE * 0.9)
         time_to_write = (current_time - last_write_time) >= DB_WRITE_INTERVAL_S
@@ -303,10 +469,11 @@ def database_writer_thread(db_connection):
 
             write_start_time = time.monotonic()
             batches_processed_count = 0
+            pending_rows = [] # All sensors' rows of this cycle, written together
 
             # Iterate through each sensor's batch
-            for sensor_id, raw_batch in current_raw_batches.items():
-                if not raw_batch: # Skip if this sensor's batch is empty
+            for sensor_id, chunks in current_raw_batches.items():
+                if not chunks: # Skip if this sensor's batch is empty
                     continue
 
                 batches_processed_count += 1
@@ -316,38 +483,53 @@ def database_writer_thread(db_connection):
                      continue # Skip this batch
 
                 # Process this sensor's batch
-                batch_start_time = raw_batch[0][0]
-                sensdata_for_db = []
-                for item_timestamp, item_voltage in raw_batch:
-                    clamped_voltage = clamp_value(item_voltage)
-                    delta_t_ms = (item_timestamp - batch_start_time).total_seconds() * 1000.0
-                    clamped_delta_t_ms = clamp_value(delta_t_ms)
-                    sensdata_for_db.append([round(clamped_voltage, 2), round(clamped_delta_t_ms, 2)])
-
-                # Increment DB ID and insert
-                current_db_id += 1
-                success = insert_batch_data(
-                    db_connection, current_db_id, sensor_id, batch_start_time,
-                    sensdata_for_db, sensor_config['name'], sensor_config['type']
-                )
-
-                if success:
-                    logging.info(f"DB Write: ID {current_db_id}, SensorID {sensor_id}, Samples: {len(sensdata_for_db)}, StartTime: {batch_start_time.time()}")
+                times_ns, seqs, voltages = (np.concatenate(arrays) for arrays in zip(*chunks))
+                batch_start_time = timebase.ns_to_datetime(int(times_ns[0]))
+                # Full-rate rows: the whole batch, or only the captured samples in triggered mode
+                if CAPTURE_MODE == 'triggered':
+                    expected, received, dropped = accounting.count(sensor_id, seqs)
+                    row_batches = capture_batch(sensor_id, times_ns, seqs, voltages)
                 else:
-                    logging.error(f"DB Write failed for SensorID {sensor_id} batch starting at {batch_start_time}")
-                    current_db_id -= 1 # Decrement ID on failure
+                    # A write cycle held up by the database leaves more than a row's span of samples
+                    row_batches = [(times_ns[part], voltages[part], accounting.count(sensor_id, seqs[part]), int(seqs[part][0]))
+                                   for part in trigger.split_by_span(times_ns, bulkload.ROW_SPAN_NS)]
+                    expected, received, dropped = (sum(counts) for counts in zip(*(row[2] for row in row_batches)))
+                if dropped:
+                    logging.warning(f"Sample gap: SensorID {sensor_id} batch starting at {batch_start_time} is missing "
+                                    f"{dropped} of {expected} samples ({accounting.dropped[sensor_id]} of "
+                                    f"{accounting.expected[sensor_id]} dropped since start).")
+                decimate_batch(sensor_id, times_ns, voltages)
+
+                for row_times_ns, row_voltages, row_counts, row_first_seq in row_batches:
+                    pending_rows.append(batch_row(
+                        sensor_id, row_times_ns, row_voltages,
+                        sensor_config['name'], sensor_config['type'], row_counts, row_first_seq
+                    ))
+
+            # One round trip for the whole cycle, or the spool if the database does not take it
+            if pending_rows:
+                writer.submit(('raw', pending_rows))
+
+            write_decimated(writer)
 
             # --- Reset ALL batches and timer ---
             for sensor_id in current_raw_batches:
-                current_raw_batches[sensor_id] = [] # Clear the list for this sensor
+                current_raw_batches[sensor_id] = [] # Clear the chunks of this sensor
+                batch_lengths[sensor_id] = 0
             last_write_time = current_time
+            rtprofile.collect_garbage() # GC runs here, not in the scan threads, when the RT profile is on
             logging.debug(f"DB write cycle finished processing {batches_processed_count} batches in {time.monotonic() - write_start_time:.3f}s")
 
 
-        # Prevent busy-waiting when queue is empty
+        # Prevent busy-waiting when the rings are empty
         if not has_data and not stop_event.is_set():
             time.sleep(0.05)
 
+    write_decimated(writer, flush=True) # Partial rows of the decimated streams
+    writer.drain()
+    if writer.spool.pending:
+        logging.warning(f"{writer.spool.backlog_bytes()} bytes left in the spool, replayed at the next start.")
+    writer.spool.close()
     logging.info("Database Writer thread finished.")
 
 
@@ -367,14 +549,23 @@ if __name__ == "__main__":
     if len(sensor_ids) != len(set(sensor_ids)):
         logging.critical("Configuration Error: Duplicate 'sensor_id' values found in SENSORS_CONFIG! IDs must be unique.")
         sys.exit(1)
-    channels = [s['channel'] for s in SENSORS_CONFIG]
-    if len(channels) != len(set(channels)):
-        logging.warning("Configuration Warning: Duplicate 'channel' values found in SENSORS_CONFIG. Reading same channel multiple times.")
+    for board_index, board_sensors in BOARD_SENSORS.items():
+        if not (0 <= board_index < len(BOARDS_CONFIG)):
+            logging.critical(f"Configuration Error: Sensor(s) reference board {board_index}, but only {len(BOARDS_CONFIG)} board(s) are defined in BOARDS_CONFIG.")
+            sys.exit(1)
+        channels = [s['channel'] for s in board_sensors]
+        if len(channels) != len(set(channels)):
+            logging.warning(f"Configuration Warning: Duplicate 'channel' values found for board {board_index}. Reading same channel multiple times.")
+    if CAPTURE_MODE not in ('continuous', 'triggered'):
+        logging.critical(f"Configuration Error: Unknown CAPTURE_MODE '{CAPTURE_MODE}' (expected 'continuous' or 'triggered').")
+        sys.exit(1)
+    if CAPTURE_MODE == 'triggered' and not DECIMATION_STAGES:
+        logging.warning("Configuration Warning: Triggered capture without DECIMATION_STAGES stores nothing between events.")
     # ------------------------------
 
     logging.info(f"Starting ADS1256 Data Logger for {len(SENSORS_CONFIG)} sensor(s)...")
-    db_connection = None
-    sampler = None
+    db_session = dbsession.DatabaseSession(create_connection, DB_RECONNECT_BACKOFF_S, DB_RECONNECT_BACKOFF_MAX_S)
+    sampler = None # BoardScheduler running one scan thread per board
     db_writer = None
 
     # Register signal handlers
@@ -382,38 +573,51 @@ if __name__ == "__main__":
     signal.signal(signal.SIGTERM, signal_handler)
 
     try:
-        # 1. Initialize ADC Hardware
-        ADC = ADS1256.ADS1256()
-        if ADC.ADS1256_init() != 0:
-            logging.critical("Failed to initialize ADS1256 hardware via ADS1256_init(). Exiting.")
-            raise RuntimeError("ADC Initialization Failed")
-        logging.info("ADS1256 hardware initialized successfully.")
+        load_sensor_calibration()
+
+        # 1. Initialize ADC Hardware, one ADS1256 instance per board that has sensors
+        for board_index in sorted(BOARD_SENSORS):
+            ADC = ADS1256.ADS1256(config.Board(**BOARDS_CONFIG[board_index]))
+            if ADC.ADS1256_init() != 0:
+                logging.critical(f"Failed to initialize ADS1256 board {board_index} via ADS1256_init(). Exiting.")
+                raise RuntimeError("ADC Initialization Failed")
+            logging.info(f"ADS1256 board {board_index} ({ADC.board}) initialized successfully.")
+
+            # 2. Configure ADC Gain and Rate (the scan table then sets them per channel)
+            if not ADC.ADS1256_ConfigADC(ADC_GAIN, ADC_RATE_ENUM):
+                 logging.critical(f"Failed to configure ADC Gain/Rate on board {board_index}. Exiting.")
+                 raise RuntimeError("ADC Configuration Failed")
+            for sensor, entry in zip(BOARD_SENSORS[board_index], BOARD_SCAN_TABLES[board_index]):
+                if SCAN_SELF_CALIBRATE:
+                    if not ADC.ADS1256_CalibrateScanEntry(entry):
+                        logging.critical(f"Self-calibration of channel {entry['channel']} on board {board_index} failed. Exiting.")
+                        raise RuntimeError("ADC Calibration Failed")
+                    logging.info(f"Board {board_index} channel {entry['channel']}: OFC={entry['ofc']}, FSC={entry['fsc']:#08x}")
+                    continue
+                profile = SENSOR_CALIBRATION[sensor['sensor_id']]
+                if profile.ofc is not None and (profile.adc_gain, profile.adc_drate) == (entry['gain'], entry['drate']):
+                    entry['ofc'], entry['fsc'] = profile.ofc, profile.fsc
+            ADCS[board_index] = ADC
         logging.warning(f"Using VREF = {VREF}V for voltage calculation. Ensure this is correct!")
-
-        # 2. Configure ADC Gain and Rate (Applies to the sequence of reads)
-        if not ADC.ADS1256_ConfigADC(ADC_GAIN, ADC_RATE_ENUM):
-             logging.critical("Failed to configure ADC Gain/Rate. Exiting.")
-             raise RuntimeError("ADC Configuration Failed")
         gain_str = [k for k, v in ADS1256.ADS1256_GAIN_E.items() if v == ADC_GAIN][0]
         rate_str = [k for k, v in ADS1256.ADS1256_DRATE_E.items() if v == ADC_RATE_ENUM][0]
-        logging.info(f"ADC Configured: Gain={gain_str}, Rate={rate_str} ({ADC_SAMPLE_RATE_HZ} SPS hardware rate)")
-        if EFFECTIVE_RATE_PER_SENSOR > 0:
-            logging.info(f"Effective sample rate PER CHANNEL approx {EFFECTIVE_RATE_PER_SENSOR:.1f} SPS.")
-        else:
-             logging.warning("Cannot calculate effective sample rate (0 sensors or 0 Hz?).")
+        logging.info(f"ADC Configured: Gain={gain_str}, Rate={rate_str} ({ADC_SAMPLE_RATE_HZ} SPS hardware rate) unless set per sensor")
+        for board_index, sensors in BOARD_SENSORS.items():
+            for sensor, entry in zip(sensors, BOARD_SCAN_TABLES[board_index]):
+                logging.info(f"Sensor ID {sensor['sensor_id']} (board {board_index}, channel {entry['channel']}): "
+                             f"effective sample rate approx {BOARD_SCAN_RATES_HZ[board_index] / entry['every']:.1f} SPS.")
 
         # 3. Connect to Database
-        db_connection = create_connection()
-        if not db_connection:
-            logging.critical("Failed to connect to database. Exiting.")
-            raise RuntimeError("Database Connection Failed")
+        if db_session.get() is None: # The writer keeps trying, spooling the data meanwhile
+            logging.warning("Database not reachable at start, spooling until it is.")
 
-        # 4. Create and start threads
-        sampler = threading.Thread(target=adc_sampler_thread, name="ADCSampler")
-        db_writer = threading.Thread(target=database_writer_thread, args=(db_connection,), name="DBWriter")
+        # 4. Create and start threads (one scan thread per board + DB writer)
+        sampler = scheduler.BoardScheduler(stop_event, thread_init=init_scan_thread)
+        for board_index, ADC in ADCS.items():
+            sampler.add_board(board_index, ADC, BOARD_SCAN_TABLES[board_index], ring_board_scan)
+        db_writer = threading.Thread(target=database_writer_thread, args=(db_session,), name="DBWriter")
 
-        sampler.daemon = False # Ensure graceful shutdown
-        db_writer.daemon = False
+        db_writer.daemon = False # Ensure graceful shutdown
 
         logging.info("Starting worker threads...")
         sampler.start()
@@ -440,24 +644,21 @@ if __name__ == "__main__":
     finally:
         # 6. Wait for threads to finish and cleanup
         logging.info("Waiting for threads to finish...")
-        if sampler and sampler.is_alive():
+        if sampler:
             sampler.join(timeout=5.0)
         if db_writer and db_writer.is_alive():
-            q_size = data_queue.qsize()
-            # Estimate wait time based on queue size and batch interval
+            backlog = sum(ring.available() for ring in BOARD_RINGS.values())
+            # Estimate wait time based on backlog (in sets) and batch interval
+            q_size = backlog / max(1, NUM_SENSORS)
             wait_time = max(10.0, DB_WRITE_INTERVAL_S * 2 + (q_size * DB_WRITE_INTERVAL_S * 0.5)) # Heuristic
-            logging.info(f"DB writer queue size approx {q_size} on exit signal. Waiting up to {wait_time:.1f}s")
+            logging.info(f"DB writer backlog approx {backlog} samples on exit signal. Waiting up to {wait_time:.1f}s")
             db_writer.join(timeout=wait_time)
 
-        if sampler and sampler.is_alive(): logging.warning("ADC Sampler thread did not exit gracefully.")
+        if sampler and sampler.join(timeout=0): logging.warning("ADC Sampler thread(s) did not exit gracefully.")
         if db_writer and db_writer.is_alive(): logging.warning("Database Writer thread did not exit gracefully.")
 
         logging.info("Closing database connection...")
-        if db_connection:
-            try:
-                db_connection.close()
-                logging.info("PostgreSQL connection closed.")
-            except Exception as e: logging.error(f"Error closing database connection: {e}")
+        db_session.close()
 
         logging.info("Cleaning up hardware resources...")
         try:
@@ -3,15 +3,24 @@
 
 import ADS1256      # Import the ADS1256 library
 import config       # Import the config library (for init/exit)
+import timebase     # Sample-index timestamps
+import rtprofile    # Opt-in real-time scheduling for the sampler
+import ringbuffer   # Shared-memory sample ring between sampler process and writer
+import calibration  # Per-channel calibration profiles
+import decimate     # Lower-rate streams for storage
+import bulkload     # Binary COPY of the measurement rows
+import trigger      # Splitting a batch into rows of at most bulkload.ROW_SPAN_NS
+import spool        # Disk spool for writes the database did not take
+import dbsession    # Reconnect and retry after a lost database connection
 import psycopg2     # <-- Added for Database
 import numpy as np  # <-- Added for RMS calculation
-import datetime     # <-- Added for Timestamps
 import time
+import os
 import sys
-import queue        # <-- Added for Queue
 import logging
 import signal
 import threading
+import multiprocessing
 
 # --- Configuration ---
 ADC_CHANNEL = 2   # Channel to read from
@@ -19,10 +28,14 @@ VREF = 5.065          # *** IMPORTANT: Set this to the ACTUAL measured Vref volt
 ADC_GAIN = ADS1256.ADS1256_GAIN_E['ADS1256_GAIN_1'] # Gain 1
 ADC_RATE_ENUM = ADS1256.ADS1256_DRATE_E['ADS1256_100SPS'] # 1000 SPS Rate
 ADC_SAMPLE_RATE_HZ = 100 # Corresponding sample rate in Hz (MUST match ADC_RATE_ENUM)
+BURST_SIZE = max(1, ADC_SAMPLE_RATE_HZ // 10) # Samples per RDATAC burst (~100 ms of data)
 # --- Calibration Values ---
+# The channel's profile (see calibration.py) is used if there is one; these
+# values are the fallback.
 MEASURED_GAIN = 759.1  # Use your average measured gain
 MEASURED_OFFSET_V = -1.348 # Use your average measured offset in Volts (already negative)
 DATASHEET_OFFSET_V = 1.5  # Datasheet specified 1.5V offset
+CALIBRATION_FROM_DB = False # True: profile from the adc_calibration table, False: calibration.json
 
 # --- Database Configuration ---
 DB_HOST = "localhost"
@@ -30,33 +43,72 @@ DB_NAME = "gridsense_db"
 DB_USER = "gridsense_user"
 DB_PASSWORD = "microgrid"
 DB_TABLE = "measurements_six" # Make sure this table exists in gridsense_db
+DB_STATEMENT_TIMEOUT_MS = 5000 # A write stalled longer than this (vacuum, locks) is cancelled and spooled
+DB_CONNECT_TIMEOUT_S = 3 # A connection attempt gives up after this, the writer spools meanwhile
+DB_RECONNECT_BACKOFF_S = 0.5 # Reconnect backoff, doubling up to DB_RECONNECT_BACKOFF_MAX_S (see dbsession.py)
+DB_RECONNECT_BACKOFF_MAX_S = 30.0
+
+# --- Write-Ahead Spool (see spool.py) ---
+# Batches the database did not take are kept on disk and replayed, oldest first, once it is back.
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool', 'readsensor')
+SPOOL_WRITE_AHEAD = False # True: every batch goes through the spool, False: only the failed ones
+SPOOL_FSYNC = 'interval'  # 'always', 'interval' or 'never'
+SPOOL_FSYNC_INTERVAL_S = 1.0
+SPOOL_SEGMENT_MB = 16
+SPOOL_MAX_MB = 1024       # Oldest segments are dropped above this
+SPOOL_REPLAY_MAX_RECORDS = 20 # Spooled batches replayed per write cycle
 
 SENSOR_ID_DB = 1 # Sensor ID to use in the database table (adjust if needed)
 SENSOR_NAME_DB = f"Voltage Sensor Ch{ADC_CHANNEL}"
 SENSOR_TYPE_DB = "Voltage"
 
-# --- Queue and Batching Configuration ---
-DB_WRITE_INTERVAL_S = 1.0 # How often DB writer wakes up to check queue (seconds)
+# --- Sample Ring and Batching Configuration ---
+DB_WRITE_INTERVAL_S = 1.0 # How often DB writer wakes up to check the ring (seconds)
 # Max samples to buffer before forcing a DB write (safety measure)
 MAX_QUEUE_SIZE = ADC_SAMPLE_RATE_HZ * 5 # 5 seconds worth of data
-
-# --- Clamping Limits for NUMERIC(5, 2) in DB ---
-NUMERIC_5_2_MAX = 999.99
-NUMERIC_5_2_MIN = -999.99
+RING_CAPACITY = ADC_SAMPLE_RATE_HZ * 10 # 10 seconds of samples, allocated once
+# Full ring: OVERWRITE drops the oldest samples (counted as lost by the writer),
+# BLOCK stalls the sampler thread up to RING_BLOCK_TIMEOUT_S per burst instead.
+# The sampler process always overwrites; it must never wait on the writer.
+RING_POLICY = ringbuffer.OVERWRITE
+RING_BLOCK_TIMEOUT_S = 0.5
+
+# --- Decimated Streams ---
+# Lower-rate copies of the stream, each stage decimating the one before it and
+# written to its own table in rows of DECIMATED_ROW_SECONDS of data (see
+# decimate.py). A stage at or above the sample rate (100 Hz at the 100 SPS
+# default) would only copy the raw stream and stores nothing.
+# Empty list: raw data only.
+DECIMATION_STAGES = [
+    {'rate_hz': 100, 'table': 'measurements_100hz'},
+    {'rate_hz': 10, 'table': 'measurements_10hz'},
+]
+DECIMATED_ROW_SECONDS = 10.0
+
+# --- Sampler Process ---
+# True: a separate process owns the ADC and publishes raw samples to a
+# shared-memory ring, so DB work in this process cannot hold the GIL while a
+# conversion is waiting. False: sampler thread + in-process ring.
+SAMPLER_PROCESS = True
+
+# --- Real-Time Profile (opt-in, needs root or CAP_SYS_NICE/CAP_IPC_LOCK) ---
+# SCHED_FIFO + CPU pinning for the sampler thread, mlockall and a frozen GC
+# for the process; see rtprofile.py. Best with isolcpus=3 on the kernel cmdline.
+RT_PROFILE = False
+RT_SAMPLER_CPU = 3
+RT_PRIORITY = rtprofile.DEFAULT_PRIORITY
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s')
 
 # --- Global Variables ---
-data_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE) # Queue for ADC data
+sample_ring = ringbuffer.SampleRing(RING_CAPACITY, RING_POLICY) # Sampler thread -> DB writer
 stop_event = threading.Event() # Event for stopping threads gracefully
 ADC = None # ADC object holder
-
-# --- Clamping Function ---
-def clamp_value(value, min_val=NUMERIC_5_2_MIN, max_val=NUMERIC_5_2_MAX):
-    """Clamps a value within the specified min/max range."""
-    return max(min_val, min(max_val, value))
+CALIBRATION = None # CalibrationProfile of ADC_CHANNEL, see load_calibration()
+MEASUREMENTS = bulkload.BulkLoader(DB_TABLE, bulkload.MEASUREMENT_COLUMNS, unique=bulkload.MEASUREMENT_KEY) # Binary COPY, INSERT fallback
+MEASUREMENT_IDS = bulkload.IdAllocator(DB_TABLE) # Row ids from the table's sequence
 
 # --- Database Functions ---
 def create_connection():
@@ -68,199 +120,288 @@ def create_connection():
             user=DB_USER,
             password=DB_PASSWORD,
             host=DB_HOST,
-            port="5432"
+            port="5432",
+            connect_timeout=DB_CONNECT_TIMEOUT_S,
+            tcp_user_timeout=DB_STATEMENT_TIMEOUT_MS, # Unacknowledged data on a dead network breaks the connection too
+            options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
         )
         logging.info(f"Connection to PostgreSQL DB '{DB_NAME}' successful")
     except psycopg2.OperationalError as e:
         logging.error(f"Database connection error: {e}", exc_info=True)
     return connection
 
-def get_max_id(connection):
-    """Gets the maximum ID from the specified database table."""
-    max_id = 0
-    try:
-        with connection.cursor() as cursor:
-            query = f"SELECT MAX(id) FROM {DB_TABLE};"
-            cursor.execute(query)
-            result = cursor.fetchone()
-            if result and result[0] is not None:
-                max_id = result[0]
-    except psycopg2.Error as e:
-        logging.error(f"Error getting max ID from {DB_TABLE}: {e}")
-    return max_id
-
-def calculate_rms(voltage_list):
-    """Calculates RMS value from a list of voltage floats."""
-    if not voltage_list:
-        return 0.0
-    numeric_array = np.array([v for v in voltage_list if isinstance(v, (int, float))], dtype=float)
-    if numeric_array.size == 0:
-        return 0.0
-    return np.sqrt(np.mean(np.square(numeric_array)))
-
-def insert_batch_data(connection, batch_id, sensor_id, batch_start_time, sensdata_batch, sname, stype):
-    """ Inserts a batch of sensor data into the database.
-        sensdata_batch should be a list of [clamped_voltage, clamped_delta_time_ms] pairs.
+def insert_batch_data(connection, sensor_id, times_ns, voltages, sname, stype, sample_counts=(None, None, None),
+                      first_seq=None):
+    """ Inserts a batch of sensor data (sample times and voltages as NumPy arrays)
+        into the database, with an id from the table's sequence.
+        sample_counts is the batch's (expected, received, dropped) sample accounting,
+        first_seq the sequence number of its first sample. A batch already in the
+        table (same sensor, start time and first_seq) is skipped. Returns True;
+        errors are logged, rolled back and raised.
     """
-    if not sensdata_batch:
+    if not len(voltages):
         logging.warning("Attempted to insert empty batch.")
-        return False
+        return True # Nothing to write
 
-    voltages_only = [item[0] for item in sensdata_batch] # Voltages are already clamped here
-    rms_value = calculate_rms(voltages_only)
+    batch_start_time = timebase.ns_to_datetime(int(times_ns[0]))
+    clamped = np.count_nonzero((voltages < bulkload.NUMERIC_5_2_MIN) | (voltages > bulkload.NUMERIC_5_2_MAX))
+    if clamped:
+        logging.debug(f"Clamped {clamped} voltage(s) of the batch at {batch_start_time} to NUMERIC(5, 2)")
+    sensdata = bulkload.sensdata_array(times_ns, voltages) # Clamped [voltage, delta_t] pairs
 
-    clamped_rms = clamp_value(rms_value)
-    if clamped_rms != rms_value:
-        logging.warning(f"Clamped RMS value from {rms_value:.4f} to {clamped_rms:.2f} for batch ID {batch_id}")
+    batch_id = None
+    try:
+        batch_id, = MEASUREMENT_IDS.take(connection, 1)
+        MEASUREMENTS.load(connection, [(
+            batch_id,
+            sensor_id,
+            sensdata,
+            batch_start_time,
+            bulkload.rms(sensdata[:, 0]),
+            sname,
+            stype,
+            0,  # Placeholder for THD
+            0,  # Placeholder for PF
+            *sample_counts,
+            first_seq
+        )])
+        logging.debug(f"Successfully inserted batch ID {batch_id} with {len(sensdata)} samples.")
+        return True
+
+    except (psycopg2.Error, TypeError, ValueError) as e:
+        logging.error(f"Error inserting batch ID {batch_id} at {batch_start_time}: {e}", exc_info=True)
+        try: connection.rollback()
+        except psycopg2.Error as rb_e: logging.error(f"Error rolling back transaction: {rb_e}")
+        raise
 
+def insert_decimated(connection, rows):
+    """ Inserts DecimatedStreams.take_rows() rows. Returns True; errors are logged, rolled back and raised. """
     try:
-        with connection.cursor() as cursor:
-            timestamp = batch_start_time.isoformat()
-            query = f"""
-            INSERT INTO {DB_TABLE}(id, sensor_id, sensdata, time, rmsvalue, sname, stype, thd, pf)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
-            """
-            cursor.execute(query, (
-                batch_id,
-                sensor_id,
-                sensdata_batch, # Already clamped [voltage, delta_t] pairs
-                timestamp,
-                float(clamped_rms),
-                sname,
-                stype,
-                0,  # Placeholder for THD
-                0   # Placeholder for PF
-            ))
-            connection.commit()
-            logging.debug(f"Successfully inserted batch ID {batch_id} with {len(sensdata_batch)} samples.")
-            return True
-
-    except (psycopg2.Error, TypeError) as e:
-        logging.error(f"Error inserting batch ID {batch_id}: {e}", exc_info=True)
+        decimate.insert_rows(connection, rows, {SENSOR_ID_DB: (SENSOR_NAME_DB, SENSOR_TYPE_DB)})
+        return True
+    except (psycopg2.Error, TypeError, ValueError) as e:
+        logging.error(f"Error inserting {len(rows)} decimated stream row(s): {e}", exc_info=True)
         try: connection.rollback()
         except psycopg2.Error as rb_e: logging.error(f"Error rolling back transaction: {rb_e}")
-        return False
+        raise
 
-# --- ADC Sampling Thread ---
-def adc_sampler_thread():
-    """Continuously samples the ADC and puts data onto the queue."""
-    logging.info(f"ADC Sampler thread started - Target Rate: {ADC_SAMPLE_RATE_HZ} SPS.")
-    sample_interval = 1.0 / ADC_SAMPLE_RATE_HZ
-    max_adc_count = 0x7FFFFF # 8388607.0 for clarity in calculation
-
-    # --- !!! CHANGE: Set channel ONCE before the loop !!! ---
-    if not ADC.ADS1256_SetChannal(ADC_CHANNEL):
-        logging.error(f"Failed to set ADC channel {ADC_CHANNEL} initially. Stopping thread.")
-        stop_event.set() # Signal other threads to stop too
-        return # Exit thread
+def write_record(connection, record):
+    """ Writes one spool record: ('raw', (times_ns, voltages, sample_counts, first_seq)) or
+        ('decimated', DecimatedStreams.take_rows() rows). Returns True; database
+        errors are raised for db_session.call() to sort out.
+    """
+    kind, data = record
+    if kind == 'decimated':
+        return insert_decimated(connection, data)
+    times_ns, voltages, sample_counts, first_seq = data
+    return insert_batch_data(connection, SENSOR_ID_DB, times_ns, voltages,
+                             SENSOR_NAME_DB, SENSOR_TYPE_DB, sample_counts, first_seq)
+
+def write_decimated(writer, streams, flush=False):
+    """ Writes the decimated stream rows that are complete (all pending samples if flush). """
+    rows = streams.take_rows(flush)
+    if rows:
+        writer.submit(('decimated', rows))
+
+# --- Calibration ---
+def load_calibration(db_connection=None):
+    """Returns the CalibrationProfile of ADC_CHANNEL, falling back to the values above."""
+    fallback = calibration.CalibrationProfile(ADC_CHANNEL, vref=VREF, datasheet_offset_v=DATASHEET_OFFSET_V,
+                                              measured_gain=MEASURED_GAIN, measured_offset_v=MEASURED_OFFSET_V)
+    return calibration.channel_profile(ADC_CHANNEL, fallback,
+                                       connection=db_connection if CALIBRATION_FROM_DB else None)
+
+def calibrate_codes(raw_values):
+    """Converts an array of raw codes to calibrated voltages (one fused multiply-add, see calibration.py)."""
+    return CALIBRATION.apply(raw_values)
+
+# --- ADC Setup ---
+def setup_adc():
+    """Initializes and configures the ADS1256. Returns the ADC object, or None on failure."""
+    adc = ADS1256.ADS1256()
+    if adc.ADS1256_init() != 0:
+        logging.critical("Failed to initialize ADS1256 hardware via ADS1256_init().")
+        return None
+    logging.info("ADS1256 hardware initialized successfully.")
+    logging.warning(f"Using VREF = {VREF}V for voltage calculation. Ensure this is correct!")
+
+    if not adc.ADS1256_ConfigADC(ADC_GAIN, ADC_RATE_ENUM):
+        logging.critical("Failed to configure ADC Gain/Rate.")
+        return None
+    gain_str = [k for k, v in ADS1256.ADS1256_GAIN_E.items() if v == ADC_GAIN][0]
+    rate_str = [k for k, v in ADS1256.ADS1256_DRATE_E.items() if v == ADC_RATE_ENUM][0]
+    logging.info(f"ADC Configured: Gain={gain_str}, Rate={rate_str} ({ADC_SAMPLE_RATE_HZ} SPS target)")
+    return adc
+
+# --- ADC Sampling Loop (shared by the sampler thread and the sampler process) ---
+def stream_samples(adc, stop, publish):
+    """ Streams the ADC in continuous-read (RDATAC) bursts until `stop` is set.
+        publish(sample_times_ns, sample_seqs, raw_values) receives each burst as
+        int64/int64/int32 arrays; sample_seqs skips the numbers of missed conversions.
+    """
+    # One clock read per burst; sample times come from index x (drift-corrected) period
+    clock = timebase.SampleClock(ADC_SAMPLE_RATE_HZ)
+
+    # --- Set channel ONCE before streaming (MUX cannot be written in RDATAC mode) ---
+    if not adc.ADS1256_SetChannal(ADC_CHANNEL):
+        logging.error(f"Failed to set ADC channel {ADC_CHANNEL} initially. Stopping sampler.")
+        stop.set() # Signal other threads to stop too
+        return
     logging.info(f"ADC Channel set to {ADC_CHANNEL}")
+    if CALIBRATION.load_into(adc, ADC_GAIN, ADC_RATE_ENUM):
+        logging.info(f"Loaded the ADC calibration registers (OFC/FSC) of channel {ADC_CHANNEL}")
     # Optional small delay after setting channel before starting reads
     time.sleep(0.01)
     # --------------------------------------------------------
 
-    while not stop_event.is_set():
-        read_start_time = time.monotonic()
-        measurement_time = datetime.datetime.now(datetime.timezone.utc) # Timestamp for the reading
-
-        # --- !!! CHANGE: Call Read_ADC_Data directly !!! ---
-        # This function waits for DRDY and reads the latest completed conversion
-        raw_value = ADC.ADS1256_Read_ADC_Data()
-        # ---------------------------------------------------
-
-        if raw_value is not None:
-           # Convert raw ADC value to voltage
-            max_adc_count = 0x7FFFFF # 8388607.0
-            # --- Calibrated Voltage Calculation (with datasheet and measured offsets/gain) ---
-            voltage_raw = (raw_value / max_adc_count) * VREF  # Raw voltage from ADC
-            voltage_biased = voltage_raw - DATASHEET_OFFSET_V # Subtract 1.5V datasheet offset
-            voltage_scaled = voltage_biased / MEASURED_GAIN    # Apply gain correction
-            voltage_calibrated = voltage_scaled - MEASURED_OFFSET_V # Apply measured offset correction
-            voltage = voltage_calibrated # Use calibrated voltage
-
-            logging.info(f"Channel {ADC_CHANNEL}: Raw = {raw_value:8d}, Voltage = {voltage: 9.5f} V (Calibrated)") # Indicate "Calibrated" in log
-
-            try:
-                # Put (timestamp, voltage) tuple onto the queue
-                data_queue.put((measurement_time, voltage), block=True, timeout=0.5)
-            except queue.Full:
-                logging.warning("Data queue is full. Sample might be dropped.")
-            except Exception as e:
-                 logging.error(f"Error putting data onto queue: {e}")
-
-        else:
-            # Read_ADC_Data returned None, likely WaitDRDY timeout
-            logging.warning(f"Failed to read ADC channel {ADC_CHANNEL} (WaitDRDY Timeout?)")
+    while not stop.is_set():
+        # The DRDY line paces the stream, so no sleep is needed between bursts
+        for raw_values in adc.stream(BURST_SIZE, stop):
+            # Samples arrived one conversion period apart, ending now
+            sample_times_ns = clock.burst_times_ns(len(raw_values))
+            publish(sample_times_ns, clock.burst_seqs(), raw_values)
+
+            drdy = adc.ADS1256_DRDYWaitStats() # DRDY wait time per sample in this burst
+            logging.debug(f"Channel {ADC_CHANNEL}: Burst of {len(raw_values)} samples, last code = {raw_values[-1]}, "
+                          f"DRDY wait mean {drdy['mean_s'] * 1e3:.3f} ms / max {drdy['max_s'] * 1e3:.3f} ms, "
+                          f"clock drift {clock.drift_ppm:+.1f} ppm")
+
+        if not stop.is_set():
+            # Stream ended early, likely a WaitDRDY timeout; re-enter RDATAC after a pause
+            logging.warning(f"ADC stream on channel {ADC_CHANNEL} interrupted (WaitDRDY Timeout?)")
             time.sleep(0.1) # Small delay on read failure
+            clock.reset() # Conversions were missed, re-anchor the timestamps (and skip their sequence numbers)
 
-        # --- Calculate sleep time for target rate ---
-        read_end_time = time.monotonic()
-        elapsed_time = read_end_time - read_start_time
-        sleep_time = max(0, sample_interval - elapsed_time)
-
-        stop_event.wait(sleep_time) # Interruptible sleep
+# --- ADC Sampling Thread ---
+def ring_samples(sample_times_ns, sample_seqs, raw_values):
+    """Appends a burst of raw samples to the in-process ring."""
+    written = sample_ring.write(sample_times_ns, ADC_CHANNEL, sample_seqs, raw_values, timeout=RING_BLOCK_TIMEOUT_S)
+    if written < len(raw_values):
+        logging.warning(f"Sample ring full for {RING_BLOCK_TIMEOUT_S}s, dropped {len(raw_values) - written} samples.")
 
+def adc_sampler_thread():
+    """Streams the ADC from a thread of this process into the sample ring."""
+    logging.info(f"ADC Sampler thread started - Target Rate: {ADC_SAMPLE_RATE_HZ} SPS, Burst: {BURST_SIZE} samples.")
+    if RT_PROFILE:
+        rtprofile.apply(priority=RT_PRIORITY, cpu=RT_SAMPLER_CPU)
+    try:
+        stream_samples(ADC, stop_event, ring_samples)
+    finally:
+        sample_ring.mark_closed() # Lets the writer drain and finish
     logging.info("ADC Sampler thread finished.")
+
+# --- ADC Sampling Process ---
+def adc_sampler_process(ring_name, sampler_stop, profile):
+    """ Entry point of the sampler process: owns the ADC hardware and writes raw
+        samples to the shared ring until sampler_stop is set.
+        profile is the parent's CalibrationProfile (its ADC registers are loaded here).
+    """
+    global CALIBRATION
+    CALIBRATION = profile
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # The parent decides when to stop
+    logging.info(f"ADC Sampler process started - Target Rate: {ADC_SAMPLE_RATE_HZ} SPS, Burst: {BURST_SIZE} samples.")
+    ring = ringbuffer.SharedSampleRing.attach(ring_name)
+    try:
+        adc = setup_adc()
+        if adc is None:
+            return # Exiting tells the parent that acquisition has stopped
+        if RT_PROFILE:
+            rtprofile.apply(priority=RT_PRIORITY, cpu=RT_SAMPLER_CPU)
+
+        def publish(sample_times_ns, sample_seqs, raw_values):
+            ring.write(sample_times_ns, ADC_CHANNEL, sample_seqs, raw_values)
+            # The sampler is this process's only thread, so its GC runs right after a
+            # burst is handed off, a whole conversion period before the next DRDY
+            rtprofile.collect_garbage()
+
+        stream_samples(adc, sampler_stop, publish)
+    finally:
+        ring.mark_closed()
+        ring.close()
+        config.module_exit()
+        logging.info("ADC Sampler process finished.")
     
     
 # --- Database Writer Thread (Copied from previous script) ---
-def database_writer_thread(db_connection):
-    """ Periodically collects data from the queue and writes batches to the database. """
+def database_writer_thread(db_session, ring_reader):
+    """ Periodically drains the sample ring (the in-process SampleRing, or a
+        reader of the sampler process's shared ring) and writes batches to the database.
+    """
     logging.info("Database Writer thread started.")
     last_write_time = time.monotonic()
-    current_raw_batch = [] # Store raw (timestamp, voltage) tuples first
-    current_db_id = get_max_id(db_connection) # Get initial max ID
-
-    while not stop_event.is_set() or not data_queue.empty(): # Process remaining queue items after stop signal
-        try:
-            timestamp, voltage = data_queue.get(block=True, timeout=0.1)
-            current_raw_batch.append((timestamp, voltage))
-            data_queue.task_done()
-        except queue.Empty:
-            if stop_event.is_set():
-                logging.debug("Queue empty and stop event set, proceeding to final write check.")
-            pass
+    current_raw_batch = [] # (times_ns, seqs, voltages) array chunks since the last write
+    batch_len = 0 # Samples in current_raw_batch
+    lost_reported = 0
+    accounting = ringbuffer.SeqAccounting() # Expected/received/dropped from sample sequence numbers
+    decimated = decimate.DecimatedStreams(DECIMATION_STAGES, DECIMATED_ROW_SECONDS)
+    decimated.add_sensor(SENSOR_ID_DB, ADC_SAMPLE_RATE_HZ)
+    writer = spool.SpooledWriter(
+        spool.Spool(SPOOL_DIR, segment_bytes=SPOOL_SEGMENT_MB * 2**20, max_bytes=SPOOL_MAX_MB * 2**20,
+                    fsync=SPOOL_FSYNC, fsync_interval_s=SPOOL_FSYNC_INTERVAL_S),
+        lambda record: db_session.call(write_record, record), SPOOL_WRITE_AHEAD, SPOOL_REPLAY_MAX_RECORDS)
+
+    def pending():
+        # Keep draining until the sampler has written its last burst (or the
+        # main thread closed the ring for a sampler that died without doing so)
+        return ring_reader.available() > 0 or not ring_reader.ring.closed
+
+    while not stop_event.is_set() or pending(): # Process remaining ring samples after stop signal
+        # Bulk slice of the ring (zero-copy view), calibrated straight into the batch
+        records = ring_reader.read()
+        if records.size:
+            voltages = calibrate_codes(records['code'])
+            chunk = (records['time_ns'].copy(), records['seq'].copy(), voltages)
+            if ring_reader.intact():
+                current_raw_batch.append(chunk)
+                batch_len += len(voltages)
+            else: # The sampler lapped the view while it was copied: the copy may be torn
+                ring_reader.lost += len(voltages) # Reported below; the sequence gap counts them as dropped
+            ring_reader.release() # Done with the view
+        else:
+            time.sleep(0.05)
+        if ring_reader.lost != lost_reported:
+            logging.warning(f"DB writer fell behind the sampler: {ring_reader.lost - lost_reported} samples overwritten in the ring.")
+            lost_reported = ring_reader.lost
 
         current_time = time.monotonic()
-        force_write = len(current_raw_batch) >= (MAX_QUEUE_SIZE * 0.9)
+        force_write = batch_len >= (MAX_QUEUE_SIZE * 0.9)
         time_to_write = (current_time - last_write_time) >= DB_WRITE_INTERVAL_S
 
         if (time_to_write or force_write or (stop_event.is_set() and current_raw_batch)) and current_raw_batch:
              if force_write:
-                 logging.warning(f"Forcing DB write due to large batch size ({len(current_raw_batch)} samples).")
-
-             batch_start_time = current_raw_batch[0][0]
-
-             sensdata_for_db = []
-             for item_timestamp, item_voltage in current_raw_batch:
-                 clamped_voltage = clamp_value(item_voltage)
-                 if clamped_voltage != item_voltage:
-                     logging.debug(f"Clamped voltage from {item_voltage:.4f} to {clamped_voltage:.2f}")
-
-                 delta_t_ms = (item_timestamp - batch_start_time).total_seconds() * 1000.0
-                 clamped_delta_t_ms = clamp_value(delta_t_ms)
-                 if clamped_delta_t_ms != delta_t_ms:
-                     logging.debug(f"Clamped delta_t from {delta_t_ms:.4f} to {clamped_delta_t_ms:.2f}")
-
-                 sensdata_for_db.append([round(clamped_voltage, 2), round(clamped_delta_t_ms, 2)])
-
-             current_db_id += 1
-             success = insert_batch_data(
-                 db_connection, current_db_id, SENSOR_ID_DB, batch_start_time,
-                 sensdata_for_db, SENSOR_NAME_DB, SENSOR_TYPE_DB
-             )
-             if success:
-                 pass
-                 #logging.info(f"DB Write: ID {current_db_id}, Samples: {len(sensdata_for_db)}, StartTime: {batch_start_time.time()}")
-             else:
-                 logging.error(f"DB Write failed for batch starting at {batch_start_time}")
-                 current_db_id -= 1
+                 logging.warning(f"Forcing DB write due to large batch size ({batch_len} samples).")
+
+             times_ns, seqs, voltages = (np.concatenate(arrays) for arrays in zip(*current_raw_batch))
+             batch_start_time = timebase.ns_to_datetime(int(times_ns[0]))
+
+             # A write cycle held up by the database leaves more than a row's span of samples
+             rows = [(times_ns[part], voltages[part], accounting.count(SENSOR_ID_DB, seqs[part]), int(seqs[part][0]))
+                     for part in trigger.split_by_span(times_ns, bulkload.ROW_SPAN_NS)]
+             expected, received, dropped = (sum(counts) for counts in zip(*(row[2] for row in rows)))
+             if dropped:
+                 logging.warning(f"Sample gap: batch starting at {batch_start_time} is missing {dropped} of {expected} samples "
+                                 f"({accounting.dropped[SENSOR_ID_DB]} of {accounting.expected[SENSOR_ID_DB]} dropped since start).")
+
+             if DECIMATION_STAGES:
+                 decimated.process(SENSOR_ID_DB, voltages, times_ns)
+
+             for row in rows:
+                 writer.submit(('raw', row)) # Spooled if the database does not take it
+             write_decimated(writer, decimated)
 
              current_raw_batch = []
+             batch_len = 0
              last_write_time = current_time
+             rtprofile.collect_garbage() # GC runs here, not in the sampler, when the RT profile is on
 
         if not current_raw_batch and not stop_event.is_set():
             time.sleep(0.05) # Short sleep when idle
 
+    write_decimated(writer, decimated, flush=True) # Partial rows of the decimated streams
+    writer.drain()
+    if writer.spool.pending:
+        logging.warning(f"{writer.spool.backlog_bytes()} bytes left in the spool, replayed at the next start.")
+    writer.spool.close()
     logging.info("Database Writer thread finished.")
 
 # --- Signal Handler (Keep as is) ---
@@ -271,49 +412,47 @@ def signal_handler(sig, frame):
 # --- Main Execution (Adapted for Threads and DB) ---
 if __name__ == "__main__":
     logging.info(f"Starting ADS1256 Data Logger for Channel {ADC_CHANNEL}...")
-    db_connection = None
+    db_session = dbsession.DatabaseSession(create_connection, DB_RECONNECT_BACKOFF_S, DB_RECONNECT_BACKOFF_MAX_S)
     sampler = None
     db_writer = None
+    ring = None         # Shared sample ring (sampler process mode)
+    ring_reader = None
+    sampler_stop = None # Stop event of the sampler process
 
     # Register signal handlers for graceful exit
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
     try:
-        # 1. Initialize ADC Hardware
-        ADC = ADS1256.ADS1256()
-        if ADC.ADS1256_init() != 0:
-            logging.critical("Failed to initialize ADS1256 hardware via ADS1256_init(). Exiting.")
-            try:
-                 if 'config' in sys.modules and hasattr(config, 'module_exit'):
-                     config.module_exit()
-            except Exception as clean_e: logging.error(f"Error during cleanup on init fail: {clean_e}")
-            sys.exit(1)
-        logging.info("ADS1256 hardware initialized successfully.")
-        logging.warning(f"Using VREF = {VREF}V for voltage calculation. Ensure this is correct!")
-
-        # 2. Configure ADC Gain and Rate
-        if not ADC.ADS1256_ConfigADC(ADC_GAIN, ADC_RATE_ENUM):
-             logging.critical("Failed to configure ADC Gain/Rate. Exiting.")
-             raise RuntimeError("ADC Configuration Failed")
-        gain_str = [k for k, v in ADS1256.ADS1256_GAIN_E.items() if v == ADC_GAIN][0]
-        rate_str = [k for k, v in ADS1256.ADS1256_DRATE_E.items() if v == ADC_RATE_ENUM][0]
-        logging.info(f"ADC Configured: Gain={gain_str}, Rate={rate_str} ({ADC_SAMPLE_RATE_HZ} SPS target)")
-
-        # 3. Connect to Database
-        db_connection = create_connection()
-        if not db_connection:
-            logging.critical("Failed to connect to database. Exiting.")
-            raise RuntimeError("Database Connection Failed")
-
-        # 4. Create and start threads (Instead of simple read loop)
-        sampler = threading.Thread(target=adc_sampler_thread, name="ADCSampler")
-        db_writer = threading.Thread(target=database_writer_thread, args=(db_connection,), name="DBWriter")
+        # 1. Connect to Database, which may hold the channel's calibration profile
+        db_connection = db_session.get()
+        if not db_connection: # The writer keeps trying, spooling the data meanwhile
+            logging.warning("Database not reachable at start, spooling until it is.")
+        CALIBRATION = load_calibration(db_connection)
+
+        if SAMPLER_PROCESS:
+            # 2-3. The sampler process initializes and owns the ADC hardware;
+            # its samples come back through the shared-memory ring.
+            ring = ringbuffer.SharedSampleRing.create(RING_CAPACITY)
+            ring_reader = ring.reader()
+            ctx = multiprocessing.get_context('spawn') # Fresh interpreter: no inherited threads or GPIO handles
+            sampler_stop = ctx.Event()
+            sampler = ctx.Process(target=adc_sampler_process, args=(ring.name, sampler_stop, CALIBRATION), name="ADCSampler")
+        else:
+            # 2-3. Initialize and configure ADC Hardware
+            ADC = setup_adc()
+            if ADC is None:
+                raise RuntimeError("ADC Initialization Failed")
+            ring_reader = sample_ring
+            sampler = threading.Thread(target=adc_sampler_thread, name="ADCSampler")
+
+        # 4. Create and start workers (Instead of simple read loop)
+        db_writer = threading.Thread(target=database_writer_thread, args=(db_session, ring_reader), name="DBWriter")
 
         sampler.daemon = False # Ensure graceful shutdown
         db_writer.daemon = False
 
-        logging.info("Starting worker threads...")
+        logging.info("Starting workers...")
         sampler.start()
         db_writer.start()
 
@@ -336,23 +475,31 @@ if __name__ == "__main__":
         stop_event.set() # Ensure threads are signaled to stop
 
     finally:
-        # 6. Wait for threads to finish and cleanup
-        logging.info("Waiting for threads to finish...")
+        # 6. Wait for workers to finish and cleanup
+        logging.info("Waiting for workers to finish...")
+        if sampler_stop is not None:
+            sampler_stop.set()
         if sampler and sampler.is_alive():
             sampler.join(timeout=5.0)
+        if ring_reader is not None:
+            # A sampler killed (SIGKILL, OOM, crash) or hung before its cleanup never
+            # marks the ring closed, and the writer would wait for it forever
+            ring_reader.ring.mark_closed()
         if db_writer and db_writer.is_alive():
-            logging.info(f"DB writer queue size approx {data_queue.qsize()} on exit signal.")
+            logging.info(f"DB writer backlog approx {ring_reader.available()} samples on exit signal.")
             db_writer.join(timeout=max(10.0, DB_WRITE_INTERVAL_S * 2))
 
-        if sampler and sampler.is_alive(): logging.warning("ADC Sampler thread did not exit gracefully.")
+        if sampler and sampler.is_alive(): logging.warning("ADC Sampler did not exit gracefully.")
         if db_writer and db_writer.is_alive(): logging.warning("Database Writer thread did not exit gracefully.")
 
-        logging.info("Closing database connection...")
-        if db_connection:
+        if ring is not None:
+            ring_reader = None
             try:
-                db_connection.close()
-                logging.info("PostgreSQL connection closed.")
-            except Exception as e: logging.error(f"Error closing database connection: {e}")
+                ring.close()
+            except BufferError as e: logging.error(f"Shared sample ring still in use, not released: {e}")
+
+        logging.info("Closing database connection...")
+        db_session.close()
 
         logging.info("Cleaning up hardware resources...")
         try:
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+from multiprocessing import shared_memory
+import threading
+import numpy as np
+
+# ==============================================================================
+# Ring buffers of ADC samples on preallocated NumPy record arrays.
+#
+# SampleRing: in-process, single producer / single consumer, with an explicit
+# policy for a full ring (overwrite the oldest samples or block the producer).
+#
+# SharedSampleRing: in a multiprocessing.shared_memory block, written by the
+# sampler process and read by any number of consumer processes (DB writer,
+# DSP, API).
+#
+# SharedSampleRing layout: a small int64 header followed by `capacity` fixed-size records.
+# The writer fills records first and only then advances write_pos, so a reader
+# never sees a position whose record is still being written. There is no
+# backpressure: the writer always overwrites the oldest records, and a reader
+# that falls more than `capacity` records behind skips ahead and counts the
+# lost samples instead of stalling acquisition.
+# ==============================================================================
+
+RECORD_DTYPE = np.dtype([('time_ns', '<i8'),  # Wall-clock sample time, ns since the epoch
+                         ('seq', '<i8'),      # Per-channel sample sequence number (gaps = lost samples)
+                         ('channel', '<i4'),  # ADC channel (MUX input / differential pair)
+                         ('code', '<i4')])    # Signed 24-bit conversion result
+
+_MAGIC = 0x41445352494E4732 # "ADSRING2" (record layout version)
+_HDR_MAGIC, _HDR_CAPACITY, _HDR_WRITE_POS, _HDR_CLOSED = range(4)
+_HEADER_WORDS = 8
+
+OVERWRITE = 'overwrite' # Full ring: drop the oldest samples, never stall the producer
+BLOCK = 'block'         # Full ring: producer waits for the consumer to free space
+
+def _store(records, capacity, pos, time_ns, channel, seq, codes):
+    """ Copies n samples into records starting at stream position pos, wrapping
+        at capacity. n must not exceed capacity.
+    """
+    n = len(codes)
+    start = pos % capacity
+    first = min(n, capacity - start) # Records before the wrap point
+    for field, values in (('time_ns', time_ns), ('channel', channel), ('seq', seq), ('code', codes)):
+        column = records[field]
+        if np.ndim(values):
+            column[start:start + first] = values[:first]
+            column[:n - first] = values[first:]
+        else:
+            column[start:start + first] = values
+            column[:n - first] = values
+
+def _part(values, part):
+    """ Slice of a per-sample array; scalars (one value for every sample) pass through. """
+    return values[part] if np.ndim(values) else values
+
+def _newest(capacity, time_ns, channel, seq, codes):
+    """ Trims a write that is larger than the ring to its newest `capacity` samples. """
+    part = slice(-capacity, None)
+    return _part(time_ns, part), _part(channel, part), _part(seq, part), codes[part]
+
+class SampleRing:
+    """ In-process single-producer/single-consumer ring of samples.
+        The producer thread calls write(), the consumer thread read(); positions
+        are plain ints updated under the GIL, so neither side takes a lock per
+        sample. The view returned by read() stays valid until the next read()
+        (or release()) under the BLOCK policy; under OVERWRITE the producer may
+        lap it, which intact() reports.
+    """
+    def __init__(self, capacity, policy=OVERWRITE):
+        if policy not in (OVERWRITE, BLOCK):
+            raise ValueError(f"Unknown ring policy '{policy}' (expected '{OVERWRITE}' or '{BLOCK}')")
+        self.capacity = capacity
+        self.policy = policy
+        self.records = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self.ring = self # Reader interface, same as RingReader.ring
+        self.write_pos = 0    # Total records written
+        self.pos = 0          # Next record to read
+        self._view_pos = 0    # Start of the view handed out by the last read()
+        self.lost = 0         # Samples overwritten before they were read (OVERWRITE)
+        self.closed = False   # Set by the producer when no more samples will come
+        self._space = threading.Event() # Signalled by the consumer when it frees space
+
+    # --- Producer side ---
+    def write(self, time_ns, channel, seq, codes, timeout=None):
+        """ Appends samples. time_ns, channel and seq are arrays with one entry per
+            code, or scalars shared by all of them. Under BLOCK, waits up to timeout seconds (None:
+            forever) for space and returns the number of samples written, which is
+            short if the wait timed out. Under OVERWRITE, always writes them all.
+        """
+        n = len(codes)
+        if n == 0:
+            return 0
+        if self.policy == OVERWRITE:
+            if n > self.capacity:
+                time_ns, channel, seq, codes = _newest(self.capacity, time_ns, channel, seq, codes)
+                self.write_pos += n - self.capacity
+                n = self.capacity
+            _store(self.records, self.capacity, self.write_pos, time_ns, channel, seq, codes)
+            self.write_pos += n
+            return n
+
+        written = 0
+        while written < n:
+            free = self.capacity - (self.write_pos - self._view_pos)
+            if free <= 0:
+                self._space.clear()
+                # Re-check after clearing: the consumer may have freed space in between
+                if self.capacity - (self.write_pos - self._view_pos) <= 0 and not self._space.wait(timeout):
+                    break
+                continue
+            chunk = min(free, n - written)
+            part = slice(written, written + chunk)
+            _store(self.records, self.capacity, self.write_pos,
+                   _part(time_ns, part), _part(channel, part), _part(seq, part), codes[part])
+            self.write_pos += chunk
+            written += chunk
+        return written
+
+    def mark_closed(self):
+        self.closed = True
+
+    # --- Consumer side ---
+    def available(self):
+        return self.write_pos - self.pos
+
+    def read(self, max_records=None):
+        """ Returns up to max_records unread records as a zero-copy structured
+            array view (shorter than available() at the wrap point; call again).
+            Calling read() releases the previous view.
+        """
+        write_pos = self.write_pos
+        if write_pos - self.pos > self.capacity:
+            self.lost += write_pos - self.capacity - self.pos
+            self.pos = write_pos - self.capacity
+        n = write_pos - self.pos
+        if max_records is not None:
+            n = min(n, max_records)
+        start = self.pos % self.capacity
+        n = min(n, self.capacity - start)
+        self._view_pos = self.pos
+        self.pos += n
+        self._space.set()
+        return self.records[start:start + n]
+
+    def release(self):
+        """ Hands the space of the last read() view back to a BLOCKed producer. """
+        self._view_pos = self.pos
+        self._space.set()
+
+    def intact(self):
+        """ True if the records returned by the last read() have not been overwritten yet. """
+        return self.write_pos - self._view_pos <= self.capacity
+
+class SharedSampleRing:
+    """ Fixed-capacity sample ring in a multiprocessing.shared_memory block.
+        Create it in one process with create(), open it elsewhere by name with attach().
+        Only one process may write.
+    """
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner # True if this handle created (and must unlink) the block
+        self.header = np.ndarray((_HEADER_WORDS,), dtype='<i8', buffer=shm.buf)
+        if self.header[_HDR_MAGIC] != _MAGIC:
+            raise ValueError(f"Shared memory block '{shm.name}' is not a sample ring")
+        self.capacity = int(self.header[_HDR_CAPACITY])
+        self.records = np.ndarray((self.capacity,), dtype=RECORD_DTYPE, buffer=shm.buf,
+                                  offset=_HEADER_WORDS * 8)
+
+    @classmethod
+    def create(cls, capacity, name=None):
+        size = _HEADER_WORDS * 8 + capacity * RECORD_DTYPE.itemsize
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_WORDS,), dtype='<i8', buffer=shm.buf)
+        header[:] = 0
+        header[_HDR_CAPACITY] = capacity
+        header[_HDR_MAGIC] = _MAGIC
+        del header # Release the buffer export before handing the block over
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_pos(self):
+        """ Total number of records ever written. """
+        return int(self.header[_HDR_WRITE_POS])
+
+    @property
+    def closed(self):
+        """ True once the writer has finished (no more records will arrive). """
+        return bool(self.header[_HDR_CLOSED])
+
+    def write(self, time_ns, channel, seq, codes):
+        """ Appends samples. time_ns, channel and seq are arrays with one entry per
+            code, or scalars shared by all of them.
+        """
+        n = len(codes)
+        if n == 0:
+            return
+        if n > self.capacity: # Only the newest `capacity` samples can be kept
+            time_ns, channel, seq, codes = _newest(self.capacity, time_ns, channel, seq, codes)
+            self.header[_HDR_WRITE_POS] += n - self.capacity
+            n = self.capacity
+        pos = self.write_pos
+        _store(self.records, self.capacity, pos, time_ns, channel, seq, codes)
+        self.header[_HDR_WRITE_POS] = pos + n # Publish only after the data is in place
+
+    def mark_closed(self):
+        self.header[_HDR_CLOSED] = 1
+
+    def reader(self, from_oldest=False):
+        """ Returns a RingReader starting at the newest (or oldest retained) record. """
+        pos = self.write_pos
+        if from_oldest:
+            pos = max(0, pos - self.capacity)
+        return RingReader(self, pos)
+
+    def close(self):
+        """ Releases this process's mapping; the creator also unlinks the block. """
+        self.header = self.records = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class RingReader:
+    """ One consumer's position in a SharedSampleRing. """
+    def __init__(self, ring, pos):
+        self.ring = ring
+        self.pos = pos
+        self.lost = 0 # Samples overwritten before this reader got to them
+        self._view_pos = pos
+
+    def available(self):
+        return self.ring.write_pos - self.pos
+
+    def read(self, max_records=None):
+        """ Returns up to max_records unread records as a zero-copy structured
+            array view (shorter than available() at the wrap point; call again).
+            The view stays valid until the writer laps it, i.e. for roughly
+            `capacity` more samples: use intact() or copy it if it is kept longer.
+        """
+        ring = self.ring
+        write_pos = ring.write_pos
+        if write_pos - self.pos > ring.capacity:
+            self.lost += write_pos - ring.capacity - self.pos
+            self.pos = write_pos - ring.capacity
+        n = write_pos - self.pos
+        if max_records is not None:
+            n = min(n, max_records)
+        start = self.pos % ring.capacity
+        n = min(n, ring.capacity - start)
+        self._view_pos = self.pos
+        self.pos += n
+        return ring.records[start:start + n]
+
+    def release(self):
+        """ No-op, for parity with SampleRing: the shared ring never waits for readers. """
+
+    def intact(self):
+        """ True if the records returned by the last read() have not been overwritten yet. """
+        return self.ring.write_pos - self._view_pos <= self.ring.capacity
+
+class SeqAccounting:
+    """ Per-key sample accounting from sequence numbers, for the DB writer.
+        count() takes the sequence numbers of one batch (in order) and returns
+        (expected, received, dropped): expected spans from the sample after the
+        key's previous batch to the last one in this batch, so samples lost
+        between batches are charged to the batch that follows the gap.
+    """
+    def __init__(self):
+        self.last_seq = {}  # key -> last sequence number seen
+        self.expected = {}  # key -> running totals since start
+        self.received = {}
+        self.dropped = {}
+
+    def count(self, key, seqs):
+        if len(seqs) == 0:
+            return 0, 0, 0
+        first, last = int(seqs[0]), int(seqs[-1])
+        prev = self.last_seq.get(key)
+        expected = last - (first - 1 if prev is None else prev)
+        received = len(seqs)
+        dropped = max(0, expected - received)
+        self.last_seq[key] = last
+        for totals, value in ((self.expected, expected), (self.received, received), (self.dropped, dropped)):
+            totals[key] = totals.get(key, 0) + value
+        return expected, received, dropped
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import ctypes
+import ctypes.util
+import gc
+import logging
+import os
+import threading
+
+# ==============================================================================
+# Opt-in real-time profile for the ADC sampler. Each setting is applied on a
+# best-effort basis and reported, since most of them need root (or
+# CAP_SYS_NICE / CAP_IPC_LOCK) and a kernel booted with isolcpus= to matter.
+#   - SCHED_FIFO priority and CPU affinity apply to the calling thread only,
+#     so call apply() from inside the sampler thread.
+#   - mlockall() and the GC freeze are process-wide and only done once.
+# ==============================================================================
+
+# SCHED_FIFO priority (1-99). Kept below the kernel's threaded IRQ and SPI
+# handlers (50): DRDY edges and transfers are serviced by them.
+DEFAULT_PRIORITY = 40
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+# collect_garbage() calls between full collections. The young generations do
+# not reach long-lived reference cycles (exceptions holding tracebacks, for one),
+# which would otherwise pile up in a process that runs for months.
+FULL_COLLECTION_EVERY = 100
+
+_process_settings_done = False
+_garbage_calls = 0
+_process_settings_lock = threading.Lock()
+
+def _isolated_cpus():
+    """ CPUs the kernel keeps the general scheduler off (isolcpus=), as a set. """
+    try:
+        with open('/sys/devices/system/cpu/isolated') as f:
+            text = f.read().strip()
+    except OSError:
+        return set()
+    cpus = set()
+    for part in filter(None, text.split(',')):
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+def set_fifo_priority(priority=DEFAULT_PRIORITY):
+    """ Switches the calling thread to SCHED_FIFO. Returns (ok, detail). """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        return True, f"SCHED_FIFO priority {priority}"
+    except (AttributeError, OSError) as e:
+        return False, f"SCHED_FIFO priority {priority} not applied: {e}"
+
+def pin_to_cpu(cpu):
+    """ Restricts the calling thread to one CPU. Returns (ok, detail). """
+    try:
+        os.sched_setaffinity(0, {cpu})
+    except (AttributeError, OSError) as e:
+        return False, f"CPU {cpu} affinity not applied: {e}"
+    if cpu in _isolated_cpus():
+        return True, f"pinned to isolated CPU {cpu}"
+    return True, f"pinned to CPU {cpu} (not isolated, other tasks may still run there)"
+
+def lock_memory():
+    """ mlockall(MCL_CURRENT | MCL_FUTURE) so page faults cannot stall the sampler. Returns (ok, detail). """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+            errno = ctypes.get_errno()
+            return False, f"mlockall not applied: {os.strerror(errno)}"
+        return True, "memory locked (mlockall)"
+    except (OSError, AttributeError) as e:
+        return False, f"mlockall not applied: {e}"
+
+def freeze_gc():
+    """ Moves every object allocated so far out of the collector's reach and
+        disables automatic collection, so no GC pass can start inside the
+        sampler loop. Every process that applies the profile must then call
+        collect_garbage() regularly, from a non-critical thread or point.
+        Returns (ok, detail).
+    """
+    gc.collect()
+    gc.freeze()
+    gc.disable()
+    return True, f"GC frozen ({gc.get_freeze_count()} objects) and automatic collection disabled"
+
+def collect_garbage():
+    """ Young-generation collection, and a full one every FULL_COLLECTION_EVERY
+        calls, for a non-critical point (the DB writer between batches) to run
+        while the real-time profile has automatic GC disabled.
+    """
+    global _garbage_calls
+    if gc.isenabled():
+        return
+    _garbage_calls += 1
+    if _garbage_calls % FULL_COLLECTION_EVERY == 0:
+        gc.collect()
+    else:
+        gc.collect(1)
+
+def apply(priority=DEFAULT_PRIORITY, cpu=None, memory_lock=True, gc_freeze=True):
+    """ Applies the real-time profile to the calling thread (and, the first
+        time, to the process) and logs whether each setting took effect.
+        Returns {setting: (ok, detail)}.
+    """
+    global _process_settings_done
+    results = {}
+    if priority is not None:
+        results['priority'] = set_fifo_priority(priority)
+    if cpu is not None:
+        results['affinity'] = pin_to_cpu(cpu)
+    with _process_settings_lock:
+        if not _process_settings_done:
+            if memory_lock:
+                results['mlockall'] = lock_memory()
+            if gc_freeze:
+                results['gc'] = freeze_gc()
+            _process_settings_done = True
+
+    for setting, (ok, detail) in results.items():
+        if ok:
+            logging.info(f"RT profile: {detail}")
+        else:
+            logging.warning(f"RT profile: {detail}")
+    return results
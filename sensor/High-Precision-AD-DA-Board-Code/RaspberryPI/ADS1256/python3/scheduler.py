@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import logging
+import threading
+import time
+
+# ==============================================================================
+# Services several ADS1256 boards concurrently: one scan thread per board.
+# DRDY waits sleep on GPIO edges and release the GIL, so every board converts
+# and waits in parallel. Only the SPI transfers of boards sharing a bus are
+# serialized, by the config.Board bus lock.
+# ==============================================================================
+
+class BoardScheduler:
+    def __init__(self, stop_event=None, thread_init=None):
+        """ thread_init(name), if given, runs first thing in each board's scan
+            thread, e.g. to apply the real-time profile to it.
+        """
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.thread_init = thread_init
+        self._jobs = [] # (name, adc, channels, on_scan)
+        self._threads = []
+
+    def add_board(self, name, adc, channels, on_scan):
+        """ Registers a board to scan. `channels` is a list of channel numbers
+            (all read with the board's current configuration) or a scan table of
+            per-entry settings (see ADS1256_ScanTable).
+            on_scan(name, raw_values) is called from the board's own thread after
+            every completed scan, with raw codes in `channels` order (None for
+            scan-table entries skipped in that scan).
+        """
+        self._jobs.append((name, adc, list(channels), on_scan))
+
+    def start(self):
+        """ Starts one scan thread per registered board. """
+        for name, adc, channels, on_scan in self._jobs:
+            thread = threading.Thread(target=self._scan_loop, args=(name, adc, channels, on_scan),
+                                      name=f"ADCSampler-{name}")
+            thread.daemon = False # Ensure graceful shutdown
+            thread.start()
+            self._threads.append(thread)
+
+    def is_alive(self):
+        """ True while every board thread is still running. """
+        return bool(self._threads) and all(t.is_alive() for t in self._threads)
+
+    def join(self, timeout=None):
+        """ Waits for all board threads; returns the names of those still running. """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            thread.join(timeout=remaining)
+        return [t.name for t in self._threads if t.is_alive()]
+
+    def _scan_loop(self, name, adc, channels, on_scan):
+        if self.thread_init is not None:
+            self.thread_init(name)
+        table = bool(channels) and isinstance(channels[0], dict)
+        if table:
+            channels_str = [entry['channel'] for entry in channels]
+        else:
+            channels_str = channels
+        logging.info(f"Board {name}: scanning channels {channels_str}.")
+        scan_index = 0 # Completed scans, selects the scan-table entries with 'every' > 1
+        while not self.stop_event.is_set():
+            # DRDY paces the loop, so no sleep is needed between scans
+            if table:
+                raw_values = adc.ADS1256_ScanTable(channels, scan_index)
+            else:
+                raw_values = adc.ADS1256_ScanChannels(channels)
+            if raw_values is None:
+                logging.warning(f"Board {name}: Failed to scan ADC channels {channels_str} (WaitDRDY Timeout?)")
+                time.sleep(0.1)
+                continue
+            scan_index += 1
+            try:
+                on_scan(name, raw_values)
+            except Exception as e:
+                logging.error(f"Board {name}: Error handling scan results: {e}", exc_info=True)
+        logging.info(f"Board {name}: scan thread finished.")
@@ -0,0 +1,253 @@
+# -*- coding:utf-8 -*-
+# Software ADS1256 board for running the acquisition stack without a Pi.
+# Selected in config.py with ADS1256_BACKEND=sim; SimBoard has the same
+# interface as config.Board, so ADS1256.py and the sampler scripts run as-is.
+
+import math
+import random
+import threading
+import time
+
+# Conversions per second for each DRATE register value
+DRATE_SPS = {0xF0 : 30000, 0xE0 : 15000, 0xD0 : 7500, 0xC0 : 3750,
+             0xB0 : 2000, 0xA1 : 1000, 0x92 : 500, 0x82 : 100,
+             0x72 : 60, 0x63 : 50, 0x53 : 30, 0x43 : 25,
+             0x33 : 15, 0x23 : 10, 0x13 : 5, 0x03 : 2.5}
+
+# Register values after power-up/RESET (STATUS ID bits = 3 for the ADS1256)
+RESET_REGS = [0x30, 0x01, 0x20, 0xF0, 0xE0, 0x00, 0x00, 0x00, 0x00, 0x00, 0x40]
+
+FULL_SCALE_V = 5.0 # Input voltage that maps to code 0x7FFFFF at PGA 1 (2 x 2.5V VREF)
+AINCOM = 8         # MUX input number of AINCOM
+SLEEP_SLACK_S = 250e-6 # How far short of the next DRDY edge wait_drdy() sleeps
+
+class Waveform:
+    """ Input voltage source: a sine with harmonics, a DC offset and uniform noise.
+        harmonics is a list of (order, relative_amplitude) pairs.
+    """
+    def __init__(self, amplitude=1.0, freq_hz=50.0, phase=0.0, harmonics=(),
+                 offset=0.0, noise=0.0, seed=None):
+        self.amplitude = amplitude
+        self.freq_hz = freq_hz
+        self.phase = phase
+        self.harmonics = list(harmonics)
+        self.offset = offset
+        self.noise = noise
+        self.rng = random.Random(seed)
+
+    def __call__(self, t):
+        """ Voltage at t seconds. """
+        w = 2 * math.pi * self.freq_hz * t
+        v = self.offset + self.amplitude * math.sin(w + self.phase)
+        for order, rel in self.harmonics:
+            v += self.amplitude * rel * math.sin(order * (w + self.phase))
+        if self.noise:
+            v += self.rng.uniform(-self.noise, self.noise)
+        return v
+
+def default_sources():
+    """ Eight three-phase 50Hz inputs riding on the sensors' 1.5V bias, with
+        3rd/5th harmonics and a few mV of noise (like sqlconfake's synthetic data).
+    """
+    return [Waveform(amplitude=1.0, phase=-2 * math.pi * (ch % 3) / 3,
+                     harmonics=[(3, 0.05), (5, 0.03)], offset=1.5, noise=0.002, seed=ch)
+            for ch in range(8)]
+
+class SimADS1256:
+    """ Register map, command decoder and conversion timing of one ADS1256.
+        Conversions complete every 1/drate seconds after a settling delay from
+        the last SYNC/WAKEUP/RESET; DRDY is low while the newest one is unread.
+    """
+    def __init__(self, sources=None, full_scale_v=FULL_SCALE_V):
+        self.sources = sources if sources is not None else default_sources()
+        self.full_scale_v = full_scale_v
+        self.epoch = time.monotonic() # t = 0 of the input waveforms
+        self.reset()
+
+    def reset(self):
+        self.regs = list(RESET_REGS)
+        self.continuous = False
+        self.out = [] # Bytes queued for the next read (RDATA/RREG)
+        self.data = 0 # Output data register (last latched conversion)
+        self.restart()
+
+    # --- Conversion timing ---
+    def period(self):
+        sps = DRATE_SPS.get(self.regs[3])
+        if sps is None: # The real chip's rate for an undefined code is unspecified
+            raise ValueError(f"DRATE register holds 0x{self.regs[3]:02X}, not a valid ADS1256 data rate code")
+        return 1.0 / sps
+
+    def settle(self):
+        # Within a few us of datasheet Table 13 for every data rate
+        return self.period() + 180e-6
+
+    def restart(self, now=None):
+        """ Starts a new conversion sequence (SYNC/WAKEUP, RESET, calibration). """
+        self.start = time.monotonic() if now is None else now
+        self.completed = 0 # Conversions finished since start
+        self.consumed = 0  # Conversions that have been read
+        self.mux = self.regs[1] # MUX in effect for the running conversion
+        self.running = True
+
+    def _completed_at(self, now):
+        first = self.start + self.settle()
+        if not self.running or now < first:
+            return 0
+        return int((now - first) / self.period()) + 1
+
+    def advance(self, now=None):
+        """ Latches the newest finished conversion into the output register. """
+        now = time.monotonic() if now is None else now
+        n = self._completed_at(now)
+        if n > self.completed:
+            t = self.start + self.settle() + (n - 1) * self.period()
+            self.data = self.convert(t)
+            self.completed = n
+            self.mux = self.regs[1] # Later conversions use the current MUX
+        return now
+
+    def next_ready(self):
+        """ Monotonic time at which the next unread conversion completes. """
+        return self.start + self.settle() + max(self.completed, self.consumed) * self.period()
+
+    def drdy_low(self, now=None):
+        self.advance(now)
+        return self.completed > self.consumed
+
+    # --- Analog front end ---
+    def input_voltage(self, ain, t):
+        if ain < len(self.sources) and self.sources[ain] is not None:
+            return self.sources[ain](t - self.epoch)
+        return 0.0 # AINCOM and unconnected inputs sit at 0V
+
+    def convert(self, t):
+        p, n = self.mux >> 4, self.mux & 0x0F
+        v = self.input_voltage(p, t) - self.input_voltage(n, t)
+        pga = 1 << (self.regs[2] & 0x07) if (self.regs[2] & 0x07) < 7 else 64
+        code = int(round(v * pga / self.full_scale_v * 0x7FFFFF))
+        return max(-0x800000, min(0x7FFFFF, code))
+
+    def _read_data(self):
+        self.consumed = self.completed
+        code = self.data & 0xFFFFFF
+        return [(code >> 16) & 0xFF, (code >> 8) & 0xFF, code & 0xFF]
+
+    # --- SPI ---
+    def transfer(self, tx, rx_len):
+        """ Decodes the command bytes in tx and returns rx_len bytes. """
+        now = self.advance()
+        i = 0
+        while i < len(tx):
+            cmd = tx[i]
+            i += 1
+            if self.continuous and cmd not in (0x0F, 0xFE):
+                continue # Only SDATAC and RESET are accepted in RDATAC mode
+            if cmd == 0x01:                   # RDATA
+                self.out = self._read_data()
+            elif cmd == 0x03:                 # RDATAC
+                self.out = self._read_data()
+                self.continuous = True
+            elif cmd == 0x0F:                 # SDATAC
+                self.continuous = False
+            elif cmd & 0xF0 == 0x10:          # RREG
+                count = (tx[i] & 0x0F) + 1 if i < len(tx) else 1
+                i += 1
+                self.out = [self.regs[r] for r in range(cmd & 0x0F, min(11, (cmd & 0x0F) + count))]
+            elif cmd & 0xF0 == 0x50:          # WREG
+                count = (tx[i] & 0x0F) + 1 if i < len(tx) else 1
+                i += 1
+                regs = range(cmd & 0x0F, min(11, (cmd & 0x0F) + count))
+                for reg in regs:
+                    if i < len(tx):
+                        self.regs[reg] = tx[i] if reg else (self.regs[0] & 0xF1) | (tx[i] & 0x0E)
+                    i += 1
+                if {0, 2, 3} & set(regs):
+                    self.restart(now) # Buffer, PGA or data rate changes restart the filter
+            elif cmd in (0x00, 0xFF, 0xFC):   # WAKEUP, SYNC
+                self.restart(now)
+            elif 0xF0 <= cmd <= 0xF4:         # Calibrations: modeled as a restart
+                self.restart(now)
+            elif cmd == 0xFD:                 # STANDBY
+                self.running = False
+            elif cmd == 0xFE:                 # RESET
+                self.reset()
+
+        if not rx_len:
+            return []
+        if not self.out and self.continuous:
+            self.out = self._read_data() # RDATAC: each read shifts out the newest conversion
+        rx, self.out = self.out[:rx_len], self.out[rx_len:]
+        return rx + [0] * (rx_len - len(rx))
+
+# Every SimBoard that has been initialized (config.module_exit() releases them)
+open_boards = []
+
+class SimBoard:
+    """ Drop-in replacement for config.Board backed by a SimADS1256. """
+    def __init__(self, rst_pin=None, cs_pin=None, drdy_pin=None,
+                 spi_bus=0, spi_device=0, hw_cs=False, spi_speed_hz=2000000,
+                 sources=None):
+        self.rst_pin = rst_pin
+        self.cs_pin = cs_pin
+        self.drdy_pin = drdy_pin
+        self.spi_bus = spi_bus
+        self.spi_device = spi_device
+        self.hw_cs = hw_cs
+        self.spi_speed_hz = spi_speed_hz
+        self.SPI = None
+        self.chip = SimADS1256(sources)
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"SimBoard(spi{self.spi_bus}.{self.spi_device}, cs={self.cs_pin}, drdy={self.drdy_pin})"
+
+    def digital_write(self, pin, value):
+        if pin == self.rst_pin and not value:
+            with self.lock:
+                self.chip.reset()
+
+    def digital_read(self, pin):
+        if pin == self.drdy_pin:
+            with self.lock:
+                return 0 if self.chip.drdy_low() else 1
+        print(f"Warning: Attempted to read from unconfigured pin {pin}")
+        return None
+
+    def wait_drdy(self, timeout):
+        """ Sleeps until the next conversion completes, see config.Board.wait_drdy(). """
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if self.chip.drdy_low(now):
+                    return True, now - start
+                wake = self.chip.next_ready() if self.chip.running else deadline
+            if now >= deadline:
+                return False, now - start
+            remaining = min(wake, deadline) - now
+            # time.sleep() overshoots by ~0.1ms, which would drop conversions at
+            # kSPS rates, so sleep short of the edge and yield for the rest.
+            time.sleep(remaining - SLEEP_SLACK_S if remaining > SLEEP_SLACK_S else 0)
+
+    def spi_writebyte(self, data):
+        self.spi_transfer(data)
+
+    def spi_readbytes(self, num_bytes):
+        return self.spi_transfer([], num_bytes)
+
+    def spi_transfer(self, tx, rx_len=0, delay_us=0):
+        """ Single transaction against the emulated chip; delay_us is not simulated. """
+        with self.lock:
+            return self.chip.transfer(list(tx), rx_len)
+
+    def module_init(self):
+        if self not in open_boards:
+            open_boards.append(self)
+        print(f"Simulated ADS1256 initialized for {self}.")
+        return 0
+
+    def module_exit(self):
+        if self in open_boards:
+            open_boards.remove(self)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import logging
+import os
+import pickle
+import struct
+import time
+import zlib
+
+# ==============================================================================
+# Disk-backed spool for database writes: an append-only segment log.
+#
+# When the database is down, restarting or too slow, the writers append their
+# records (the rows of a write cycle) here instead of dropping them, and
+# replay() hands them back, oldest first, once the database takes writes
+# again. Each record is a pickled Python object framed as
+#   magic b'SPL1' | payload length (u32 LE) | CRC-32 of the payload (u32 LE) | payload
+# in segment files <number>.seg of about segment_bytes each. Fully replayed
+# segments are deleted. The read position is kept in the 'position' file and
+# only advances after the database took a record, so a crash replays at most
+# the records in flight (at-least-once delivery). A record torn by a crash or
+# power loss at the end of the last segment is cut off when the spool opens.
+#
+# fsync policy: 'always' (every append is on disk before append() returns),
+# 'interval' (at most fsync_interval_s of records at risk) or 'never' (left
+# to the OS). Above max_bytes, the oldest segments are dropped whole and
+# their records counted in dropped_records.
+#
+# The write function returns True once the database took a record, False if
+# it could not write it now (connection lost, statement cancelled): replay
+# stops there and tries the same record again later. REJECTED means the record
+# can never be written (bad data, constraint or schema error); it is moved to
+# the 'quarantine' file (same framing, kept for inspection) and replay goes on,
+# so one bad record cannot hold back everything behind it.
+#
+# SpooledWriter puts the spool in front of a write function: records go
+# straight to the database while it is healthy and through the spool while it
+# is not (or always, in write-ahead mode), so their order is kept.
+# ==============================================================================
+
+MAGIC = b'SPL1'
+SEGMENT_SUFFIX = '.seg'
+POSITION_FILE = 'position'
+QUARANTINE_FILE = 'quarantine'
+REJECTED = 'rejected' # write() result for a record that can never be written
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+SEGMENT_BYTES = 16 * 1024 * 1024
+MAX_BYTES = 1024 * 1024 * 1024
+FSYNC_INTERVAL_S = 1.0
+
+_HEADER = struct.Struct('<4sII')
+
+class Spool:
+    """ Append-only segment log of records in directory, see the module comment. """
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, max_bytes=MAX_BYTES,
+                 fsync='interval', fsync_interval_s=FSYNC_INTERVAL_S):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.fsync_interval_s = fsync_interval_s
+        self.dropped_records = 0 # Records lost to the size cap or to corruption
+        self.quarantined = 0     # Records write() rejected, moved to QUARANTINE_FILE
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+        self.segments = sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+                               if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit())
+        if not self.segments:
+            self.segments.append(0)
+            open(self._path(0), 'ab').close()
+        self.sizes = {segment: os.path.getsize(self._path(segment)) for segment in self.segments}
+        self._cut_torn_tail(self.segments[-1])
+        self.read_segment, self.read_offset = self._load_position()
+        self._file = open(self._path(self.segments[-1]), 'ab', buffering=0)
+        if self.pending:
+            logging.info(f"Spool {directory}: {self.backlog_bytes()} bytes from an earlier run to replay.")
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{segment:010d}{SEGMENT_SUFFIX}")
+
+    @property
+    def pending(self):
+        """ True while there are records not replayed yet. """
+        return self.read_segment != self.segments[-1] or self.read_offset < self.sizes[self.segments[-1]]
+
+    def backlog_bytes(self):
+        return sum(self.sizes.values()) - self.read_offset
+
+    def append(self, record):
+        """ Appends one record (any picklable object). """
+        data = _frame(record)
+        active = self.segments[-1]
+        if self.sizes[active] and self.sizes[active] + len(data) > self.segment_bytes:
+            self._rotate()
+            active = self.segments[-1]
+        with memoryview(data) as view:
+            written = 0
+            while written < len(data):
+                written += self._file.write(view[written:])
+        self.sizes[active] += len(data)
+        self._unsynced = True
+        self._sync()
+        if sum(self.sizes.values()) > self.max_bytes:
+            self._enforce_cap()
+
+    def replay(self, write, max_records=None):
+        """ Calls write(record) for the pending records, oldest first, until it
+            returns False or max_records were handled. Rejected records are
+            quarantined. Returns the number written.
+        """
+        count = 0
+        handled = 0
+        while max_records is None or handled < max_records:
+            record, next_offset = self._read(self.read_segment, self.read_offset)
+            if next_offset is None: # End of the segment
+                if self.read_segment == self.segments[-1]:
+                    self._reset_active()
+                    break
+                self._remove_oldest()
+                continue
+            result = write(record)
+            if result is REJECTED:
+                self.quarantine(record)
+            elif not result:
+                break
+            else:
+                count += 1
+            self.read_offset = next_offset
+            self._save_position()
+            handled += 1
+        return count
+
+    def quarantine(self, record):
+        """ Moves a record write() rejected out of the way, into QUARANTINE_FILE. """
+        with open(os.path.join(self.directory, QUARANTINE_FILE), 'ab') as f:
+            f.write(_frame(record))
+            if self.fsync != 'never':
+                f.flush()
+                os.fsync(f.fileno())
+        self.quarantined += 1
+        logging.error(f"Spool {self.directory}: record rejected by the database, moved to {QUARANTINE_FILE} "
+                      f"({self.quarantined} since start).")
+
+    def close(self):
+        if self.fsync != 'never' and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._file.close()
+
+    # --- Segments ---
+    def _rotate(self):
+        if self.fsync != 'never':
+            os.fsync(self._file.fileno())
+        self._file.close()
+        segment = self.segments[-1] + 1
+        self.segments.append(segment)
+        self.sizes[segment] = 0
+        self._file = open(self._path(segment), 'ab', buffering=0)
+        self._unsynced = False
+        if self.fsync != 'never':
+            self._sync_directory()
+
+    def _remove_oldest(self):
+        segment = self.segments.pop(0)
+        del self.sizes[segment]
+        if self.read_segment == segment:
+            self.read_segment, self.read_offset = self.segments[0], 0
+            self._save_position()
+        os.remove(self._path(segment))
+
+    def _reset_active(self):
+        # Everything replayed: start the active segment over instead of growing it
+        if self.read_offset and self.read_offset == self.sizes[self.segments[-1]]:
+            self.read_offset = 0
+            self._save_position() # Before truncating: a crash in between replays, never skips
+            self._file.truncate(0)
+            self.sizes[self.segments[-1]] = 0
+
+    def _enforce_cap(self):
+        while sum(self.sizes.values()) > self.max_bytes and len(self.segments) > 1:
+            segment = self.segments[0]
+            offset = self.read_offset if segment == self.read_segment else 0
+            lost = self._count_records(segment, offset)
+            self.dropped_records += lost
+            logging.warning(f"Spool over {self.max_bytes} bytes: dropped segment {segment} with {lost} "
+                            f"unreplayed record(s) ({self.dropped_records} since start).")
+            self._remove_oldest()
+
+    def _cut_torn_tail(self, segment):
+        # Keep the last segment up to its last complete, intact record
+        offset = 0
+        while True:
+            _, next_offset = self._read(segment, offset, decode=False)
+            if next_offset is None:
+                break
+            offset = next_offset
+        if offset < self.sizes[segment]:
+            logging.warning(f"Spool segment {segment}: cutting {self.sizes[segment] - offset} bytes of an incomplete record.")
+            with open(self._path(segment), 'r+b') as f:
+                f.truncate(offset)
+            self.sizes[segment] = offset
+
+    # --- Records ---
+    def _read(self, segment, offset, decode=True):
+        """ Returns (record, offset of the next record), or (None, None) at the
+            end of the segment. The rest of a segment after a corrupt record is
+            skipped. With decode False only the framing and CRC are checked.
+        """
+        size = self.sizes[segment]
+        if size - offset < _HEADER.size:
+            return None, None
+        with open(self._path(segment), 'rb') as f:
+            f.seek(offset)
+            magic, length, crc = _HEADER.unpack(f.read(_HEADER.size))
+            payload = f.read(length) if magic == MAGIC and offset + _HEADER.size + length <= size else b''
+        if len(payload) != length or magic != MAGIC or zlib.crc32(payload) != crc:
+            if decode:
+                self.dropped_records += 1
+                logging.error(f"Spool segment {segment}: corrupt record at offset {offset}, skipping the rest of the segment.")
+                if segment == self.segments[-1]:
+                    self._rotate() # Later records go to a clean segment
+            return None, None
+        return pickle.loads(payload) if decode else None, offset + _HEADER.size + length
+
+    def _count_records(self, segment, offset):
+        count = 0
+        with open(self._path(segment), 'rb') as f:
+            while offset + _HEADER.size <= self.sizes[segment]:
+                f.seek(offset)
+                _, length, _ = _HEADER.unpack(f.read(_HEADER.size))
+                offset += _HEADER.size + length
+                count += 1
+        return count
+
+    # --- Durability ---
+    def _sync(self):
+        if self.fsync == 'always' or (self.fsync == 'interval'
+                                      and time.monotonic() - self._last_fsync >= self.fsync_interval_s):
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+            self._unsynced = False
+
+    def _sync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _load_position(self):
+        try:
+            with open(os.path.join(self.directory, POSITION_FILE)) as f:
+                segment, offset = (int(field) for field in f.read().split())
+        except (OSError, ValueError):
+            return self.segments[0], 0
+        if segment not in self.sizes: # Segment gone (dropped or replayed): start at the oldest left
+            return self.segments[0], 0
+        return segment, min(offset, self.sizes[segment])
+
+    def _save_position(self):
+        path = os.path.join(self.directory, POSITION_FILE)
+        with open(path + '.tmp', 'w') as f:
+            f.write(f"{self.read_segment} {self.read_offset}\n")
+            if self.fsync != 'never':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+def _frame(record):
+    payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+class SpooledWriter:
+    """ Sends records to write(record), which returns True once the database
+        took them (False or REJECTED otherwise), through the spool when needed
+        (see the module comment).
+        In write-ahead mode every record is spooled before it is written.
+    """
+    def __init__(self, spool, write, write_ahead=False, replay_max_records=None):
+        self.spool = spool
+        self.write = write
+        self.write_ahead = write_ahead
+        self.replay_max_records = replay_max_records
+        self.spooled = 0 # Records that went to disk
+
+    def submit(self, record):
+        """ Writes a record, or spools it behind the backlog; then replays part of the backlog. """
+        if not self.write_ahead and not self.spool.pending:
+            result = self.write(record)
+            if result is REJECTED:
+                self.spool.quarantine(record)
+                return
+            if result:
+                return
+            logging.warning(f"Database write failed, spooling to {self.spool.directory} until it is back.")
+        self.spool.append(record)
+        self.spooled += 1
+        self.drain(self.replay_max_records)
+
+    def drain(self, max_records=None):
+        """ Replays spooled records while the database takes them. Returns the number written. """
+        if not self.spool.pending:
+            return 0
+        written = self.spool.replay(self.write, max_records)
+        if written and not self.spool.pending and not self.write_ahead:
+            logging.info("Spool drained, writing to the database directly again.")
+        return written
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import datetime
+import logging
+import time
+import numpy as np
+
+# ==============================================================================
+# Sample timestamps derived from the sample index instead of reading the clock
+# for every sample. Each burst costs one clock read; sample i of the stream is
+# at anchor + i * period. The period starts at the nominal conversion period
+# and is corrected by measuring the stream against the host clock, so slow
+# crystal drift does not accumulate into a phase error.
+#
+# The clock also numbers the samples. Sequence numbers keep counting across
+# re-anchors: when the stream restarts after a stall, the conversions missed
+# in between are estimated from the elapsed time and skipped, so the consumer
+# sees the loss as a gap in the sequence.
+#
+# Streams paced in software (a poll loop, a multi-channel scan) have no crystal
+# behind their nominal rate: it is an estimate from the settling times and the
+# real rate depends on the Python overhead. Their clocks are created with
+# calibrate_s: the period follows the measurement without limit for that many
+# seconds after the first anchor, then the measured period becomes the nominal
+# one and the correction is held to max_drift_ppm around it like any other.
+# ==============================================================================
+
+MAX_DRIFT_PPM = 1000       # Largest correction of the nominal period (crystal tolerance)
+MIN_FIT_SAMPLES = 8        # Samples since the anchor before the period is re-estimated
+MAX_PHASE_ERROR_S = 0.05   # Re-anchor when a burst ends further than this from its predicted time
+
+def ns_to_datetime(time_ns):
+    """ Converts a wall-clock timestamp in ns since the epoch to an aware UTC datetime. """
+    return datetime.datetime.fromtimestamp(time_ns / 1e9, tz=datetime.timezone.utc)
+
+class SampleClock:
+    """ Timestamps and numbers a continuous stream of samples at a nominal rate.
+        Call burst() right after each burst is read; call reset() when the stream
+        restarts or samples were lost, so the next burst re-anchors.
+        After burst(), the burst's samples are numbered burst_seq .. next_seq - 1.
+    """
+    def __init__(self, nominal_rate_hz, max_drift_ppm=MAX_DRIFT_PPM,
+                 max_phase_error_s=MAX_PHASE_ERROR_S, calibrate_s=None):
+        self.nominal_period_ns = 1e9 / nominal_rate_hz
+        self.period_ns = self.nominal_period_ns
+        self.max_drift_ppm = max_drift_ppm
+        # Measures the nominal period over the first calibrate_s seconds (None: trust it)
+        self.calibrate_ns = None if calibrate_s is None else calibrate_s * 1e9
+        self.calibrated = calibrate_s is None
+        self.max_phase_error_ns = max_phase_error_s * 1e9
+        self.resyncs = 0 # Re-anchors caused by a phase error (stalls, lost samples)
+        self.next_seq = 0   # Sequence number of the next sample
+        self.burst_seq = 0  # Sequence number of the first sample of the last burst
+        self.skipped = 0    # Sequence numbers skipped for samples missed during stalls
+        self._last_mono = None # Monotonic ns of the last sample of the last burst
+        self.reset()
+
+    def reset(self):
+        self._base_mono = None # Monotonic ns of sample index 0 (None: not anchored)
+        self._next_index = 0   # Stream index of the next sample
+
+    @property
+    def drift_ppm(self):
+        """ Estimated deviation of the actual from the nominal sample period. """
+        return (self.period_ns / self.nominal_period_ns - 1.0) * 1e6
+
+    def _anchor(self, n, end_mono):
+        # Sample n-1 was read just now; the host's wall/monotonic offset is
+        # taken once per anchor so an NTP step cannot tear a stream apart.
+        if self._last_mono is not None:
+            # Conversions that fit between the previous burst and this one were lost
+            gap = (end_mono - (n - 1) * self.period_ns - self._last_mono) / self.period_ns
+            missed = max(0, int(round(gap)) - 1)
+            self.next_seq += missed
+            self.skipped += missed
+        self._wall_offset = time.time_ns() - time.monotonic_ns()
+        self._base_mono = end_mono - (n - 1) * self.period_ns
+        self._next_index = 0
+        self._fit_mono = end_mono  # Start of the baseline used for drift estimation
+        self._fit_index = n - 1
+
+    def _update_period(self, last_index, end_mono):
+        samples = last_index - self._fit_index
+        if samples < MIN_FIT_SAMPLES:
+            return
+        estimate = (end_mono - self._fit_mono) / samples
+        if not self.calibrated:
+            if end_mono - self._fit_mono >= self.calibrate_ns:
+                logging.info(f"Sample clock calibrated: {1e9 / estimate:.3f} Hz measured, "
+                             f"{1e9 / self.nominal_period_ns:.3f} Hz nominal.")
+                self.nominal_period_ns = estimate
+                self.calibrated = True
+            # Until then the nominal period may be far off: rather than keep the
+            # next sample's time, put the samples back on the anchor's timeline
+            self._base_mono = self._fit_mono - self._fit_index * estimate
+            self.period_ns = estimate
+            return
+        if self.max_drift_ppm is not None:
+            limit = self.nominal_period_ns * self.max_drift_ppm * 1e-6
+            estimate = min(max(estimate, self.nominal_period_ns - limit), self.nominal_period_ns + limit)
+        # Move the base so the next sample keeps its time under the new period
+        self._base_mono += self._next_index * (self.period_ns - estimate)
+        self.period_ns = estimate
+
+    def burst(self, n, end_mono_ns=None):
+        """ Registers a burst of n consecutive samples, the last of which has
+            just been read (or was read at end_mono_ns).
+            Returns (first_time_ns, period_ns): wall-clock ns of the burst's
+            first sample and the spacing of the samples that follow it.
+        """
+        end_mono = time.monotonic_ns() if end_mono_ns is None else end_mono_ns
+        if self._base_mono is not None:
+            last_index = self._next_index + n - 1
+            error = end_mono - (self._base_mono + last_index * self.period_ns)
+            if abs(error) > self.max_phase_error_ns:
+                self.resyncs += 1
+                self._base_mono = None
+            else:
+                self._update_period(last_index, end_mono)
+        if self._base_mono is None:
+            self._anchor(n, end_mono)
+
+        first_ns = int(self._base_mono + self._next_index * self.period_ns) + self._wall_offset
+        self._next_index += n
+        self.burst_seq = self.next_seq
+        self.next_seq += n
+        self._last_mono = end_mono
+        return first_ns, self.period_ns
+
+    def burst_times_ns(self, n, end_mono_ns=None):
+        """ Like burst(), but returns the wall-clock ns of all n samples as an int64 array. """
+        first_ns, period_ns = self.burst(n, end_mono_ns)
+        return first_ns + np.round(np.arange(n) * period_ns).astype(np.int64)
+
+    def burst_seqs(self):
+        """ Sequence numbers of the last burst's samples as an int64 array. """
+        return np.arange(self.burst_seq, self.next_seq, dtype=np.int64)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import numpy as np
+
+# ==============================================================================
+# Event-triggered capture of full-rate samples.
+#
+# TriggerDetector flags the samples of a stream that meet any configured
+# condition:
+#   - threshold:     |v| above a level
+#   - slope:         |dv/dt| above a rate of change (units per second)
+#   - rms_deviation: the RMS over the last rms_window_s (one mains cycle by
+#                    default) deviating from its slow baseline (an average
+#                    over baseline_s) by more than this fraction
+# TriggeredCapture keeps the last pre_s seconds of samples and, when the
+# detector fires, returns the samples from pre_s before the first triggering
+# sample to post_s after the last one. Triggers inside a capture extend it.
+# Both carry their state across batches, so batches of any size give the same
+# result, and no sample is returned twice.
+# ==============================================================================
+
+RMS_WINDOW_S = 0.02 # One 50 Hz cycle
+BASELINE_S = 10.0   # Time constant of the RMS baseline
+
+class TriggerDetector:
+    """ Vectorized trigger conditions on a stream of samples at rate_hz; any
+        condition left None is not checked.
+    """
+    def __init__(self, rate_hz, threshold=None, slope=None, rms_deviation=None,
+                 rms_window_s=RMS_WINDOW_S, baseline_s=BASELINE_S):
+        self.threshold = threshold
+        self.slope = slope
+        self.rms_deviation = rms_deviation
+        self.rms_window = max(1, int(round(rms_window_s * rate_hz)))
+        # Per-window EMA weight of the baseline, from its time constant in windows
+        self.baseline_alpha = min(1.0, self.rms_window / (baseline_s * rate_hz))
+        self.baseline = None # Mean square of the stream, slow average
+        self._last = None    # (time_ns, value) of the previous sample, for the slope
+        self._squares = np.zeros(0) # Squares of the last rms_window - 1 samples
+
+    def detect(self, times_ns, values):
+        """ Returns a boolean array: True for the samples that trigger. """
+        values = np.asarray(values, dtype=np.float64)
+        mask = np.zeros(len(values), dtype=bool)
+        if not len(values):
+            return mask
+        if self.threshold is not None:
+            mask |= np.abs(values) > self.threshold
+        if self.slope is not None:
+            prev_t, prev_v = self._last if self._last is not None else (times_ns[0], values[0])
+            dt_s = np.diff(np.concatenate(([prev_t], times_ns))) / 1e9
+            dv = np.diff(np.concatenate(([prev_v], values)))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mask |= np.abs(dv) > self.slope * np.where(dt_s > 0, dt_s, np.inf)
+        self._last = (times_ns[-1], values[-1])
+        if self.rms_deviation is not None:
+            mask |= self._rms_trigger(values)
+        return mask
+
+    def _rms_trigger(self, values):
+        # Sliding mean square over rms_window samples, ending at each new sample
+        squares = np.concatenate((self._squares, np.square(values)))
+        self._squares = squares[-(self.rms_window - 1):] if self.rms_window > 1 else squares[:0]
+        mask = np.zeros(len(values), dtype=bool)
+        offset = len(squares) - len(values) # Index of the first new sample in squares
+        if len(squares) < self.rms_window:
+            return mask
+        cumsum = np.concatenate(([0.0], np.cumsum(squares)))
+        ends = np.arange(max(offset, self.rms_window - 1), len(squares))
+        mean_square = (cumsum[ends + 1] - cumsum[ends + 1 - self.rms_window]) / self.rms_window
+
+        # Baseline updated once per window of new samples, from the window ending there
+        updates = mean_square[::self.rms_window]
+        baselines = np.empty(len(updates))
+        baseline = self.baseline
+        for i, value in enumerate(updates):
+            baseline = value if baseline is None else baseline + self.baseline_alpha * (value - baseline)
+            baselines[i] = baseline
+        self.baseline = baseline
+        if baseline is None:
+            return mask
+        baseline_rms = np.sqrt(np.repeat(baselines, self.rms_window)[:len(mean_square)])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deviation = np.abs(np.sqrt(mean_square) - baseline_rms) / baseline_rms
+        mask[ends - offset] = np.nan_to_num(deviation) > self.rms_deviation
+        return mask
+
+class TriggeredCapture:
+    """ Pre/post-trigger capture of one sensor's stream, see the module comment. """
+    def __init__(self, rate_hz, detector, pre_s, post_s):
+        self.detector = detector
+        self.pre_n = int(np.ceil(pre_s * rate_hz))
+        self.post_n = int(np.ceil(post_s * rate_hz))
+        self.count = 0        # Samples seen
+        self.written_to = 0   # Stream index after the last sample returned
+        self.capture_to = 0   # Stream index at which the running capture ends
+        self.captures = 0     # Capture windows started
+        self._pre = None      # (times, seqs, values) of the last pre_n samples
+
+    @property
+    def capturing(self):
+        return self.capture_to > self.count
+
+    def process(self, times_ns, seqs, values):
+        """ Returns the samples to keep, as a list of contiguous (times_ns, seqs, values) segments. """
+        new = (np.asarray(times_ns, dtype=np.int64), np.asarray(seqs, dtype=np.int64),
+               np.asarray(values, dtype=np.float64))
+        triggers = np.flatnonzero(self.detector.detect(new[0], new[2]))
+        new_n = len(new[2])
+        # Work on the pre-trigger samples followed by the new ones
+        times_ns, seqs, values = new if self._pre is None else (np.concatenate(pair) for pair in zip(self._pre, new))
+        n = len(values)
+        first_index = self.count + new_n - n # Stream index of values[0]
+        self.count += new_n
+
+        # Difference array of the kept ranges: the running capture, then one window per trigger
+        edges = np.zeros(n + 1, dtype=np.int64)
+        start = max(self.written_to, first_index) - first_index
+        stop = min(self.capture_to, self.count) - first_index
+        if stop > start:
+            edges[start] += 1
+            edges[stop] -= 1
+        if triggers.size:
+            triggers += n - new_n
+            np.add.at(edges, np.maximum(triggers - self.pre_n, 0), 1)
+            np.add.at(edges, np.minimum(triggers + self.post_n + 1, n), -1)
+            self.capture_to = max(self.capture_to, first_index + int(triggers[-1]) + self.post_n + 1)
+        keep = np.cumsum(edges[:-1]) > 0
+        keep[:max(0, self.written_to - first_index)] = False # Returned with an earlier batch
+
+        steps = np.diff(np.concatenate(([0], keep.astype(np.int8), [0])))
+        starts = np.flatnonzero(steps == 1)
+        stops = np.flatnonzero(steps == -1)
+        segments = [(times_ns[a:b].copy(), seqs[a:b].copy(), values[a:b].copy()) for a, b in zip(starts, stops)]
+        if segments:
+            # A segment that picks up right where the last one ended continues a capture
+            continues = self.written_to > 0 and first_index + starts[0] == self.written_to
+            self.captures += len(starts) - int(continues)
+            self.written_to = first_index + int(stops[-1])
+        if self.pre_n:
+            self._pre = tuple(array[-self.pre_n:].copy() for array in (times_ns, seqs, values))
+        return segments
+
+def split_by_span(times_ns, max_span_ns):
+    """ Splits a sorted run of sample times into slices of at most max_span_ns each. """
+    slices = []
+    start = 0
+    while start < len(times_ns):
+        stop = int(np.searchsorted(times_ns, times_ns[start] + max_span_ns, side='right'))
+        slices.append(slice(start, stop))
+        start = stop
+    return slices
@@ -8,6 +8,18 @@ import psycopg2
 from psycopg2 import OperationalError
 import numpy as np
 import datetime
+import os
+import sys
+
+# bulkload.py lives with the ADS1256 scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'High-Precision-AD-DA-Board-Code', 'RaspberryPI', 'ADS1256', 'python3'))
+import bulkload
+
+# Rows of microgrid_back_measurementssix, written with binary COPY (multi-row INSERT fallback)
+MEASUREMENTS = bulkload.BulkLoader('microgrid_back_measurementssix', (
+    ('sensor_id', 'int4'), ('sensdata', 'numeric[]'), ('time', 'timestamptz'), ('rmsvalue', 'numeric'),
+    ('pf', 'numeric'), ('thd', 'numeric'), ('sname', 'text'), ('stype', 'text')))
 
 # Function to create a database connection
 def create_connection(host_name, user_name, password, db_name):
@@ -25,31 +37,17 @@ def create_connection(host_name, user_name, password, db_name):
         print(f"The error '{e}' occurred")
     return connection
 
-# Function to get the max id from the table
-def get_max_id(connection):
-    cursor = connection.cursor()
-    cursor.execute("SELECT MAX(id) FROM microgrid_back_measurementssix;")
-    max_id = cursor.fetchone()[0]
-    cursor.close()
-    return max_id if max_id else 0
-
 # Function to calculate RMS value
 def calculate_rms(data_array):
     return np.sqrt(np.mean(np.square(data_array)))
 
-# Function to insert voltage data into the database
+# Function to insert voltage data into the database, one row per sample in a single COPY
 def insert_voltage_data(connection, sensor_id, voltage_values, timestamps):
-    cursor = connection.cursor()
-    query = """
-    INSERT INTO microgrid_back_measurementssix(sensor_id, sensdata, time, rmsvalue, pf, thd, sname, stype)
-    VALUES (%s, %s::numeric[], %s, COALESCE(%s, 0), COALESCE(%s, 0), COALESCE(%s, 0), %s, %s);
-    """
     default_stype = "DefaultType"  # Provide your default value for stype here
-    for voltage, timestamp in zip(voltage_values, timestamps):
-        # Provide default values (0) for rmsvalue, pf, and thd in case of NULL
-        cursor.execute(query, (sensor_id, [voltage], timestamp, None, None, None, "DefaultName", default_stype))
-    connection.commit()
-    cursor.close()
+    # rmsvalue, pf and thd default to 0
+    rows = [(sensor_id, [voltage], timestamp, 0, 0, 0, "DefaultName", default_stype)
+            for voltage, timestamp in zip(voltage_values, timestamps)]
+    MEASUREMENTS.load(connection, rows)
 
 
 
@@ -61,7 +59,7 @@ def read_ads1256_data(ADC, num_samples):
         ADC_Value = ADC.ADS1256_GetAll()
         sensor_value = ADC_Value[7] * 5.0 / 0x7fffff  # Assuming reading from channel 7
         voltage_values.append(sensor_value)
-        timestamps.append(datetime.datetime.now().isoformat())
+        timestamps.append(datetime.datetime.now())
     return voltage_values, timestamps
 
 # Replace with your actual database credentials
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import binascii
+import collections
+import struct
+import time
+import numpy as np
+
+# ==============================================================================
+# Binary framing of sensor samples sent by the Arduino nodes over serial.
+#
+# Frame layout (all fields little-endian):
+#   offset  size  field
+#   0       2     sync 0xA5 0x5A
+#   2       2     length: bytes from sensor_id to the end of the samples
+#   4       1     sensor_id
+#   5       1     sample type: 0 = int16, 1 = float32
+#   6       4     sequence number of the frame, per sensor (wraps at 2^32)
+#   10      4     sample period in microseconds
+#   14      n     samples (length - 10 bytes)
+#   14+n    2     CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) of bytes 2 .. 14+n-1
+#
+# FrameParser takes the byte stream in arbitrary chunks and returns complete,
+# CRC-checked frames with their samples decoded into NumPy arrays. After a
+# corrupted or truncated frame it resynchronizes on the next sync word; gaps
+# in a sensor's sequence numbers are counted as lost frames. SampleBatcher
+# joins a sensor's frames into fixed-size batches for the database.
+# ==============================================================================
+
+SYNC = b'\xA5\x5A'
+INT16 = 0
+FLOAT32 = 1
+SAMPLE_DTYPES = {INT16: np.dtype('<i2'), FLOAT32: np.dtype('<f4')}
+
+_LENGTH = struct.Struct('<H')
+_HEADER = struct.Struct('<HBBII')          # length, sensor_id, sample type, seq, period_us
+_HEADER_SIZE = len(SYNC) + _HEADER.size    # Bytes before the samples
+_BODY_HEADER_SIZE = _HEADER.size - _LENGTH.size # Bytes counted by length before the samples
+_CRC_SIZE = 2
+_CRC_INIT = 0xFFFF
+_SEQ_MOD = 1 << 32
+
+MAX_SAMPLES = 2048 # Longest frame accepted; a larger length is taken as a false sync
+
+Frame = collections.namedtuple('Frame', ['sensor_id', 'seq', 'period_us', 'samples', 'lost'])
+Frame.__doc__ = """ One decoded frame. samples is a float64 array; lost is the number of
+    frames of this sensor missed just before this one (from the sequence numbers).
+"""
+
+Batch = collections.namedtuple('Batch', ['sensor_id', 'start_ns', 'period_us', 'samples', 'lost_samples', 'first_seq'])
+Batch.__doc__ = """ batch_size consecutive samples of one sensor. start_ns is the wall-clock
+    time of the first sample; lost_samples counts the samples of lost frames
+    that fell inside the batch. first_seq is the sensor's sample index of the
+    first sample, frame seq x frame length (frames assumed equally long).
+"""
+
+def crc16(data):
+    """ CRC-16/CCITT-FALSE of a bytes-like object. """
+    return binascii.crc_hqx(data, _CRC_INIT)
+
+def encode_frame(sensor_id, seq, samples, period_us, sample_type=INT16):
+    """ Builds one frame (the sender side, for simulators and tests). """
+    payload = np.asarray(samples).astype(SAMPLE_DTYPES[sample_type], copy=False).tobytes()
+    body = _HEADER.pack(_BODY_HEADER_SIZE + len(payload), sensor_id, sample_type,
+                        seq % _SEQ_MOD, period_us) + payload
+    return SYNC + body + _LENGTH.pack(crc16(body))
+
+class FrameParser:
+    """ Streaming decoder for the frame format above. feed() accepts any chunk
+        of the byte stream and returns the frames it completed; partial frames
+        are kept until the rest arrives.
+    """
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.buffer = bytearray()
+        self.frames = 0         # Good frames decoded
+        self.crc_errors = 0     # Complete frames dropped for a CRC mismatch
+        self.bad_headers = 0    # Sync words followed by an impossible header
+        self.skipped_bytes = 0  # Bytes discarded while searching for a sync word
+        self.lost_frames = 0    # Frames missing from the sensors' sequence numbers
+        self.last_seq = {}      # sensor_id -> sequence number of its last frame
+
+    def feed(self, data):
+        buf = self.buffer
+        buf += data
+        frames = []
+        pos = 0
+        while True:
+            start = buf.find(SYNC, pos)
+            if start < 0:
+                # Keep a trailing first sync byte, its partner may be in the next chunk
+                keep = len(buf) - 1 if buf[-1:] == SYNC[:1] else len(buf)
+                self.skipped_bytes += max(0, keep - pos)
+                pos = max(pos, keep)
+                break
+            self.skipped_bytes += start - pos
+            pos = start
+            if len(buf) - pos < _HEADER_SIZE:
+                break
+            length, sensor_id, sample_type, seq, period_us = _HEADER.unpack_from(buf, pos + len(SYNC))
+            dtype = SAMPLE_DTYPES.get(sample_type)
+            payload_len = length - _BODY_HEADER_SIZE
+            if (dtype is None or payload_len < 0 or payload_len % dtype.itemsize
+                    or payload_len > self.max_samples * dtype.itemsize):
+                self.bad_headers += 1
+                pos += 1 # False sync: search again from the next byte
+                continue
+            end = pos + _HEADER_SIZE + payload_len + _CRC_SIZE
+            if len(buf) < end:
+                break
+            with memoryview(buf) as view:
+                crc_ok = crc16(view[pos + len(SYNC):end - _CRC_SIZE]) == _LENGTH.unpack_from(buf, end - _CRC_SIZE)[0]
+            if not crc_ok:
+                self.crc_errors += 1
+                pos += 1
+                continue
+            # astype() copies the samples out, so no view of the buffer outlives this loop
+            samples = np.frombuffer(buf, dtype=dtype, count=payload_len // dtype.itemsize,
+                                    offset=pos + _HEADER_SIZE).astype(np.float64)
+            frames.append(Frame(sensor_id, seq, period_us, samples, self._count_lost(sensor_id, seq)))
+            self.frames += 1
+            pos = end
+        del buf[:pos]
+        return frames
+
+    def _count_lost(self, sensor_id, seq):
+        last = self.last_seq.get(sensor_id)
+        self.last_seq[sensor_id] = seq
+        if last is None:
+            return 0
+        gap = (seq - last - 1) % _SEQ_MOD
+        if gap >= _SEQ_MOD // 2: # Sequence went backwards: the node restarted
+            return 0
+        self.lost_frames += gap
+        return gap
+
+    def stats(self):
+        return {'frames': self.frames, 'crc_errors': self.crc_errors, 'bad_headers': self.bad_headers,
+                'skipped_bytes': self.skipped_bytes, 'lost_frames': self.lost_frames}
+
+class SampleBatcher:
+    """ Joins each sensor's frames into batches of batch_size samples. Samples
+        past the end of a batch are carried over to the sensor's next batch.
+        Sample times are taken back from the arrival of the newest sample.
+    """
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = {} # sensor_id -> [samples arrays, sample count, lost samples, first sample index]
+
+    def add(self, frame, arrival_ns=None):
+        """ Adds one frame and returns the batches it completed (usually none or one). """
+        arrival_ns = time.time_ns() if arrival_ns is None else arrival_ns
+        pending = self.pending.setdefault(frame.sensor_id, [[], 0, 0, 0])
+        if pending[1] == 0:
+            pending[3] = frame.seq * len(frame.samples)
+        pending[0].append(frame.samples)
+        pending[1] += len(frame.samples)
+        pending[2] += frame.lost * len(frame.samples) # Lost frames assumed as long as this one
+        if pending[1] < self.batch_size:
+            return []
+
+        samples = np.concatenate(pending[0])
+        period_ns = frame.period_us * 1000
+        first_ns = arrival_ns - (len(samples) - 1) * period_ns # The newest sample arrived just now
+        batches = []
+        start = 0
+        while len(samples) - start >= self.batch_size:
+            batches.append(Batch(frame.sensor_id, first_ns + start * period_ns, frame.period_us,
+                                 samples[start:start + self.batch_size], pending[2], pending[3] + start))
+            pending[2] = 0
+            start += self.batch_size
+        pending[0] = [samples[start:]] if start < len(samples) else []
+        pending[3] += start
+        pending[1] = len(samples) - start
+        return batches
+
+def read_frames(port, parser):
+    """ Reads whatever a pyserial port has buffered (at least one byte, or until
+        the port's timeout) and returns the frames it completed.
+    """
+    return parser.feed(port.read(max(1, port.in_waiting)))
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+
+import asyncio
+import collections
+import concurrent.futures
+import datetime
+import logging
+import os
+import signal
+import sys
+import time
+import numpy as np
+import psycopg2
+import serial
+import serialframe  # Binary frame parser and per-sensor batching
+
+# bulkload.py and dbsession.py live with the ADS1256 scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'High-Precision-AD-DA-Board-Code', 'RaspberryPI', 'ADS1256', 'python3'))
+import bulkload     # Binary COPY of the measurement rows
+import dbsession    # Reconnect and retry after a lost database connection
+import spool        # REJECTED result of a write
+
+# ==============================================================================
+# Serial ingestion service: reads binary frames (serialframe.py) from any
+# number of Arduino nodes in one asyncio event loop and writes full batches to
+# the database.
+#
+# Every port is read from an event-loop reader callback (loop.add_reader), so
+# one thread serves all ports and a port costs a file descriptor, not a
+# process. The callbacks only parse and batch; they never wait on the
+# database. Completed batches go into a bounded queue that one writer task
+# drains with binary COPYs (bulkload.py) run in a worker thread, so a slow database
+# delays the writes but never the serial reads. If the database falls too far
+# behind, the oldest queued batches are dropped (and counted) rather than the
+# UART buffers overflowing.
+#
+# The writes go through a dbsession.DatabaseSession: after a database restart
+# or a network blip the writer reconnects (with backoff) and writes the queued
+# batches again, and the service starts without the database. A batch that
+# was committed just before the connection broke is not written twice: rows
+# carry the batch's first sample index (first_seq, from the frame sequence
+# numbers) and the loader skips rows already in the table. Batches the
+# database rejects (bad data, not a connection problem) are dropped and
+# counted, so they cannot hold up the queue.
+# ==============================================================================
+
+# ==============================================================================
+# ==                          PORT CONFIGURATION                              ==
+# ==============================================================================
+# One dictionary per serial port:
+#   'port': Device path of the node.
+#   'baud': Baud rate (must match the node's sketch; ignored by native USB CDC).
+#   'sensors': {sensor id in the node's frames: sensor metadata}, where the
+#       metadata holds 'name' and 'type' for the database and optionally
+#       'sensor_id' (database sensor id, default: the frame's id) and 'gain'
+#       (samples are divided by it, default ARDUINO_GAIN).
+#   'default': Metadata for sensor ids not listed in 'sensors' (optional;
+#       frames of unlisted sensors are dropped without it).
+# Nodes number their sensors independently, so give sensors on different
+# ports distinct database 'sensor_id's.
+# ------------------------------------------------------------------------------
+SERIAL_PORTS = [
+    {
+        'port': '/dev/ttyACM0',
+        'baud': 1000000,
+        'sensors': {
+            1: {'name': 'Voltage Sensor', 'type': 'Voltage'},
+            2: {'name': 'Current Sensor', 'type': 'Current'},
+        },
+        'default': {'name': 'Undefined Sensor, define in the backend.', 'type': 'Voltage'},
+    },
+    # --- Add more ports here if needed ---
+    # {
+    #     'port': '/dev/ttyACM1',
+    #     'baud': 1000000,
+    #     'sensors': {1: {'sensor_id': 11, 'name': 'Voltage Sensor Node 2', 'type': 'Voltage'}},
+    # },
+]
+# ==============================================================================
+
+ARDUINO_GAIN = 10          # Default: samples are sent in tenths of the sensor unit
+SAMPLES_PER_BATCH = 1000   # Samples per database row
+READ_CHUNK = 65536         # Max bytes read from a port per readiness callback
+REOPEN_DELAY_S = 5.0       # Wait before reopening a port that failed or was unplugged
+
+# --- Database Configuration ---
+DB_HOST = "localhost"
+DB_NAME = "gridsense_db"
+DB_USER = "gridsense_user"
+DB_PASSWORD = "microgrid"
+DB_TABLE = "measurements_six" # Make sure this table exists in gridsense_db
+DB_STATEMENT_TIMEOUT_MS = 5000 # A write stalled longer than this is cancelled and retried
+DB_CONNECT_TIMEOUT_S = 3 # A connection attempt gives up after this
+DB_RECONNECT_BACKOFF_S = 0.5 # Reconnect backoff, doubling up to DB_RECONNECT_BACKOFF_MAX_S (see dbsession.py)
+DB_RECONNECT_BACKOFF_MAX_S = 30.0
+
+# --- Writer Configuration ---
+DB_WRITE_INTERVAL_S = 1.0  # Longest time a completed batch waits for the writer
+DB_WRITE_MAX_BATCHES = 200 # Batches per COPY round trip
+MAX_PENDING_BATCHES = 3000 # Queued batches before the oldest are dropped (~1 min of 50 sensors at 1 kHz)
+
+MEASUREMENTS = bulkload.BulkLoader(DB_TABLE, bulkload.MEASUREMENT_COLUMNS, unique=bulkload.MEASUREMENT_KEY) # Binary COPY, INSERT fallback
+MEASUREMENT_IDS = bulkload.IdAllocator(DB_TABLE, block_size=DB_WRITE_MAX_BATCHES) # Row ids from the table's sequence
+
+# --- Logging Setup ---
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s')
+
+# --- Database Functions ---
+def create_connection():
+    """Establishes a connection to the PostgreSQL database."""
+    connection = None
+    try:
+        connection = psycopg2.connect(
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST,
+            port="5432",
+            connect_timeout=DB_CONNECT_TIMEOUT_S,
+            tcp_user_timeout=DB_STATEMENT_TIMEOUT_MS, # Unacknowledged data on a dead network breaks the connection too
+            options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+        )
+        logging.info(f"Connection to PostgreSQL DB '{DB_NAME}' successful")
+    except psycopg2.OperationalError as e:
+        logging.error(f"Database connection error: {e}", exc_info=True)
+    return connection
+
+def batch_row(batch_id, batch, meta):
+    """ Builds the table row of one serialframe.Batch. """
+    values = np.clip(np.round(batch.samples / meta['gain'], 2), bulkload.NUMERIC_5_2_MIN, bulkload.NUMERIC_5_2_MAX)
+    delta_t_ms = np.clip(np.round(np.arange(len(values)) * (batch.period_us / 1000.0), 2),
+                         bulkload.NUMERIC_5_2_MIN, bulkload.NUMERIC_5_2_MAX)
+    rms_value = float(np.clip(np.sqrt(np.mean(np.square(values))), bulkload.NUMERIC_5_2_MIN, bulkload.NUMERIC_5_2_MAX))
+    start_time = datetime.datetime.fromtimestamp(batch.start_ns / 1e9, tz=datetime.timezone.utc)
+    received = len(values)
+    return (batch_id, meta['sensor_id'], np.column_stack((values, delta_t_ms)), start_time,
+            rms_value, meta['name'], meta['type'], 0, 0,
+            received + batch.lost_samples, received, batch.lost_samples, batch.first_seq)
+
+def insert_batches(connection, batches):
+    """ Inserts (batch, meta) pairs in one round trip (binary COPY), with ids from
+        the table's sequence, and commits. Runs in the writer's worker thread.
+        Returns True; errors are logged, rolled back and raised.
+    """
+    try:
+        ids = MEASUREMENT_IDS.take(connection, len(batches))
+        MEASUREMENTS.load(connection, [batch_row(batch_id, batch, meta) for batch_id, (batch, meta) in zip(ids, batches)])
+        return True
+    except (psycopg2.Error, TypeError, ValueError) as e:
+        logging.error(f"Error inserting {len(batches)} batches: {e}", exc_info=True)
+        try: connection.rollback()
+        except psycopg2.Error as rb_e: logging.error(f"Error rolling back transaction: {rb_e}")
+        raise
+
+# --- Batching Writer ---
+class BatchWriter:
+    """ Queues completed batches from the port readers and writes them from one
+        task, with the blocking database calls on a single worker thread.
+    """
+    def __init__(self, session, max_pending=MAX_PENDING_BATCHES):
+        self.session = session
+        self.pending = collections.deque()
+        self.max_pending = max_pending
+        self.dropped = 0  # Batches discarded because the queue was full
+        self.rejected = 0 # Batches the database rejected
+        self.written = 0
+        self.ready = asyncio.Event()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="DBWriter")
+
+    def submit(self, batch, meta):
+        """ Queues one batch; called from the port readers, never blocks. """
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logging.warning(f"Database is behind: {self.dropped} batch(es) dropped from the write queue so far.")
+        self.pending.append((batch, meta))
+        if len(self.pending) >= DB_WRITE_MAX_BATCHES:
+            self.ready.set()
+
+    async def run(self, stop):
+        while not stop.is_set() or self.pending:
+            if not self.pending or len(self.pending) < DB_WRITE_MAX_BATCHES and not stop.is_set():
+                try:
+                    await asyncio.wait_for(self.ready.wait(), DB_WRITE_INTERVAL_S)
+                except asyncio.TimeoutError:
+                    pass
+                self.ready.clear()
+                if not self.pending:
+                    continue
+            batches = [self.pending.popleft() for _ in range(min(DB_WRITE_MAX_BATCHES, len(self.pending)))]
+            write_start = time.monotonic()
+            written = self.written
+            retry = await self.write(batches)
+            if self.written > written:
+                logging.info(f"DB Write: {self.written - written} batch(es) in {time.monotonic() - write_start:.3f}s, "
+                             f"{len(self.pending)} queued.")
+            if retry:
+                # Database unreachable: put them back for the next attempt; submit() drops the oldest if this overflows
+                self.pending.extendleft(reversed(retry))
+                if stop.is_set():
+                    logging.error(f"Giving up on {len(self.pending)} queued batch(es) at shutdown.")
+                    break
+                await asyncio.sleep(DB_WRITE_INTERVAL_S)
+        self.executor.shutdown(wait=True)
+
+    async def write(self, batches):
+        """ Writes batches on the worker thread. Returns the batches to try again
+            later (all of them while the database is unreachable). Rejected batches
+            are dropped; if a COPY of several is rejected, they are written one at
+            a time so only the bad ones go.
+        """
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, self.session.call, insert_batches, batches)
+        if result is spool.REJECTED:
+            if len(batches) > 1:
+                retry = []
+                for batch in batches:
+                    retry += await self.write([batch])
+                return retry
+            self.rejected += 1
+            logging.error(f"Database rejected a batch of sensor {batches[0][1]['sensor_id']}, dropped "
+                          f"({self.rejected} since start).")
+            return []
+        if not result:
+            return batches
+        self.written += len(batches)
+        return []
+
+# --- Serial Port Reader ---
+class PortReader:
+    """ Reads one serial port from event-loop reader callbacks and feeds its
+        completed batches to the writer. Reopens the port after errors.
+    """
+    def __init__(self, port_config, writer):
+        self.port = port_config['port']
+        self.baud = port_config.get('baud', 1000000)
+        self.sensors = {sid: self._meta(sid, meta) for sid, meta in port_config.get('sensors', {}).items()}
+        self.default = port_config.get('default')
+        self.writer = writer
+        self.serial = None
+        self.parser = serialframe.FrameParser()
+        self.batcher = serialframe.SampleBatcher(SAMPLES_PER_BATCH)
+        self.unknown_reported = set()
+        self.closed = False
+
+    @staticmethod
+    def _meta(frame_sensor_id, meta):
+        return {'sensor_id': meta.get('sensor_id', frame_sensor_id), 'name': meta['name'],
+                'type': meta['type'], 'gain': meta.get('gain', ARDUINO_GAIN)}
+
+    def open(self):
+        loop = asyncio.get_running_loop()
+        if self.closed:
+            return
+        try:
+            # timeout=0: non-blocking reads, the event loop says when data is there
+            self.serial = serial.Serial(self.port, baudrate=self.baud, timeout=0)
+        except (serial.SerialException, OSError) as e:
+            logging.error(f"Cannot open {self.port}: {e}. Retrying in {REOPEN_DELAY_S}s.")
+            loop.call_later(REOPEN_DELAY_S, self.open)
+            return
+        self.parser = serialframe.FrameParser() # Stale partial frames are meaningless after a reopen
+        loop.add_reader(self.serial.fileno(), self.on_readable)
+        logging.info(f"Reading frames from {self.port} at {self.baud} baud.")
+
+    def on_readable(self):
+        try:
+            data = os.read(self.serial.fileno(), READ_CHUNK)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            data = None
+            logging.error(f"Read error on {self.port}: {e}")
+        if not data: # Error, or EOF: the device went away
+            self._drop_port()
+            if not self.closed:
+                asyncio.get_running_loop().call_later(REOPEN_DELAY_S, self.open)
+            return
+
+        arrival_ns = time.time_ns()
+        for frame in self.parser.feed(data):
+            meta = self.sensors.get(frame.sensor_id)
+            if meta is None:
+                if self.default is None:
+                    if frame.sensor_id not in self.unknown_reported:
+                        logging.warning(f"{self.port}: frames of unknown sensor {frame.sensor_id} are ignored.")
+                        self.unknown_reported.add(frame.sensor_id)
+                    continue
+                meta = self.sensors[frame.sensor_id] = self._meta(frame.sensor_id, self.default)
+            if frame.lost:
+                logging.warning(f"{self.port}: lost {frame.lost} frame(s) of sensor {frame.sensor_id} before seq {frame.seq}.")
+            for batch in self.batcher.add(frame, arrival_ns):
+                self.writer.submit(batch, meta)
+
+    def _drop_port(self):
+        if self.serial is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self.serial.fileno())
+            self.serial.close()
+        except (OSError, serial.SerialException) as e:
+            logging.debug(f"Error closing {self.port}: {e}")
+        self.serial = None
+
+    def close(self):
+        self.closed = True
+        self._drop_port()
+        stats = self.parser.stats()
+        logging.info(f"{self.port}: {stats['frames']} frames, {stats['crc_errors']} CRC errors, "
+                     f"{stats['lost_frames']} lost, {stats['skipped_bytes']} bytes skipped.")
+
+# --- Main Execution ---
+async def main(session):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    writer = BatchWriter(session)
+    readers = [PortReader(port_config, writer) for port_config in SERIAL_PORTS]
+    for reader in readers:
+        reader.open()
+    writer_task = asyncio.create_task(writer.run(stop))
+
+    await stop.wait()
+    logging.info('Interrupt received, shutting down...')
+    for reader in readers:
+        reader.close()
+    await writer_task
+    logging.info(f"Wrote {writer.written} batch(es), dropped {writer.dropped} while the database was behind "
+                 f"and {writer.rejected} it rejected.")
+
+if __name__ == "__main__":
+    if not SERIAL_PORTS:
+        logging.critical("No ports defined in SERIAL_PORTS. Exiting.")
+        sys.exit(1)
+
+    db_session = dbsession.DatabaseSession(create_connection, DB_RECONNECT_BACKOFF_S, DB_RECONNECT_BACKOFF_MAX_S)
+    if db_session.get() is None: # The writer keeps trying, queueing the batches meanwhile
+        logging.warning("Database not reachable at start, queueing batches until it is.")
+    try:
+        asyncio.run(main(db_session))
+    finally:
+        db_session.close()
@@ -5,6 +5,13 @@ import numpy as np
 import time
 import random
 import datetime
+import os
+import sys
+
+# bulkload.py lives with the ADS1256 scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'High-Precision-AD-DA-Board-Code', 'RaspberryPI', 'ADS1256', 'python3'))
+import bulkload
 
 # Constants for the sine wave
 AMPLITUDE = 240
@@ -14,6 +21,10 @@ SAMPLES = 1000
 # Variable to specify sensor_id
 sensor_id = 6  # Replace with the desired sensor ID
 
+# Rows of measurements_six, written with binary COPY (multi-row INSERT fallback)
+MEASUREMENTS = bulkload.BulkLoader('measurements_six', bulkload.MEASUREMENT_COLUMNS[:9])
+MEASUREMENT_IDS = bulkload.IdAllocator('measurements_six')
+
 # Function to create a database connection
 def create_connection(host_name, user_name, password, db_name):
     connection = None
@@ -30,23 +41,12 @@ def create_connection(host_name, user_name, password, db_name):
         print(f"The error '{e}' occurred")
     return connection
 
-# Function to get the max id from the table
-def get_max_id(connection):
-    cursor = connection.cursor()
-    # Updated table name to 'measurements_one' as defined in GridSense models
-    cursor.execute("SELECT MAX(id) FROM measurements_six;")
-    max_id = cursor.fetchone()[0]
-    cursor.close()
-    return max_id if max_id else 0
-
 # Function to calculate RMS value
 def calculate_rms(data_array):
     return np.sqrt(np.mean(np.square(data_array)))
 
 # Function to insert a new record into the measurements table
-def insert_voltage_array(curr_id, connection, voltage_array, start_time):
-    cursor = connection.cursor()
-
+def insert_voltage_array(connection, voltage_array, start_time):
     # Calculate RMS value for the voltage array
     rms_value = calculate_rms(voltage_array[:, 0])  # Assuming the voltage is in the first column
     print(rms_value)
@@ -55,31 +55,19 @@ def insert_voltage_array(curr_id, connection, voltage_array, start_time):
     rms_value_float = float(rms_value)
 
 
-    # Prepare the voltage array for insertion
-    voltage_list = voltage_array.tolist()
-    timestamp = start_time.isoformat()
-
-    query = """
-    INSERT INTO measurements_six(id, sensor_id, sensdata, time, rmsvalue, sname, stype, thd, pf)
-    VALUES (%s, %s, %s::numeric[], %s, %s, %s, %s, %s, %s);
-    """
-    print("parameterized query being used")
-    print(query)
-
-
-    cursor.execute(query, (
+    curr_id, = MEASUREMENT_IDS.take(connection, 1) # From the table's id sequence
+    # The array goes to the bulk loader as is, encoded as binary numeric[][]
+    MEASUREMENTS.load(connection, [(
         curr_id,
         sensor_id,
-        voltage_list, # Pass the Python list directly, psycopg2 will handle conversion for parameterized queries
-        timestamp,
+        voltage_array,
+        start_time,
         rms_value_float, # Use the explicitly converted Python float here
-        'Voltage', # Corrected typo and using single quotes as string literals in SQL
-        'Voltage', # Corrected typo and using single quotes as string literals in SQL
+        'Voltage',
+        'Voltage',
         0,
         0
-    ))
-    connection.commit()
-    cursor.close()
+    )])
 
 # Function to generate synthetic sine wave data with disturbances
 def generate_synthetic_data():
@@ -96,11 +84,9 @@ connection = create_connection("localhost", "gridsense_user", "microgrid", "grid
 
 try:
     while True:
-        max_id = get_max_id(connection) + 1
         voltage_array, start_time = generate_synthetic_data()
         print(voltage_array)
-        insert_voltage_array(max_id, connection, voltage_array, start_time)
-        max_id += 1
+        insert_voltage_array(connection, voltage_array, start_time)
         print(f"Inserted a batch of {SAMPLES} values into the database. at t={start_time}")
 
         time.sleep(1)  # Wait for 1 second before the next batch
@@ -4,14 +4,39 @@ import numpy as np
 import time
 import datetime
 import serial
+import serialframe
+import os
+import sys
+
+# bulkload.py lives with the ADS1256 scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'High-Precision-AD-DA-Board-Code', 'RaspberryPI', 'ADS1256', 'python3'))
+import bulkload
+
+# Serial link to the Arduino: binary frames, see serialframe.py for the format
+SERIAL_PORT = '/dev/ttyACM0'  # Adjust the port as needed
+SERIAL_BAUD = 1000000         # Must match the Arduino sketch
+SERIAL_TIMEOUT_S = 1.0
+ARDUINO_GAIN = 10             # Samples are sent in tenths of the sensor unit
+
+# sensor_id -> (sname, stype); add more sensors here
+SENSOR_TYPES = {1: ("Voltage Sensor", "Voltage"),
+                2: ("Current Sensor", "Current")}
 
 # Initialize the serial connection to the Arduino
-ser = serial.Serial('/dev/ttyACM0', baudrate=9600)  # Adjust the port as needed
+ser = serial.Serial(SERIAL_PORT, baudrate=SERIAL_BAUD, timeout=SERIAL_TIMEOUT_S)
+parser = serialframe.FrameParser()
 
 # Constants for the sine wave
 AMPLITUDE = 240
 NOISE_LEVEL = 0
 SAMPLES = 1000
+batcher = serialframe.SampleBatcher(SAMPLES)
+ready_batches = [] # Completed batches not returned yet (one frame may complete several)
+
+# Rows of microgrid_back_measurementssix, written with binary COPY (multi-row INSERT fallback)
+MEASUREMENTS = bulkload.BulkLoader('microgrid_back_measurementssix', bulkload.MEASUREMENT_COLUMNS[:9])
+MEASUREMENT_IDS = bulkload.IdAllocator('microgrid_back_measurementssix')
 
 # Function to create a database connection
 def create_connection(host_name, user_name, password, db_name):
@@ -29,20 +54,10 @@ def create_connection(host_name, user_name, password, db_name):
         print(f"The error '{e}' occurred")
     return connection
 
-# Function to get the max id from the table
-def get_max_id(connection):
-    cursor = connection.cursor()
-    cursor.execute("SELECT MAX(id) FROM microgrid_back_measurementssix;")
-    max_id = cursor.fetchone()[0]
-    cursor.close()
-    return max_id if max_id else 0
-
 # Function to calculate RMS value
 def calculate_rms(data_array):
     return np.sqrt(np.mean(np.square(data_array)))
-def insert_voltage_array(curr_id, connection, voltage_array, start_time, sensor_id, sname, stype):
-    cursor = connection.cursor()
-
+def insert_voltage_array(connection, voltage_array, start_time, sensor_id, sname, stype):
     # Calculate RMS value for the voltage array
     rms_value = calculate_rms(voltage_array[:, 0])  # Assuming the voltage is in the first column
 
@@ -50,17 +65,9 @@ def insert_voltage_array(curr_id, connection, voltage_array, start_time, sensor_
     #thd = calculate_thd(voltage_array[:, 0])  # Assuming voltage data is in the first column
     # pf = calculate_power_factor(voltage_array[:, 0], current_array)  # Assuming you have current data
 
-    # Prepare the voltage array for insertion
-    voltage_list = voltage_array.tolist()
-    timestamp = start_time.isoformat()
-    query = """
-    INSERT INTO microgrid_back_measurementssix(id, sensor_id, sensdata, time, rmsvalue, sname, stype, thd, pf)
-    VALUES (%s, %s, %s::numeric[], %s, %s, %s, %s, %s, %s);
-    """
-    voltage_array_str = str(voltage_list).replace('[', '{').replace(']', '}')
-    cursor.execute(query, (curr_id, sensor_id, voltage_array_str, timestamp, rms_value, sname, stype, 0, 0))
-    connection.commit()
-    cursor.close()
+    curr_id, = MEASUREMENT_IDS.take(connection, 1) # From the table's id sequence
+    # The array goes to the bulk loader as is, encoded as binary numeric[][]
+    MEASUREMENTS.load(connection, [(curr_id, sensor_id, voltage_array, start_time, float(rms_value), sname, stype, 0, 0)])
 
 
 
@@ -100,67 +107,33 @@ import numpy as np
 
 
 def get_arduino_data():
-    try:
-        # Read data from the Arduino
-        arduino_data = ser.readline().decode().strip()  # Assuming the Arduino sends data as a string
-        arduino_data = eval(arduino_data)  # Convert the string to a Python list
-        print(arduino_data)
-    # Default values for sensor data
-    except Exception as e:
-        # Handle other unexpected errors
-        print(f"Error: {e}")
-        arduino_data = [0, [[0.0, 0.0]]]  # Default values for sensor data
-
-    
-
-
-    # Create a NumPy array initialized with zeros and size 1000
-    formatted_voltage_array = np.zeros((1000, 2))  # Assuming 2 columns (value, delta time)
-    
-
-    try:
-        arduino_data_values = np.array(arduino_data[1])  # Extract the actual data from Arduino
-        # Update the NumPy array with actual data, handling potential index errors
-        formatted_voltage_array[:len(arduino_data_values), :] = arduino_data_values
-        sensor_id = arduino_data[0]
-            
-        if sensor_id == 1:
-            stype = "Voltage"
-            sname = "Voltage Sensor"
-        elif sensor_id == 2:
-            stype = "Current"
-            sname = "Current Sensor"
-        # Add more sensors
-        else:
-            # Default values if sensor_id is not recognized
-            stype = "Voltage"
-            sname = "Undefined Sensor, define in the backend."
-    except IndexError as e:
-        # Handle index errors caused by corrupted Arduino data
-        print(f"Error updating NumPy array: {e}")
-        return np.zeros((1000, 2)), start_time, 20,"Voltage", "Voltage"
-
-    start_time = datetime.datetime.now(datetime.timezone.utc)
-    print(formatted_voltage_array)
-    formatted_voltage_array = formatted_voltage_array / 10  # Divide all values by 10 to adjust the gain
- # Round the values to two decimal places
-
+    # Collect frames until one sensor has a full batch of SAMPLES samples
+    while True:
+        for frame in serialframe.read_frames(ser, parser):
+            if frame.lost:
+                print(f"Warning: lost {frame.lost} frame(s) of sensor {frame.sensor_id} before seq {frame.seq}")
+            ready_batches.extend(batcher.add(frame))
+        if ready_batches:
+            batch = ready_batches.pop(0)
+            break
+
+    # Columns: value, delta time (ms) from the first sample
+    period_ms = batch.period_us / 1000.0
+    formatted_voltage_array = np.column_stack((batch.samples / ARDUINO_GAIN, np.arange(SAMPLES) * period_ms))
     formatted_voltage_array = np.round(formatted_voltage_array, decimals=2)
+    start_time = datetime.datetime.fromtimestamp(batch.start_ns / 1e9, tz=datetime.timezone.utc)
+    sname, stype = SENSOR_TYPES.get(batch.sensor_id, ("Undefined Sensor, define in the backend.", "Voltage"))
+    return formatted_voltage_array, start_time, batch.sensor_id, sname, stype
 
-    return formatted_voltage_array, start_time, sensor_id, sname, stype
 # Replace with your actual database credentials
 connection = create_connection("localhost", "sensor2", "microgrid", "sensors")
 
 try:
     while True:
-        max_id = get_max_id(connection) + 1
         voltage_array, start_time, sensor_id, sname, stype = get_arduino_data()  # Arduino
         print(voltage_array)
-        insert_voltage_array(max_id, connection, voltage_array, start_time, sensor_id, sname, stype)
-        max_id += 1
+        insert_voltage_array(connection, voltage_array, start_time, sensor_id, sname, stype)
         print(f"Inserted a batch of {SAMPLES} values into the database at t={start_time}")
-        
-        time.sleep(1)  # Wait for 1 second before the next batch
 except Exception as e:
         # Handle index errors caused by corrupted Arduino data
         print(f"Error updating NumPy array: {e}")